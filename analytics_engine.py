@@ -0,0 +1,331 @@
+from datetime import date
+
+from flask import current_app
+
+from cache import result_cache
+from categories import category_directory
+from money import minor_per_major
+import statements
+from timeseries import MAX_SERIES_DAYS, day_range, densify, rolling_windows, shift_day
+
+DAY_NUMBER_TO_NAME = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
+DEFAULT_ROLLING_WINDOWS = (7, 30, 90)
+
+# Amount bins per weekday in the scatter day-pattern chart
+SCATTER_AMOUNT_BINS = 40
+
+CHART_NAMES = (
+    'time_series',
+    'day_of_week_summary',
+    'daily_avg_spending',
+    'category_income_expense',
+    'monthly_trends',
+    'rolling_expenses',
+    'expense_pie_chart',
+    'day_stack',
+    'scatter_day_pattern',
+)
+
+
+class AnalyticsEngine:
+    """Accumulates every analytics series from a single pass over transactions.
+
+    Totals may be fed in any order, either per transaction or as rollup rows.
+    The charts and metrics on the analytics page are derived from the
+    accumulated state; daily series are gap-filled and the rolling expense
+    series use calendar windows of ``rolling_window_days``. Amounts are fed
+    and summed in integer minor units and converted to major units only in
+    ``charts`` and ``metrics``. Categories are fed and grouped by id and named
+    in ``charts``. Insights are kept separately by ``insights``.
+    """
+
+    def __init__(self, rolling_window_days=DEFAULT_ROLLING_WINDOWS):
+        self.rolling_window_days = tuple(rolling_window_days)
+
+        self.transaction_count = 0
+        self.total_income = 0
+        self.total_expense = 0
+        self.expense_count = 0
+
+        # Keyed by 'YYYY-MM-DD' / 'YYYY-MM' / '%w' / category id -> [income, expense]
+        self.by_day = {}
+        self.by_month = {}
+        self.by_weekday = {}
+        self.by_category = {}
+
+        # Per-day expense [sum, count] for the daily average series
+        self.expense_by_day = {}
+
+        self.scatter_weekdays = []
+        self.scatter_amounts = []
+
+        self._weekday_cache = {}
+
+    def _weekday(self, day):
+        weekday = self._weekday_cache.get(day)
+        if weekday is None:
+            weekday = date.fromisoformat(day).isoweekday() % 7
+            self._weekday_cache[day] = weekday
+        return weekday
+
+    def feed(self, type, category_id, amount_minor, day):
+        """Fold one transaction into the running aggregates.
+
+        ``day`` is the transaction date as a ``'YYYY-MM-DD'`` string.
+        """
+        amount_minor = amount_minor or 0
+        self.feed_totals(type, category_id, amount_minor, 1, day)
+        if type == 'expense':
+            self.feed_expense(amount_minor, day)
+
+    def feed_totals(self, type, category_id, total, count, day):
+        """Fold ``count`` transactions summing to ``total`` minor units for one day.
+
+        Accepts either a single transaction or a pre-aggregated rollup row.
+        """
+        is_expense = type == 'expense'
+        slot = 1 if is_expense else 0
+        counted = is_expense or type == 'income'
+
+        self.transaction_count += count
+
+        for bucket, key in (
+            (self.by_day, day),
+            (self.by_month, day[:7]),
+            (self.by_weekday, self._weekday(day)),
+            (self.by_category, category_id),
+        ):
+            totals = bucket.get(key)
+            if totals is None:
+                totals = bucket[key] = [0, 0]
+            if counted:
+                totals[slot] += total
+
+        if not is_expense:
+            if type == 'income':
+                self.total_income += total
+            return
+
+        self.total_expense += total
+        self.expense_count += count
+
+        day_totals = self.expense_by_day.get(day)
+        if day_totals is None:
+            day_totals = self.expense_by_day[day] = [0, 0]
+        day_totals[0] += total
+        day_totals[1] += count
+
+    def feed_expense(self, amount_minor, day):
+        """Fold the per-row part of a single expense (the scatter chart)."""
+        self.scatter_weekdays.append(self._weekday(day))
+        self.scatter_amounts.append(amount_minor)
+
+    def charts(self, category_names):
+        """Return every chart series; ``category_names`` maps each fed category id to its name."""
+        unit = minor_per_major()
+
+        def major(pairs, slot):
+            return [totals[slot] / unit for totals in pairs]
+
+        # One point per calendar day between the first and last transaction, the latest MAX_SERIES_DAYS at most
+        days = []
+        if self.by_day:
+            last_day = max(self.by_day)
+            days = day_range(max(min(self.by_day), shift_day(last_day, 1 - MAX_SERIES_DAYS)), last_day)
+        empty = (0, 0)
+        day_totals = densify(days, self.by_day, empty)
+        time_series = {
+            'date': days,
+            'income': major(day_totals, 0),
+            'expense': major(day_totals, 1),
+        }
+
+        weekdays = sorted(self.by_weekday)
+        day_of_week_summary = {
+            'day_of_week': [DAY_NUMBER_TO_NAME[weekday] for weekday in weekdays],
+            'income': major([self.by_weekday[weekday] for weekday in weekdays], 0),
+            'expense': major([self.by_weekday[weekday] for weekday in weekdays], 1),
+        }
+
+        daily_avg_spending = {
+            'date': days,
+            'avg_amount': [
+                total / (count * unit) if count else 0
+                for total, count in densify(days, self.expense_by_day, empty)
+            ],
+        }
+
+        category_ids = sorted(self.by_category, key=category_names.__getitem__)
+        category_income_expense = {
+            'category': [category_names[category_id] for category_id in category_ids],
+            'income': major([self.by_category[category_id] for category_id in category_ids], 0),
+            'expense': major([self.by_category[category_id] for category_id in category_ids], 1),
+        }
+
+        months = sorted(self.by_month)
+        monthly_trends = {
+            'month': months,
+            'income': major([self.by_month[month] for month in months], 0),
+            'expense': major([self.by_month[month] for month in months], 1),
+        }
+
+        rolling_expenses = {
+            'date': days,
+            'windows': rolling_windows([totals[1] for totals in day_totals], self.rolling_window_days, unit),
+        }
+
+        expense_ids = [category_id for category_id in category_ids if self.by_category[category_id][1]]
+        expense_pie_chart = {
+            'category': [category_names[category_id] for category_id in expense_ids],
+            'amount': major([self.by_category[category_id] for category_id in expense_ids], 1),
+        }
+
+        scatter_day_pattern = bin_scatter(self.scatter_weekdays, self.scatter_amounts, unit=unit)
+
+        return {
+            'time_series': time_series,
+            'day_of_week_summary': day_of_week_summary,
+            'daily_avg_spending': daily_avg_spending,
+            'category_income_expense': category_income_expense,
+            'monthly_trends': monthly_trends,
+            'rolling_expenses': rolling_expenses,
+            'expense_pie_chart': expense_pie_chart,
+            'day_stack': time_series,
+            'scatter_day_pattern': scatter_day_pattern,
+        }
+
+    def metrics(self):
+        unit = minor_per_major()
+        return {
+            'total_income': self.total_income / unit,
+            'total_expense': self.total_expense / unit,
+            'balance': (self.total_income - self.total_expense) / unit,
+            'transaction_count': self.transaction_count,
+        }
+
+
+def bin_scatter(weekdays, amounts, bins=SCATTER_AMOUNT_BINS, unit=1):
+    """Collapse per-expense ``(weekday, amount)`` points into amount bins.
+
+    The amount range is split into ``bins`` equal-width bins; each non-empty
+    (weekday, bin) cell becomes one point at the mean amount of its
+    expenses, with ``count`` expenses behind it. Points are ordered by
+    weekday (Sunday first), then amount. Mean amounts are divided by ``unit``.
+    """
+    if not amounts:
+        return {'day_of_week': [], 'amount': [], 'count': []}
+
+    low = min(amounts)
+    width = (max(amounts) - low) / bins or 1
+    cells = {}
+    for weekday, amount in zip(weekdays, amounts):
+        key = (weekday, min(int((amount - low) / width), bins - 1))
+        cell = cells.get(key)
+        if cell is None:
+            cell = cells[key] = [0, 0]
+        cell[0] += amount
+        cell[1] += 1
+
+    keys = sorted(cells)
+    return {
+        'day_of_week': [DAY_NUMBER_TO_NAME[weekday] for weekday, _ in keys],
+        'amount': [cells[key][0] / (cells[key][1] * unit) for key in keys],
+        'count': [cells[key][1] for key in keys],
+    }
+
+
+def _result(engine, user_id):
+    if engine.transaction_count == 0:
+        return None
+
+    return {
+        'charts': engine.charts(category_directory.names_by_id(user_id, engine.by_category)),
+        'metrics': engine.metrics(),
+    }
+
+
+def build_analytics(user_id, rolling_window_days=DEFAULT_ROLLING_WINDOWS):
+    """Compute charts and metrics for ``user_id``.
+
+    Aggregate series come from ``daily_rollup``; only the scatter chart reads
+    raw rows, and only the two columns it needs. Returns ``None`` when the
+    user has no transactions.
+    """
+    engine = AnalyticsEngine(rolling_window_days=rolling_window_days)
+
+    rollup_rows = statements.ANALYTICS_ROLLUP(user_id=user_id)
+    feed_totals = engine.feed_totals
+    for row in rollup_rows:
+        feed_totals(*row)
+
+    if engine.transaction_count == 0:
+        return None
+
+    expense_rows = statements.ANALYTICS_EXPENSE_ROWS(user_id=user_id)
+    feed_expense = engine.feed_expense
+    for row in expense_rows:
+        feed_expense(*row)
+
+    return _result(engine, user_id)
+
+
+def build_analytics_from_transactions(user_id, rolling_window_days=DEFAULT_ROLLING_WINDOWS):
+    """Single-pass variant of ``build_analytics`` that ignores the rollups.
+
+    Used to verify the rollup-backed path and by the benchmarks.
+    """
+    engine = AnalyticsEngine(rolling_window_days=rolling_window_days)
+
+    rows = statements.ANALYTICS_TRANSACTIONS(user_id=user_id)
+    feed = engine.feed
+    for row in rows:
+        feed(*row)
+
+    return _result(engine, user_id)
+
+
+def build_metrics(user_id):
+    """Compute the analytics page's metrics from the ``monthly_rollup`` totals.
+
+    Matches ``AnalyticsEngine.metrics`` without building any chart. Returns
+    ``None`` when the user has no transactions.
+    """
+    totals = {row['type']: row for row in statements.TYPE_TOTALS(user_id=user_id)}
+    transaction_count = sum(row['txn_count'] for row in totals.values())
+    if transaction_count == 0:
+        return None
+
+    unit = minor_per_major()
+    total_income = totals['income']['total_minor'] if 'income' in totals else 0
+    total_expense = totals['expense']['total_minor'] if 'expense' in totals else 0
+    return {
+        'total_income': total_income / unit,
+        'total_expense': total_expense / unit,
+        'balance': (total_income - total_expense) / unit,
+        'transaction_count': transaction_count,
+    }
+
+
+def metrics_for_user(user_id):
+    """Return the cached analytics metrics for ``user_id``."""
+    return result_cache.get_or_compute(user_id, 'analytics_metrics', lambda: build_metrics(user_id))
+
+
+def analytics_for_user(user_id, version=None):
+    """Return the cached analytics result for ``user_id`` from the configured backend.
+
+    ``version`` is the user's data version when the caller already read it.
+    """
+    config = current_app.config
+    if config['ANALYTICS_BACKEND'] == 'pandas':
+        from analytics_pandas import build_analytics_pandas as compute
+    else:
+        compute = build_analytics
+
+    return result_cache.get_or_compute(
+        user_id,
+        'analytics',
+        lambda: compute(user_id, rolling_window_days=config['ANALYTICS_ROLLING_WINDOWS']),
+        version=version
+    )
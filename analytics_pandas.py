@@ -0,0 +1,141 @@
+"""Vectorized pandas/NumPy analytics backend.
+
+Loads the user's transactions once into a typed, columnar frame (datetime
+dates, categorical types, int64 category ids and minor-unit amounts) and
+derives the same charts and metrics as ``analytics_engine`` with vectorized
+group-bys and window operations. Sums stay exact in int64 and are divided
+into major units only for the output. Selected with ``ANALYTICS_BACKEND = 'pandas'``.
+"""
+import numpy as np
+import pandas as pd
+
+from analytics_engine import DAY_NUMBER_TO_NAME, DEFAULT_ROLLING_WINDOWS, SCATTER_AMOUNT_BINS
+from categories import category_directory
+from money import minor_per_major
+import statements
+from timeseries import MAX_SERIES_DAYS, rolling_windows, shift_day
+
+COLUMNS = ['type', 'category_id', 'amount_minor', 'day']
+
+_DAY_NAMES = np.array(DAY_NUMBER_TO_NAME, dtype=object)
+
+
+def load_frame(user_id):
+    """Return the user's transactions as a typed frame ordered by (date, id)."""
+    rows = statements.ANALYTICS_TRANSACTIONS(user_id=user_id).fetchall()
+
+    frame = pd.DataFrame.from_records(rows, columns=COLUMNS)
+    frame['type'] = frame['type'].astype('category')
+    frame['category_id'] = frame['category_id'].astype('int64')
+    frame['amount_minor'] = frame['amount_minor'].astype('int64')
+    frame['date'] = pd.to_datetime(frame['day'], format='%Y-%m-%d')
+    # pandas numbers Monday as 0; the charts follow SQLite's %w (Sunday = 0)
+    frame['weekday'] = (frame['date'].dt.dayofweek.to_numpy() + 1) % 7
+    return frame
+
+
+def _series(grouped, key_name, key_values, unit):
+    return {
+        key_name: key_values,
+        'income': (grouped['income'] / unit).tolist(),
+        'expense': (grouped['expense'] / unit).tolist(),
+    }
+
+
+def _scatter_bins(expenses, unit, bins=SCATTER_AMOUNT_BINS):
+    """Vectorized counterpart of ``analytics_engine.bin_scatter``."""
+    if expenses.empty:
+        return {'day_of_week': [], 'amount': [], 'count': []}
+    amounts = expenses['amount_minor'].to_numpy()
+    low = amounts.min()
+    width = (amounts.max() - low) / bins or 1
+    cells = pd.DataFrame({
+        'weekday': expenses['weekday'].to_numpy(),
+        'bin': np.minimum(((amounts - low) / width).astype(np.int64), bins - 1),
+        'amount': amounts,
+    }).groupby(['weekday', 'bin'], sort=True)['amount'].agg(['sum', 'count'])
+    weekdays = cells.index.get_level_values('weekday').to_numpy()
+    return {
+        'day_of_week': _DAY_NAMES[weekdays].tolist(),
+        'amount': (cells['sum'] / (cells['count'] * unit)).tolist(),
+        'count': cells['count'].tolist(),
+    }
+
+
+def compute(frame, category_names, rolling_window_days=DEFAULT_ROLLING_WINDOWS):
+    """Compute charts and metrics from a frame built by ``load_frame``.
+
+    ``category_names`` maps each category id in the frame to its name.
+    """
+    is_income = (frame['type'] == 'income').to_numpy()
+    is_expense = (frame['type'] == 'expense').to_numpy()
+    amounts = frame['amount_minor'].to_numpy()
+    unit = minor_per_major()
+
+    split = pd.DataFrame({
+        'day': frame['day'],
+        'month': frame['day'].str.slice(0, 7),
+        'weekday': frame['weekday'],
+        'category_id': frame['category_id'],
+        'income': np.where(is_income, amounts, 0),
+        'expense': np.where(is_expense, amounts, 0),
+    })
+
+    # Gap-filled: one row per calendar day between the first and last transaction, the latest MAX_SERIES_DAYS at most
+    first_day = max(frame['day'].iloc[0], shift_day(frame['day'].iloc[-1], 1 - MAX_SERIES_DAYS))
+    calendar = pd.date_range(first_day, frame['date'].iloc[-1], freq='D').strftime('%Y-%m-%d')
+    by_day = split.groupby('day', sort=True)[['income', 'expense']].sum().reindex(calendar, fill_value=0)
+    by_weekday = split.groupby('weekday', sort=True)[['income', 'expense']].sum()
+    by_category = split.groupby('category_id', sort=False)[['income', 'expense']].sum()
+    by_category.index = by_category.index.map(category_names)
+    by_category = by_category.sort_index()
+    by_month = split.groupby('month', sort=True)[['income', 'expense']].sum()
+
+    expenses = frame.loc[is_expense]
+    daily_avg = (expenses.groupby('day', sort=True)['amount_minor'].mean() / unit).reindex(calendar, fill_value=0.0)
+
+    time_series = _series(by_day, 'date', by_day.index.tolist(), unit)
+    expense_categories = by_category[by_category['expense'] > 0]['expense']
+
+    charts = {
+        'time_series': time_series,
+        'day_of_week_summary': _series(
+            by_weekday, 'day_of_week', _DAY_NAMES[by_weekday.index.to_numpy()].tolist(), unit
+        ),
+        'daily_avg_spending': {
+            'date': daily_avg.index.tolist(),
+            'avg_amount': daily_avg.tolist(),
+        },
+        'category_income_expense': _series(by_category, 'category', by_category.index.tolist(), unit),
+        'monthly_trends': _series(by_month, 'month', by_month.index.tolist(), unit),
+        'rolling_expenses': {
+            'date': time_series['date'],
+            'windows': rolling_windows(by_day['expense'].tolist(), rolling_window_days, unit),
+        },
+        'expense_pie_chart': {
+            'category': expense_categories.index.tolist(),
+            'amount': (expense_categories / unit).tolist(),
+        },
+        'day_stack': time_series,
+        'scatter_day_pattern': _scatter_bins(expenses, unit),
+    }
+
+    total_income = int(amounts[is_income].sum())
+    total_expense = int(amounts[is_expense].sum())
+    metrics = {
+        'total_income': total_income / unit,
+        'total_expense': total_expense / unit,
+        'balance': (total_income - total_expense) / unit,
+        'transaction_count': len(frame),
+    }
+
+    return {'charts': charts, 'metrics': metrics}
+
+
+def build_analytics_pandas(user_id, rolling_window_days=DEFAULT_ROLLING_WINDOWS):
+    """Pandas counterpart of ``analytics_engine.build_analytics``."""
+    frame = load_frame(user_id)
+    if frame.empty:
+        return None
+    category_names = category_directory.names_by_id(user_id, frame['category_id'].unique().tolist())
+    return compute(frame, category_names, rolling_window_days=rolling_window_days)
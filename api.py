@@ -0,0 +1,222 @@
+"""JSON endpoints used by the pages for lazy loading."""
+import os
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request, send_file, stream_with_context
+from flask_login import current_user, login_required
+
+from analytics_engine import CHART_NAMES, analytics_for_user
+from batch import BatchError, apply_batch, parse_operations
+from cache import data_version
+from exporter import EXPORT_FORMATS, MIMETYPES, ExportError, export_chunks
+import budgets
+import jobs
+from search import search_transactions
+from timeseries import build_timeseries, parse_windows
+from transaction_query import FilterError, fetch_page, page_size, parse_filters
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+
+@api.errorhandler(FilterError)
+@api.errorhandler(ExportError)
+@api.errorhandler(BatchError)
+def handle_filter_error(e):
+    return jsonify({'error': str(e)}), 400
+
+
+@api.route('/transactions')
+@login_required
+def list_transactions():
+    filters = parse_filters(request.args)
+    rows, next_cursor = fetch_page(
+        current_user.id,
+        filters,
+        cursor=request.args.get('cursor'),
+        limit=page_size(request.args.get('limit'))
+    )
+    return jsonify({
+        'transactions': [row.as_dict() for row in rows],
+        'next_cursor': next_cursor,
+    })
+
+
+@api.route('/transactions/search')
+@login_required
+def search():
+    rows, next_cursor = search_transactions(
+        current_user.id,
+        request.args.get('q', ''),
+        cursor=request.args.get('cursor'),
+        limit=page_size(request.args.get('limit'))
+    )
+    return jsonify({
+        'transactions': [row.as_dict() for row in rows],
+        'next_cursor': next_cursor,
+    })
+
+
+@api.route('/transactions/batch', methods=['POST'])
+@login_required
+def batch_transactions():
+    """Apply up to ``BATCH_MAX_OPERATIONS`` changes in one transaction (see batch.py).
+
+    Responds 422 when an ``atomic`` batch had an invalid operation and so
+    wrote nothing.
+    """
+    operations, atomic = parse_operations(
+        request.get_json(silent=True), current_app.config['BATCH_MAX_OPERATIONS']
+    )
+    report = apply_batch(current_user.id, operations, atomic=atomic)
+    status = 422 if atomic and report['failed'] else 200
+    return jsonify(report), status
+
+
+@api.route('/transactions/export')
+@login_required
+def export_transactions():
+    file_format = request.args.get('format', 'csv')
+    filters = parse_filters(request.args)
+    chunks = export_chunks(current_user.id, filters, file_format)
+    return Response(
+        stream_with_context(chunks),
+        mimetype=MIMETYPES[file_format],
+        headers={'Content-Disposition': f'attachment; filename=transactions.{file_format}'}
+    )
+
+
+@api.route('/analytics/timeseries')
+@login_required
+def analytics_timeseries():
+    """Gap-filled daily series with calendar rolling windows.
+
+    Optional ``date_from``/``date_to`` bound the range and ``windows`` is a
+    comma-separated list of window lengths in days.
+    """
+    bounds = parse_filters({'date_from': request.args.get('date_from'), 'date_to': request.args.get('date_to')})
+    windows = parse_windows(request.args.get('windows'), current_app.config['ANALYTICS_ROLLING_WINDOWS'])
+    return jsonify(build_timeseries(
+        current_user.id,
+        windows,
+        start=bounds.get('date_from'),
+        end=bounds.get('date_to')
+    ))
+
+
+def _chart_response(names):
+    """Return the named charts as JSON, or 304 when the client's copy is current.
+
+    The ETag is derived from the user's data version, so revalidating an
+    unchanged chart costs one indexed lookup and never touches the analytics.
+    """
+    version = data_version(current_user.id)
+    etag = f'{current_user.id}-{version}-{"+".join(names)}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        analytics_data = analytics_for_user(current_user.id, version=version)
+        charts = analytics_data['charts'] if analytics_data else {}
+        response = jsonify({name: charts.get(name) for name in names})
+    response.set_etag(etag)
+    # Let the browser keep its copy but revalidate it on every fetch
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+@api.route('/analytics/charts')
+@login_required
+def analytics_charts():
+    """Several charts in one response; ``names`` defaults to all of them."""
+    names = [name for name in (request.args.get('names') or '').split(',') if name] or list(CHART_NAMES)
+    unknown = [name for name in names if name not in CHART_NAMES]
+    if unknown:
+        return jsonify({'error': f'Unknown chart {unknown[0]!r}.'}), 404
+    return _chart_response(names)
+
+
+@api.route('/analytics/charts/<name>')
+@login_required
+def analytics_chart(name):
+    if name not in CHART_NAMES:
+        return jsonify({'error': f'Unknown chart {name!r}.'}), 404
+    return _chart_response([name])
+
+
+@api.route('/budgets')
+@login_required
+def list_budgets():
+    """This month's budgets with their spending, read from the monthly rollups."""
+    return jsonify({'budgets': [
+        dict(status, **{name: str(status[name]) for name in ('budget', 'spent', 'remaining', 'over_by')})
+        for status in budgets.budget_status(current_user.id)
+    ]})
+
+
+@api.route('/jobs')
+@login_required
+def list_jobs():
+    return jsonify({'jobs': jobs.list_jobs(current_user.id)})
+
+
+@api.route('/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    job = jobs.get_job(job_id, user_id=current_user.id)
+    if job is None:
+        return jsonify({'error': 'Job not found.'}), 404
+    return jsonify(job)
+
+
+def _queued(job_id):
+    response = jsonify(jobs.get_job(job_id))
+    response.status_code = 202
+    response.headers['Location'] = f'{api.url_prefix}/jobs/{job_id}'
+    return response
+
+
+@api.route('/jobs/rollups', methods=['POST'])
+@login_required
+def queue_rollup_rebuild():
+    return _queued(jobs.enqueue('rollups.rebuild', user_id=current_user.id))
+
+
+@api.route('/jobs/budgets', methods=['POST'])
+@login_required
+def queue_budget_reconcile():
+    return _queued(jobs.enqueue('budgets.reconcile', user_id=current_user.id))
+
+
+@api.route('/jobs/insights', methods=['POST'])
+@login_required
+def queue_insights():
+    return _queued(jobs.enqueue('insights', user_id=current_user.id))
+
+
+@api.route('/jobs/export', methods=['POST'])
+@login_required
+def queue_export():
+    """Queue an export with the same ``format`` and filters as ``/transactions/export``."""
+    file_format = request.args.get('format', 'csv')
+    if file_format not in EXPORT_FORMATS:
+        raise ExportError(f'Unsupported format {file_format!r}; expected one of {", ".join(EXPORT_FORMATS)}.')
+    # Validate now; the job parses the raw arguments again when it runs
+    parse_filters(request.args)
+    filters = {name: value for name, value in request.args.items() if name != 'format'}
+    return _queued(jobs.enqueue(
+        'export', user_id=current_user.id, payload={'format': file_format, 'filters': filters}
+    ))
+
+
+@api.route('/jobs/<int:job_id>/download')
+@login_required
+def job_download(job_id):
+    job = jobs.get_job(job_id, user_id=current_user.id)
+    if job is None or job['kind'] != 'export' or job['status'] != jobs.SUCCEEDED:
+        abort(404)
+    result = job['result']
+    return send_file(
+        os.path.join(jobs.job_runner.directory, result['file']),
+        mimetype=MIMETYPES[result['format']],
+        as_attachment=True,
+        download_name=f'transactions.{result["format"]}'
+    )
@@ -0,0 +1,281 @@
+"""Apply many transaction changes in one request and one database transaction.
+
+A batch is a list of operations, each a JSON object with an ``op``:
+
+``create``        ``type``, ``category``, ``amount``, ``date`` and ``description``
+``update``        ``id`` plus any of the create fields; the rest keep their values
+``recategorize``  ``id`` and ``category``
+``delete``        ``id``
+
+Every operation is validated with the same rules as the forms before
+anything is written. The rows it touches are loaded with one ``IN`` query,
+then the valid operations are applied set-based: one ``DELETE ... IN``, one
+executemany ``UPDATE``, one ``UPDATE ... IN`` per target category and one
+multi-row ``INSERT ... RETURNING``. The rollups, insights and search index
+are adjusted once for the whole batch, next to a single data version bump
+and commit.
+
+Each operation gets a result in the order given. By default the valid
+operations are applied and the invalid ones reported; an ``atomic`` batch
+writes nothing unless every operation is valid. The response also lists the
+budgets the batch's expenses leave overspent (see ``budgets.py``).
+"""
+from sqlalchemy import bindparam, insert, text
+
+import budgets
+from cache import bump_data_version
+from categories import category_directory
+from extensions import db
+import insights
+from records import TRANSACTION_COLUMN_TYPES, TRANSACTION_COLUMNS, TRANSACTION_TABLES, transaction_records
+import rollups
+import schema
+import search
+import statements
+from validation import ValidationError, clean_transaction
+
+OPERATIONS = ('create', 'update', 'recategorize', 'delete')
+
+# Fields an operation may set, in clean_transaction's argument order
+FIELDS = ('type', 'category', 'amount', 'date', 'description')
+
+_TRANSACTIONS_BY_ID = text(f'''
+    SELECT {TRANSACTION_COLUMNS}
+    FROM {TRANSACTION_TABLES}
+    WHERE t.user_id = :user_id AND t.id IN :ids
+''').columns(**TRANSACTION_COLUMN_TYPES).bindparams(bindparam('ids', expanding=True))
+
+_DELETE = text(
+    'DELETE FROM "transaction" WHERE user_id = :user_id AND id IN :ids'
+).bindparams(bindparam('ids', expanding=True))
+
+_RECATEGORIZE = text(
+    'UPDATE "transaction" SET category_id = :category_id WHERE user_id = :user_id AND id IN :ids'
+).bindparams(bindparam('ids', expanding=True))
+
+# SQLAlchemy can only return ids in parameter order on SQLite by inserting
+# row by row, so there the ids of one multi-row INSERT are taken sorted:
+# SQLite runs one writer at a time and assigns AUTOINCREMENT ids in VALUES order
+_INSERT = insert(schema.transaction).returning(schema.transaction.c.id)
+_INSERT_ORDERED = insert(schema.transaction).returning(schema.transaction.c.id, sort_by_parameter_order=True)
+
+
+class BatchError(ValueError):
+    """Raised when a batch request is malformed as a whole."""
+
+
+def parse_operations(body, max_operations):
+    """Return ``(operations, atomic)`` from a decoded JSON request body.
+
+    Raises ``BatchError`` unless the body is an object whose ``operations``
+    is a non-empty list of at most ``max_operations`` items.
+    """
+    if not isinstance(body, dict):
+        raise BatchError('Request body must be a JSON object.')
+    operations = body.get('operations')
+    if not isinstance(operations, list) or not operations:
+        raise BatchError('operations must be a non-empty list.')
+    if len(operations) > max_operations:
+        raise BatchError(f'A batch holds at most {max_operations} operations.')
+    atomic = body.get('atomic', False)
+    if not isinstance(atomic, bool):
+        raise BatchError('atomic must be true or false.')
+    return operations, atomic
+
+
+def _field(item, name):
+    value = item.get(name)
+    if value is None or isinstance(value, str):
+        return value
+    # JSON numbers are accepted for the amount; Money.parse reads them exactly
+    if name == 'amount' and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    raise ValidationError(f'{name} must be a string.')
+
+
+def _transaction_id(item):
+    value = item.get('id')
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValidationError('id must be an integer.')
+    return value
+
+
+def _original(record):
+    """The record's fields as raw form values, for merging a partial update."""
+    return {
+        'type': record.type,
+        'category': record.category,
+        'amount': str(record.amount),
+        'date': record.date.isoformat(),
+        'description': record.description,
+    }
+
+
+class _Operation:
+    __slots__ = ('index', 'op', 'id', 'old', 'new', 'error')
+
+    def __init__(self, index, op, id=None):
+        self.index = index
+        self.op = op
+        self.id = id
+        self.old = None
+        self.new = None
+        self.error = None
+
+    def result(self, status):
+        result = {'index': self.index, 'op': self.op, 'status': status, 'id': self.id}
+        if self.error is not None:
+            result['error'] = self.error
+        return result
+
+
+def _prepare(user_id, items):
+    """Validate every item; return the ``_Operation`` list with ``error`` set on failures."""
+    operations = []
+    claimed = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or item.get('op') not in OPERATIONS:
+            operation = _Operation(index, item.get('op') if isinstance(item, dict) else None)
+            operation.error = f'op must be one of {", ".join(OPERATIONS)}.'
+            operations.append(operation)
+            continue
+
+        operation = _Operation(index, item['op'])
+        operations.append(operation)
+        try:
+            if operation.op != 'create':
+                operation.id = _transaction_id(item)
+                if operation.id in claimed:
+                    raise ValidationError(f'Transaction is already changed by operation {claimed[operation.id]}.')
+                claimed[operation.id] = index
+            fields = {name: _field(item, name) for name in FIELDS if name in item}
+            if operation.op == 'create':
+                operation.new = clean_transaction(*(fields.get(name) for name in FIELDS))
+            elif operation.op == 'recategorize':
+                if 'category' not in fields:
+                    raise ValidationError('category is required.')
+                operation.new = {'category': fields['category']}
+            elif operation.op == 'update':
+                operation.new = fields
+        except ValidationError as e:
+            operation.error = str(e)
+
+    ids = [operation.id for operation in operations if operation.id is not None and operation.error is None]
+    existing = {}
+    if ids:
+        existing = {
+            record.id: record
+            for record in transaction_records(db.session.execute(_TRANSACTIONS_BY_ID, {'user_id': user_id, 'ids': ids}))
+        }
+
+    for operation in operations:
+        if operation.error is not None or operation.op == 'create':
+            continue
+        record = existing.get(operation.id)
+        if record is None:
+            operation.error = 'Transaction not found.'
+            continue
+        operation.old = record.as_dict()
+        if operation.op == 'delete':
+            continue
+        # Updates are validated as a whole, the untouched fields included
+        raw = dict(_original(record), **operation.new)
+        try:
+            operation.new = clean_transaction(*(raw[name] for name in FIELDS), currency=record.currency)
+        except ValidationError as e:
+            operation.error = str(e)
+    return operations
+
+
+def apply_batch(user_id, items, atomic=False):
+    """Validate and apply the operations ``items`` for the user, then commit.
+
+    Returns ``{'applied': n, 'failed': n, 'results': [...], 'over_budget': [...]}`` with one result
+    per item: its ``index``, ``op``, ``id`` (the new id for a create) and a
+    ``status`` of ``created``, ``updated``, ``recategorized``, ``deleted``,
+    ``error`` (with an ``error`` message) or, for the valid operations of a
+    failed atomic batch, ``skipped``. ``over_budget`` has the ``category``,
+    ``month``, ``budget`` and ``spent`` of each budget the batch overspends.
+    """
+    operations = _prepare(user_id, items)
+    valid = [operation for operation in operations if operation.error is None]
+    failed = len(operations) - len(valid)
+    if atomic and failed:
+        return {
+            'applied': 0,
+            'failed': failed,
+            'results': [operation.result('error' if operation.error else 'skipped') for operation in operations],
+            'over_budget': [],
+        }
+
+    over_budget = _write(user_id, valid) if valid else []
+
+    statuses = {'create': 'created', 'update': 'updated', 'recategorize': 'recategorized', 'delete': 'deleted'}
+    return {
+        'applied': len(valid),
+        'failed': failed,
+        'results': [
+            operation.result('error' if operation.error else statuses[operation.op]) for operation in operations
+        ],
+        'over_budget': [
+            {'category': status['category'], 'month': status['month'], 'budget': str(status['budget']),
+             'spent': str(status['spent'])}
+            for status in over_budget
+        ],
+    }
+
+
+def _write(user_id, operations):
+    category_ids = category_directory.resolve_many(
+        user_id, {operation.new['category'] for operation in operations if operation.new is not None}
+    )
+    for operation in operations:
+        if operation.new is not None:
+            operation.new['category_id'] = category_ids[operation.new['category']]
+
+    deletes = [operation for operation in operations if operation.op == 'delete']
+    updates = [operation for operation in operations if operation.op == 'update']
+    recategorizes = [operation for operation in operations if operation.op == 'recategorize']
+    creates = [operation for operation in operations if operation.op == 'create']
+
+    if deletes:
+        db.session.execute(_DELETE, {'user_id': user_id, 'ids': [operation.id for operation in deletes]})
+    if updates:
+        statements.UPDATE_TRANSACTION([
+            dict(operation.new, id=operation.id, user_id=user_id) for operation in updates
+        ])
+    by_category = {}
+    for operation in recategorizes:
+        by_category.setdefault(operation.new['category_id'], []).append(operation.id)
+    for category_id, ids in by_category.items():
+        db.session.execute(_RECATEGORIZE, {'user_id': user_id, 'category_id': category_id, 'ids': ids})
+    if creates:
+        columns = ('type', 'category_id', 'amount_minor', 'currency', 'date', 'description')
+        rows = [dict({name: operation.new[name] for name in columns}, user_id=user_id) for operation in creates]
+        if db.engine.dialect.name == 'sqlite':
+            new_ids = sorted(db.session.execute(_INSERT, rows).scalars())
+        else:
+            new_ids = db.session.execute(_INSERT_ORDERED, rows).scalars().all()
+        for operation, new_id in zip(creates, new_ids):
+            operation.id = new_id
+
+    removed = [operation.old for operation in operations if operation.old is not None]
+    added = [dict(operation.new, id=operation.id) for operation in operations if operation.new is not None]
+    rollups.record_bulk(user_id, added, removed=removed)
+    insights.record_bulk(user_id, removed + added)
+
+    # Only rows whose description or category changed are re-indexed
+    reindexed = [
+        operation for operation in updates + recategorizes
+        if (operation.old['description'] or '') != (operation.new['description'] or '')
+        or operation.old['category'] != operation.new['category']
+    ]
+    search.record_changes(
+        user_id,
+        removed=[operation.old for operation in deletes + reindexed],
+        added=[dict(operation.new, id=operation.id) for operation in reindexed + creates],
+    )
+    bump_data_version(user_id)
+    over_budget = budgets.overruns(user_id, added)
+    db.session.commit()
+    return over_budget
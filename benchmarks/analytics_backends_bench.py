@@ -0,0 +1,49 @@
+"""Compare the SQL and pandas analytics backends across history sizes.
+
+    python -m benchmarks.analytics_backends_bench --sizes 10000,100000,1000000
+    python -m benchmarks.analytics_backends_bench --database-url postgresql+psycopg://localhost/fintrack_bench
+"""
+import argparse
+
+from benchmarks.common import create_user, make_app, report, seed_transactions, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--database-url', default=None, help='Scratch database; defaults to a temporary SQLite file.')
+    args = parser.parse_args()
+
+    app = make_app(database_url=args.database_url)
+    import rollups
+    from analytics_engine import build_analytics, build_analytics_from_transactions
+    from analytics_pandas import build_analytics_pandas, compute, load_frame
+    from categories import category_directory
+    from extensions import db
+
+    with app.app_context():
+        for size in (int(value) for value in args.sizes.split(',')):
+            user_id = create_user(db, email=f'bench{size}@example.com')
+            seed_transactions(db, user_id, size, seed=size)
+            rollups.rebuild(user_id)
+
+            print(f'\n{size} transactions')
+            results = {}
+            for _ in range(args.runs):
+                with timed(results, 'sql: rollups + expense rows'):
+                    build_analytics(user_id)
+                with timed(results, 'sql: single pass'):
+                    build_analytics_from_transactions(user_id)
+                with timed(results, 'pandas: end to end'):
+                    build_analytics_pandas(user_id)
+                with timed(results, 'pandas: load frame'):
+                    frame = load_frame(user_id)
+                category_names = category_directory.names_by_id(user_id)
+                with timed(results, 'pandas: vectorized compute only'):
+                    compute(frame, category_names)
+            report(results)
+
+
+if __name__ == '__main__':
+    main()
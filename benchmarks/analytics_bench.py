@@ -0,0 +1,120 @@
+"""Compare the legacy per-chart analytics queries with the analytics engine.
+
+    python -m benchmarks.analytics_bench --rows 100000 --runs 5
+    python -m benchmarks.analytics_bench --database-url postgresql+psycopg://localhost/fintrack_bench
+"""
+import argparse
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from benchmarks.common import QueryCounter, create_user, make_app, report, seed_transactions, timed
+
+# The statements the /analytics view issued before the single-pass engine,
+# in the order they ran (COUNT, nine charts, totals, then generate_insights),
+# with amounts read from amount_minor and categories grouped by category_id.
+LEGACY_QUERIES = [
+    'SELECT COUNT(*) FROM "transaction" WHERE user_id = :user_id',
+    '''SELECT date(date) as date,
+              SUM(CASE WHEN type = 'income' THEN amount_minor ELSE 0 END) as income,
+              SUM(CASE WHEN type = 'expense' THEN amount_minor ELSE 0 END) as expense
+       FROM "transaction" WHERE user_id = :user_id GROUP BY date(date) ORDER BY date(date)''',
+    '''SELECT strftime('%w', date) as day_of_week,
+              SUM(CASE WHEN type = 'income' THEN amount_minor ELSE 0 END) as income,
+              SUM(CASE WHEN type = 'expense' THEN amount_minor ELSE 0 END) as expense
+       FROM "transaction" WHERE user_id = :user_id GROUP BY day_of_week ORDER BY day_of_week''',
+    '''SELECT date(date) as date, AVG(amount_minor) as avg_amount
+       FROM "transaction" WHERE user_id = :user_id AND type = 'expense'
+       GROUP BY date(date) ORDER BY date(date)''',
+    '''SELECT category_id,
+              SUM(CASE WHEN type = 'income' THEN amount_minor ELSE 0 END) as income,
+              SUM(CASE WHEN type = 'expense' THEN amount_minor ELSE 0 END) as expense
+       FROM "transaction" WHERE user_id = :user_id GROUP BY category_id ORDER BY category_id''',
+    '''SELECT strftime('%Y-%m', date) as month,
+              SUM(CASE WHEN type = 'income' THEN amount_minor ELSE 0 END) as income,
+              SUM(CASE WHEN type = 'expense' THEN amount_minor ELSE 0 END) as expense
+       FROM "transaction" WHERE user_id = :user_id GROUP BY month ORDER BY month''',
+    '''SELECT date(date) as date,
+              SUM(amount_minor) OVER (ORDER BY date(date) ROWS BETWEEN 6 PRECEDING AND CURRENT ROW) as rolling_sum
+       FROM "transaction" WHERE user_id = :user_id AND type = 'expense' ORDER BY date(date)''',
+    '''SELECT category_id, SUM(amount_minor) as amount FROM "transaction"
+       WHERE user_id = :user_id AND type = 'expense' GROUP BY category_id ORDER BY category_id''',
+    '''SELECT strftime('%w', date) as day_of_week, amount_minor FROM "transaction"
+       WHERE user_id = :user_id AND type = 'expense' ORDER BY date(date)''',
+    'SELECT SUM(amount_minor) FROM "transaction" WHERE user_id = :user_id AND type = \'income\'',
+    'SELECT SUM(amount_minor) FROM "transaction" WHERE user_id = :user_id AND type = \'expense\'',
+    'SELECT COUNT(*) FROM "transaction" WHERE user_id = :user_id',
+    'SELECT AVG(amount_minor) FROM "transaction" WHERE user_id = :user_id AND type = \'expense\'',
+    '''SELECT category_id, SUM(amount_minor) as total_amount FROM "transaction"
+       WHERE user_id = :user_id AND type = 'expense' GROUP BY category_id ORDER BY total_amount DESC LIMIT 3''',
+    'SELECT SUM(amount_minor) FROM "transaction" WHERE user_id = :user_id AND type = \'income\'',
+    'SELECT SUM(amount_minor) FROM "transaction" WHERE user_id = :user_id AND type = \'expense\'',
+    '''SELECT SUM(amount_minor) FROM "transaction" WHERE user_id = :user_id AND type = 'expense'
+       AND date(date) BETWEEN :first_day_this_month AND :today''',
+    '''SELECT SUM(amount_minor) FROM "transaction" WHERE user_id = :user_id AND type = 'expense'
+       AND date(date) BETWEEN :first_day_last_month AND :last_day_last_month''',
+    '''SELECT description, COUNT(*) as freq FROM "transaction"
+       WHERE user_id = :user_id AND type = 'expense'
+       GROUP BY description HAVING freq > 3 ORDER BY freq DESC LIMIT 1''',
+]
+
+
+def run_legacy(db, user_id, queries=LEGACY_QUERIES):
+    today = date.today()
+    first_day_this_month = today.replace(day=1)
+    last_day_last_month = first_day_this_month - timedelta(days=1)
+    params = {
+        'user_id': user_id,
+        'today': today.isoformat(),
+        'first_day_this_month': first_day_this_month.isoformat(),
+        'first_day_last_month': last_day_last_month.replace(day=1).isoformat(),
+        'last_day_last_month': last_day_last_month.isoformat(),
+    }
+    for statement in queries:
+        db.session.execute(text(statement), params).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--database-url', default=None, help='Scratch database; defaults to a temporary SQLite file.')
+    args = parser.parse_args()
+
+    app = make_app(database_url=args.database_url)
+    import rollups
+    from analytics_engine import build_analytics, build_analytics_from_transactions
+    from extensions import db
+
+    with app.app_context():
+        user_id = create_user(db)
+        seed_transactions(db, user_id, args.rows)
+        rollups.rebuild(user_id)
+
+        # The legacy queries use SQLite's strftime()
+        legacy = db.engine.dialect.name == 'sqlite'
+        print(f'Seeded {args.rows} transactions on {db.engine.dialect.name}')
+
+        results = {}
+        counts = {}
+        for _ in range(args.runs):
+            if legacy:
+                with QueryCounter(db.engine) as counter, timed(results, 'legacy (per-chart queries)'):
+                    run_legacy(db, user_id)
+                counts['legacy (per-chart queries)'] = counter.count
+
+            with QueryCounter(db.engine) as counter, timed(results, 'single-pass engine'):
+                build_analytics_from_transactions(user_id)
+            counts['single-pass engine'] = counter.count
+
+            with QueryCounter(db.engine) as counter, timed(results, 'rollup-backed engine'):
+                build_analytics(user_id)
+            counts['rollup-backed engine'] = counter.count
+
+        report(results)
+        for label, count in counts.items():
+            print(f'{label:<40} {count} queries per page view')
+
+
+if __name__ == '__main__':
+    main()
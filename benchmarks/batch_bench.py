@@ -0,0 +1,104 @@
+"""Compare one-request-per-row writes with ``POST /api/transactions/batch``.
+
+Seeds one user with a history, logs in through the test client, then for
+``--operations`` transactions times (and counts the statements of) adding
+them with one ``/add_transaction`` request each against one batch of
+creates, and deleting them with one ``DELETE /transaction/<id>`` each, as the
+transactions page did, against one batch of deletes.
+
+    python -m benchmarks.batch_bench --rows 100000 --operations 300
+"""
+import argparse
+import time
+from datetime import date
+
+from sqlalchemy import text
+from werkzeug.security import generate_password_hash
+
+from benchmarks.common import QueryCounter, create_user, make_app, seed_transactions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--operations', type=int, default=300)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    app = make_app()
+    import rollups
+    import search
+    from extensions import db
+
+    with app.app_context():
+        user_id = create_user(db)
+        db.session.execute(
+            text('UPDATE "user" SET password = :password WHERE id = :user_id'),
+            {'password': generate_password_hash('bench'), 'user_id': user_id}
+        )
+        seed_transactions(db, user_id, args.rows)
+        rollups.rebuild(user_id)
+        search.rebuild()
+        engine = db.engine
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'bench@example.com', 'password': 'bench'})
+    form = {
+        'type': 'expense',
+        'category': 'Groceries',
+        'amount': '12.50',
+        'date': date.today().isoformat(),
+        'description': 'Benchmark',
+    }
+
+    def newest_ids():
+        with app.app_context():
+            return db.session.execute(
+                text('SELECT id FROM "transaction" WHERE user_id = :user_id ORDER BY id DESC LIMIT :count'),
+                {'user_id': user_id, 'count': args.operations}
+            ).scalars().all()
+
+    def per_row_add():
+        for _ in range(args.operations):
+            assert client.post('/add_transaction', data=form).status_code == 302
+
+    def per_row_delete():
+        for transaction_id in newest_ids():
+            assert client.delete(f'/transaction/{transaction_id}').status_code == 204
+
+    def batch(operations):
+        response = client.post('/api/transactions/batch', json={'operations': operations, 'atomic': True})
+        assert response.status_code == 200, response.get_json()
+
+    def batch_add():
+        batch([dict(form, op='create') for _ in range(args.operations)])
+
+    def batch_delete():
+        batch([{'op': 'delete', 'id': transaction_id} for transaction_id in newest_ids()])
+
+    results = {}
+    for _ in range(args.runs):
+        for label, write in (
+            ('add: one request per row', per_row_add),
+            ('delete: one request per row', per_row_delete),
+            ('add: one batch', batch_add),
+            ('delete: one batch', batch_delete),
+        ):
+            with QueryCounter(engine) as counter:
+                start = time.perf_counter()
+                write()
+                elapsed = time.perf_counter() - start
+            samples = results.setdefault(label, [])
+            samples.append((elapsed, counter.count))
+
+    for label, samples in results.items():
+        samples.sort()
+        elapsed, statements = samples[len(samples) // 2]
+        print(
+            f'{label:<30} {args.operations} rows   median {elapsed * 1000:9.1f} ms   '
+            f'{statements:6d} statements   {args.operations / elapsed:9.0f} rows/s'
+        )
+
+
+if __name__ == '__main__':
+    main()
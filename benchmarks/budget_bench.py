@@ -0,0 +1,65 @@
+"""Compare reading budget spending from the monthly rollups with aggregating it.
+
+Seeds one user, sets a budget on every expense category, then times the
+dashboard's budget status (one ``monthly_rollup`` lookup per budget), the
+single-category overrun check made after each write, and the per-category
+SUM over the month's transactions they replace. Also times the
+reconciliation of every budget against raw rows.
+
+    python -m benchmarks.budget_bench --rows 1000000 --runs 20
+"""
+import argparse
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from benchmarks.common import EXPENSE_CATEGORIES, create_user, make_app, report, seed_transactions, timed
+
+AGGREGATE = '''
+    SELECT category_id, SUM(amount_minor) FROM "transaction"
+    WHERE user_id = :user_id AND type = 'expense' AND date >= :start AND date < :end
+    GROUP BY category_id
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app()
+    import budgets
+    import rollups
+    from categories import category_directory
+    from extensions import db
+
+    with app.app_context():
+        user_id = create_user(db)
+        seed_transactions(db, user_id, args.rows)
+        rollups.rebuild(user_id)
+        for category in EXPENSE_CATEGORIES:
+            budgets.set_budget(user_id, category, '500')
+        db.session.commit()
+        print(f'Seeded {args.rows} transactions with {len(EXPENSE_CATEGORIES)} budgets')
+
+        # The seeded history ends today; the benchmark reads the last full month
+        month = (date.today().replace(day=1) - timedelta(days=1)).isoformat()[:7]
+        write = {'type': 'expense', 'category_id': category_directory.resolve(user_id, 'Dining'), 'date': f'{month}-15'}
+        params = {'user_id': user_id, 'start': f'{month}-01', 'end': f'{month}-31'}
+
+        results = {}
+        for _ in range(args.runs):
+            with timed(results, 'budget status: rollup lookups'):
+                budgets.budget_status(user_id, today=date.fromisoformat(f'{month}-15'))
+            with timed(results, 'budget status: SUM over month'):
+                db.session.execute(text(AGGREGATE), params).fetchall()
+            with timed(results, 'overrun check after a write'):
+                budgets.overruns(user_id, [write])
+            with timed(results, 'reconcile one month'):
+                budgets.reconcile(user_id, month, repair=False)
+        report(results)
+
+
+if __name__ == '__main__':
+    main()
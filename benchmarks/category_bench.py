@@ -0,0 +1,110 @@
+"""Queries spent resolving categories, and grouping by id versus by name.
+
+Posts transactions through ``/add_transaction`` and loads ``/transactions``
+as a logged-in user, counting the statements that touch ``category``: with
+the category dictionary warm they should be none. Then times the per-category
+aggregate over the user's transactions grouped by ``category_id`` and grouped
+by the joined category name, the string comparison it replaced.
+
+    python -m benchmarks.category_bench --rows 200000 --requests 200
+"""
+import argparse
+import time
+from datetime import date
+
+from sqlalchemy import event, text
+from werkzeug.security import generate_password_hash
+
+from benchmarks.common import create_user, make_app, report, seed_transactions, timed
+
+GROUP_BY = {
+    'GROUP BY category_id': '''
+        SELECT category_id, SUM(amount_minor) FROM "transaction"
+        WHERE user_id = :user_id AND type = 'expense' GROUP BY category_id
+    ''',
+    'GROUP BY category name': '''
+        SELECT c.name, SUM(t.amount_minor) FROM "transaction" t JOIN category c ON c.id = t.category_id
+        WHERE t.user_id = :user_id AND t.type = 'expense' GROUP BY c.name
+    ''',
+}
+
+
+class CategoryQueryCounter:
+    """Counts statements on ``engine`` that read or write the category table."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        if 'category ' in statement.replace('\n', ' ') and 'JOIN category' not in statement:
+            self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    app = make_app()
+    import rollups
+    from extensions import db
+
+    with app.app_context():
+        user_id = create_user(db)
+        db.session.execute(
+            text('UPDATE "user" SET password = :password WHERE id = :user_id'),
+            {'password': generate_password_hash('bench'), 'user_id': user_id}
+        )
+        seed_transactions(db, user_id, args.rows)
+        rollups.rebuild(user_id)
+        engine = db.engine
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'bench@example.com', 'password': 'bench'})
+    form = {
+        'type': 'expense',
+        'category': 'Groceries',
+        'amount': '12.50',
+        'date': date.today().isoformat(),
+        'description': 'Benchmark',
+    }
+
+    for label, request in (
+        ('POST /add_transaction', lambda: client.post('/add_transaction', data=form)),
+        ('GET /transactions', lambda: client.get('/transactions')),
+    ):
+        request()  # loads the user's categories
+        elapsed = 0.0
+        with CategoryQueryCounter(engine) as counter:
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                response = request()
+                elapsed += time.perf_counter() - start
+                assert response.status_code in (200, 302), response.status_code
+        print(
+            f'{label:<22} {counter.count / args.requests:5.2f} category queries/request   '
+            f'{elapsed / args.requests * 1000:6.3f} ms/request'
+        )
+
+    with app.app_context():
+        results = {}
+        for _ in range(args.runs):
+            for name, query in GROUP_BY.items():
+                with timed(results, name):
+                    db.session.execute(text(query), {'user_id': user_id}).fetchall()
+        print()
+        report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks run against a throwaway SQLite database so they never touch the
+development ``fintech.db``. Run them from the repository root, e.g.::
+
+    python -m benchmarks.analytics_bench --rows 100000
+
+Benchmarks that accept ``--database-url`` can run against another server
+instead, e.g. a local PostgreSQL scratch database::
+
+    python -m benchmarks.analytics_bench --database-url postgresql+psycopg://localhost/fintrack_bench
+
+The FinTrack tables in that database are dropped first.
+"""
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, event, text
+
+EXPENSE_CATEGORIES = ['Groceries', 'Rent', 'Utilities', 'Entertainment', 'Travel', 'Dining', 'Transport', 'Health']
+INCOME_CATEGORIES = ['Salary', 'Freelance', 'Interest']
+DESCRIPTIONS = ['Coffee', 'Weekly groceries', 'Bus ticket', 'Movie tickets', 'Dinner out', 'Pharmacy', None]
+
+
+def make_app(database_path=None, database_url=None):
+    """Create the Flask app bound to a temporary SQLite database or ``database_url``."""
+    if database_url is None:
+        if database_path is None:
+            database_path = os.path.join(tempfile.mkdtemp(prefix='fintrack-bench-'), 'bench.db')
+        database_url = 'sqlite:///' + database_path
+    else:
+        reset_database(database_url)
+    os.environ['DATABASE_URL'] = database_url
+
+    from app import create_app
+
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+def reset_database(database_url):
+    """Drop the FinTrack tables so a scratch server database starts empty."""
+    import schema
+
+    engine = create_engine(database_url)
+    try:
+        schema.metadata.drop_all(engine)
+    finally:
+        engine.dispose()
+
+
+def create_user(db, email='bench@example.com', name='Bench User'):
+    db.session.execute(
+        text('''INSERT INTO "user" (name, email, password) VALUES (:name, :email, 'x')'''),
+        {'name': name, 'email': email}
+    )
+    user_id = db.session.execute(
+        text('SELECT id FROM "user" WHERE email = :email'), {'email': email}
+    ).scalar()
+    db.session.commit()
+    return user_id
+
+
+def generate_rows(user_id, count, days=730, seed=42):
+    rng = random.Random(seed)
+    start = date.today() - timedelta(days=days)
+    for _ in range(count):
+        if rng.random() < 0.15:
+            txn_type, category = 'income', rng.choice(INCOME_CATEGORIES)
+            amount_minor = round(rng.uniform(200, 5000) * 100)
+        else:
+            txn_type, category = 'expense', rng.choice(EXPENSE_CATEGORIES)
+            amount_minor = round(rng.uniform(1, 400) * 100)
+        day = start + timedelta(days=rng.randrange(days + 1))
+        yield {
+            'type': txn_type,
+            'category': category,
+            'amount_minor': amount_minor,
+            'currency': 'USD',
+            'date': day.isoformat(),
+            'description': rng.choice(DESCRIPTIONS),
+            'user_id': user_id,
+        }
+
+
+def seed_transactions(db, user_id, count, seed=42, chunk_size=10000):
+    from categories import category_directory
+
+    category_ids = category_directory.resolve_many(user_id, INCOME_CATEGORIES + EXPENSE_CATEGORIES)
+    statement = text('''
+        INSERT INTO "transaction" (type, category_id, amount_minor, currency, date, description, user_id)
+        VALUES (:type, :category_id, :amount_minor, :currency, :date, :description, :user_id)
+    ''')
+    chunk = []
+    for row in generate_rows(user_id, count, seed=seed):
+        row['category_id'] = category_ids[row['category']]
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            db.session.execute(statement, chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(statement, chunk)
+    db.session.commit()
+
+
+class QueryCounter:
+    """Counts statements executed on an engine while active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+@contextmanager
+def timed(results, label):
+    start = time.perf_counter()
+    yield
+    results.setdefault(label, []).append(time.perf_counter() - start)
+
+
+def report(results):
+    for label, samples in results.items():
+        samples = sorted(samples)
+        median = samples[len(samples) // 2]
+        print(f'{label:<40} median {median * 1000:9.1f} ms   best {samples[0] * 1000:9.1f} ms   runs {len(samples)}')
@@ -0,0 +1,148 @@
+"""End-to-end request latency with stored baselines.
+
+Generates a seeded user with ``datagen``, then drives the main pages through
+the Flask test client: login, dashboard, transactions, analytics (page and
+chart JSON) and add_transaction. Medians are compared against
+``benchmarks/baselines/http_bench.json``; the run fails when any scenario is
+slower than its baseline by more than ``--tolerance``.
+
+    python -m benchmarks.http_bench                     # compare with the baseline
+    python -m benchmarks.http_bench --save-baseline     # record a new baseline
+
+Baselines are only comparable on the machine that recorded them; re-record
+after changing hardware. For concurrent load against a real server, see
+``benchmarks/locustfile.py``.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from benchmarks.common import make_app
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baselines', 'http_bench.json')
+
+PASSWORD = 'password'
+
+
+def scenarios(app, client, email):
+    """Return ``{name: callable}``; each callable issues one request and checks its status.
+
+    ``client`` is logged in; login itself runs on a fresh client each time.
+    """
+    counter = iter(range(10**9))
+
+    def expect(response, status):
+        if response.status_code != status:
+            raise RuntimeError(f'{response.request.path} returned {response.status_code}, expected {status}')
+
+    def login():
+        expect(app.test_client().post('/login', data={'email': email, 'password': PASSWORD}), 302)
+
+    def add_transaction():
+        expect(client.post('/add_transaction', data={
+            'type': 'expense',
+            'category': 'Dining',
+            'amount': f'{10 + next(counter) % 50}.25',
+            'date': '2026-01-15',
+            'description': 'Benchmark lunch',
+        }), 302)
+
+    return {
+        'login': login,
+        'dashboard': lambda: expect(client.get('/dashboard'), 200),
+        'transactions': lambda: expect(client.get('/transactions'), 200),
+        'transactions api page': lambda: expect(client.get('/api/transactions?limit=100'), 200),
+        'analytics': lambda: expect(client.get('/analytics'), 200),
+        'analytics charts': lambda: expect(client.get('/api/analytics/charts'), 200),
+        'add_transaction': add_transaction,
+    }
+
+
+def run(requests, rows, rounds):
+    app = make_app()
+    import datagen
+    from extensions import db
+
+    with app.app_context():
+        datagen.generate(1, rows, seed=1, email_prefix='bench', password=PASSWORD)
+        db.session.remove()
+
+    client = app.test_client()
+    email = 'bench1@example.com'
+    client.post('/login', data={'email': email, 'password': PASSWORD})
+
+    # Scenarios are interleaved over several rounds and the fastest round kept,
+    # which keeps a burst of background load from failing the comparison.
+    results = {}
+    for _ in range(rounds):
+        for name, request in scenarios(app, client, email).items():
+            request()  # warm up
+            samples = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                request()
+                samples.append(time.perf_counter() - start)
+            samples.sort()
+            timing = {
+                'median_ms': round(samples[len(samples) // 2] * 1000, 3),
+                'p95_ms': round(samples[int(len(samples) * 0.95)] * 1000, 3),
+            }
+            if name not in results or timing['median_ms'] < results[name]['median_ms']:
+                results[name] = timing
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000, help='Transactions in the benchmark user\'s history.')
+    parser.add_argument('--requests', type=int, default=30, help='Timed requests per scenario and round.')
+    parser.add_argument('--rounds', type=int, default=3, help='Rounds per scenario; the fastest is reported.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown over the baseline median.')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    results = run(args.requests, args.rows, args.rounds)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['rows'] != args.rows:
+            print(f'Baseline was recorded with --rows {baseline["rows"]}; not comparing.')
+            baseline = None
+
+    regressions = []
+    print(f'{args.rows} transactions, best of {args.rounds} rounds of {args.requests} requests per scenario')
+    for name, timing in results.items():
+        line = f'{name:<24} median {timing["median_ms"]:8.2f} ms   p95 {timing["p95_ms"]:8.2f} ms'
+        expected = baseline and baseline['scenarios'].get(name)
+        if expected:
+            ratio = timing['median_ms'] / expected['median_ms']
+            line += f'   baseline {expected["median_ms"]:8.2f} ms ({ratio:5.2f}x)'
+            if ratio > 1 + args.tolerance:
+                regressions.append(name)
+                line += '  REGRESSION'
+        print(line)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'rows': args.rows,
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'scenarios': results,
+            }, f, indent=2)
+            f.write('\n')
+        print(f'Saved baseline to {args.baseline}')
+    elif regressions:
+        print(f'{len(regressions)} scenarios regressed by more than {args.tolerance:.0%}: {", ".join(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Queries and latency saved by loading the user from the session.
+
+Requests the dashboard and transactions pages as a logged-in user twice:
+once as a session from before the profile was cached (the profile is
+removed before every request, so ``load_user`` queries ``"user"``) and once
+with the profile in the session.
+
+    python -m benchmarks.identity_bench --requests 500
+"""
+import argparse
+import time
+
+from sqlalchemy import text
+
+from benchmarks.common import QueryCounter, create_user, make_app, seed_transactions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    app = make_app()
+    import rollups
+    from extensions import db
+    from werkzeug.security import generate_password_hash
+
+    with app.app_context():
+        user_id = create_user(db)
+        db.session.execute(
+            text('UPDATE "user" SET password = :password WHERE id = :user_id'),
+            {'password': generate_password_hash('bench'), 'user_id': user_id}
+        )
+        seed_transactions(db, user_id, args.rows)
+        rollups.rebuild(user_id)
+        engine = db.engine
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'bench@example.com', 'password': 'bench'})
+
+    def drop_profile():
+        with client.session_transaction() as session:
+            session.pop('user_profile', None)
+
+    for path in ('/dashboard', '/transactions'):
+        client.get(path)  # warm the result cache and statement caches
+        for label, before_request in (('query per request', drop_profile), ('profile in session', None)):
+            elapsed = 0.0
+            with QueryCounter(engine) as counter:
+                for _ in range(args.requests):
+                    if before_request:
+                        before_request()
+                    start = time.perf_counter()
+                    response = client.get(path)
+                    elapsed += time.perf_counter() - start
+                    assert response.status_code == 200, response.status_code
+            print(
+                f'{path:<14} {label:<20} {counter.count / args.requests:5.2f} queries/request   '
+                f'{elapsed / args.requests * 1000:6.3f} ms/request'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Measure statement import throughput.
+
+    python -m benchmarks.import_bench --rows 1000000
+"""
+import argparse
+import csv
+import os
+import tempfile
+
+from benchmarks.common import create_user, generate_rows, make_app
+from money import Money
+
+
+def write_statement(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['date', 'amount', 'category', 'description'])
+        for row in rows:
+            amount = Money(row['amount_minor'] if row['type'] == 'income' else -row['amount_minor'])
+            writer.writerow([row['date'], amount, row['category'], row['description'] or ''])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    app = make_app()
+    import importer
+    from extensions import db
+
+    statement = os.path.join(tempfile.mkdtemp(prefix='fintrack-import-'), 'statement.csv')
+    write_statement(statement, generate_rows(None, args.rows))
+    print(f'Wrote {args.rows} rows ({os.path.getsize(statement) / 1e6:.1f} MB)')
+
+    with app.app_context():
+        user_id = create_user(db)
+        for label in ('first import', 're-import (all duplicates)'):
+            with open(statement, 'rb') as f:
+                report = importer.import_transactions(
+                    user_id, importer.open_text(f), 'csv', chunk_size=args.chunk_size
+                )
+            print(
+                f'{label:<28} {report.inserted:>9} inserted {report.duplicates:>9} duplicates '
+                f'{report.elapsed:8.2f}s {report.rows_per_second:>12,.0f} rows/sec'
+            )
+
+
+if __name__ == '__main__':
+    main()
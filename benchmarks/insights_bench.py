@@ -0,0 +1,82 @@
+"""Cost of the analytics insights: per-view queries versus stored results.
+
+Compares the queries the old ``generate_insights`` issued on every view with
+``insights.insights_for_user`` when every rule is recomputed, when a
+current-month expense invalidated the rules it affects, and when every
+result is already stored.
+
+    python -m benchmarks.insights_bench --rows 100000 --runs 5
+"""
+import argparse
+from datetime import date
+
+from sqlalchemy import text
+
+from benchmarks.analytics_bench import LEGACY_QUERIES, run_legacy
+from benchmarks.common import QueryCounter, create_user, make_app, report, seed_transactions, timed
+
+# The generate_insights() statements at the end of LEGACY_QUERIES
+LEGACY_INSIGHT_QUERIES = 7
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    app = make_app()
+    import insights
+    import rollups
+    from cache import bump_data_version
+    from categories import category_directory
+    from extensions import db
+
+    legacy_insights = LEGACY_QUERIES[-LEGACY_INSIGHT_QUERIES:]
+
+    with app.app_context():
+        user_id = create_user(db)
+        seed_transactions(db, user_id, args.rows)
+        rollups.rebuild(user_id)
+        print(f'Seeded {args.rows} transactions')
+
+        dining = category_directory.resolve(user_id, 'Dining')
+
+        def add_expense():
+            today = date.today().isoformat()
+            db.session.execute(text('''
+                INSERT INTO "transaction" (type, category_id, amount_minor, date, description, user_id)
+                VALUES ('expense', :category_id, 1250, :day, 'Benchmark lunch', :user_id)
+            '''), {'category_id': dining, 'day': today, 'user_id': user_id})
+            rollups.record_insert(user_id, 'expense', dining, 1250, today)
+            insights.record_change(user_id, 'expense', today)
+            bump_data_version(user_id)
+            db.session.commit()
+
+        results = {}
+        counts = {}
+        for _ in range(args.runs):
+            with QueryCounter(db.engine) as counter, timed(results, 'legacy generate_insights'):
+                run_legacy(db, user_id, legacy_insights)
+            counts['legacy generate_insights'] = counter.count
+
+            with QueryCounter(db.engine) as counter, timed(results, 'stored: recompute all rules'):
+                insights.insights_for_user(user_id, refresh=True)
+            counts['stored: recompute all rules'] = counter.count
+
+            add_expense()
+            with QueryCounter(db.engine) as counter, timed(results, 'stored: after a new expense'):
+                insights.insights_for_user(user_id)
+            counts['stored: after a new expense'] = counter.count
+
+            with QueryCounter(db.engine) as counter, timed(results, 'stored: unchanged'):
+                insights.insights_for_user(user_id)
+            counts['stored: unchanged'] = counter.count
+
+        report(results)
+        for label, count in counts.items():
+            print(f'{label:<40} {count} queries per page view')
+
+
+if __name__ == '__main__':
+    main()
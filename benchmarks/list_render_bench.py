@@ -0,0 +1,104 @@
+"""Allocation and render cost of large transaction lists.
+
+Compares the old list path (row mappings copied into dicts, then
+``datetime.fromisoformat`` on every date in the view) with
+``records.TransactionRecord`` rows whose dates are decoded by the ``Day``
+column type. Each variant fetches the rows, then renders them through the
+same table-row markup as ``dashboard/transactions.html``.
+
+    python -m benchmarks.list_render_bench --rows 50000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import text
+
+from benchmarks.common import create_user, make_app, seed_transactions
+from records import TRANSACTION_COLUMN_TYPES, transaction_records
+
+ROW_TEMPLATE = '''{% for transaction in transactions %}
+<tr>
+  <td>{{ transaction.date.strftime('%Y-%m-%d') }}</td>
+  <td><span class="badge bg-{{ 'success' if transaction.type == 'income' else 'danger' }}">{{ transaction.type.capitalize() }}</span></td>
+  <td>{{ transaction.category }}</td>
+  <td>{{ transaction.amount }}</td>
+  <td>{{ transaction.description }}</td>
+  <td>{{ transaction.id }}</td>
+</tr>
+{% endfor %}'''
+
+SELECT_ROWS = '''
+    SELECT t.id, t.type, c.name AS category, t.category_id, t.amount_minor, t.currency, t.date, t.description
+    FROM "transaction" t JOIN category c ON c.id = t.category_id
+    WHERE t.user_id = :user_id
+    ORDER BY t.date DESC, t.id DESC
+    LIMIT :limit
+'''
+
+
+def fetch_dicts(db, user_id, limit):
+    rows = db.session.execute(text(SELECT_ROWS), {'user_id': user_id, 'limit': limit}).mappings().fetchall()
+    rows = [dict(row) for row in rows]
+    for row in rows:
+        row['date'] = datetime.fromisoformat(row['date'])
+    return rows
+
+
+def fetch_records(db, user_id, limit, statement):
+    return transaction_records(db.session.execute(statement, {'user_id': user_id, 'limit': limit}))
+
+
+def measure(fetch, template, runs):
+    fetch_times, render_times = [], []
+    for _ in range(runs):
+        gc.collect()
+        start = time.perf_counter()
+        rows = fetch()
+        fetch_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        template.render(transactions=rows)
+        render_times.append(time.perf_counter() - start)
+        del rows
+
+    gc.collect()
+    tracemalloc.start()
+    rows = fetch()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(fetch_times), min(render_times), retained, peak, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    app = make_app()
+    from extensions import db
+
+    typed_statement = text(SELECT_ROWS).columns(**TRANSACTION_COLUMN_TYPES)
+
+    with app.app_context():
+        user_id = create_user(db)
+        seed_transactions(db, user_id, args.rows)
+        template = app.jinja_env.from_string(ROW_TEMPLATE)
+
+        variants = {
+            'dicts + fromisoformat': lambda: fetch_dicts(db, user_id, args.rows),
+            'TransactionRecord + Day': lambda: fetch_records(db, user_id, args.rows, typed_statement),
+        }
+        print(f'{args.rows} rows, best of {args.runs}')
+        for label, fetch in variants.items():
+            fetch_time, render_time, retained, peak, count = measure(fetch, template, args.runs)
+            print(
+                f'{label:<26} fetch {fetch_time * 1000:7.1f} ms   render {render_time * 1000:7.1f} ms   '
+                f'retained {retained / 2**20:6.1f} MiB ({retained / count:5.0f} B/row)   peak {peak / 2**20:6.1f} MiB'
+            )
+
+
+if __name__ == '__main__':
+    main()
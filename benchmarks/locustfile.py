@@ -0,0 +1,57 @@
+"""Concurrent load against a running FinTrack server with Locust.
+
+Generate users first, then start the server and Locust (``pip install locust``)::
+
+    flask data generate --users 50 --transactions-per-user 5000
+    flask run
+    locust -f benchmarks/locustfile.py --host http://127.0.0.1:5000
+
+Each simulated user logs in as one of the generated ``synthetic<n>@example.com``
+accounts and browses with a read-heavy mix, adding a transaction now and then.
+"""
+import itertools
+import os
+import random
+
+from locust import HttpUser, between, task
+
+USERS = int(os.environ.get('LOCUST_SYNTHETIC_USERS') or 50)
+EMAIL_PREFIX = os.environ.get('LOCUST_EMAIL_PREFIX') or 'synthetic'
+PASSWORD = os.environ.get('LOCUST_PASSWORD') or 'password'
+
+_account_numbers = itertools.cycle(range(1, USERS + 1))
+
+
+class FinTrackUser(HttpUser):
+    wait_time = between(0.5, 2)
+
+    def on_start(self):
+        email = f'{EMAIL_PREFIX}{next(_account_numbers)}@example.com'
+        self.client.post('/login', data={'email': email, 'password': PASSWORD}, name='login')
+
+    @task(10)
+    def dashboard(self):
+        self.client.get('/dashboard', name='dashboard')
+
+    @task(6)
+    def transactions(self):
+        self.client.get('/transactions', name='transactions')
+
+    @task(4)
+    def transactions_page(self):
+        self.client.get('/api/transactions?limit=50', name='transactions api page')
+
+    @task(3)
+    def analytics(self):
+        self.client.get('/analytics', name='analytics')
+        self.client.get('/api/analytics/charts', name='analytics charts')
+
+    @task(1)
+    def add_transaction(self):
+        self.client.post('/add_transaction', name='add_transaction', data={
+            'type': 'expense',
+            'category': random.choice(['Groceries', 'Dining', 'Transport']),
+            'amount': f'{random.uniform(2, 80):.2f}',
+            'date': '2026-01-15',
+            'description': 'Load test',
+        })
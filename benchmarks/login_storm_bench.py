@@ -0,0 +1,148 @@
+"""Dashboard latency during a login storm, with inline and pooled hashing.
+
+Serves the app from a threaded werkzeug server. Storm threads log in
+continuously, each as its own account so login throttling stays out of the
+way, while a probe thread requests the dashboard as another logged-in user
+and records its latency. Two modes are run, each in a separate process:
+
+- ``inline``: ``PASSWORD_HASH_WORKERS = 0``, hashing on the request threads;
+- ``pool``: hashing in a pool of ``--workers`` processes.
+
+    python -m benchmarks.login_storm_bench --seconds 15 --storm 8
+"""
+import argparse
+import http.client
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+from benchmarks.common import make_app
+
+MODES = ('inline', 'pool')
+PASSWORD = 'password'
+
+
+def percentile(samples, fraction):
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)] if samples else 0.0
+
+
+def login(port, email):
+    """Log in and return ``(session cookie, seconds taken)``."""
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    start = time.perf_counter()
+    connection.request(
+        'POST', '/login', urlencode({'email': email, 'password': PASSWORD}),
+        {'Content-Type': 'application/x-www-form-urlencoded'}
+    )
+    response = connection.getresponse()
+    response.read()
+    elapsed = time.perf_counter() - start
+    connection.close()
+    if response.status != 302:
+        raise RuntimeError(f'login for {email} returned {response.status}')
+    return response.getheader('Set-Cookie').split(';', 1)[0], elapsed
+
+
+def storm(port, email, stop, latencies):
+    while not stop.is_set():
+        latencies.append(login(port, email)[1])
+
+
+def probe(port, cookie, stop, latencies):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    while not stop.is_set():
+        start = time.perf_counter()
+        connection.request('GET', '/dashboard', headers={'Cookie': cookie})
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.status != 200:
+            raise RuntimeError(f'dashboard returned {response.status}')
+        time.sleep(0.01)
+
+
+def run(mode, args):
+    os.environ['PASSWORD_HASH_WORKERS'] = '0' if mode == 'inline' else str(args.workers)
+    os.environ['LOGIN_THROTTLE_PER_IP'] = str(10**9)
+    app = make_app()
+    import datagen
+    from extensions import db
+    from werkzeug.serving import make_server
+
+    with app.app_context():
+        datagen.generate(args.storm + 1, args.rows, seed=1, email_prefix='storm', password=PASSWORD)
+        db.session.remove()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    cookie, _ = login(port, f'storm{args.storm + 1}@example.com')
+    stop = threading.Event()
+
+    def measure_dashboard():
+        latencies = []
+        stop.clear()
+        thread = threading.Thread(target=probe, args=(port, cookie, stop, latencies))
+        thread.start()
+        return thread, latencies
+
+    # Quiet period first, then the storm
+    thread, quiet = measure_dashboard()
+    time.sleep(args.seconds / 3)
+    stop.set()
+    thread.join()
+
+    thread, loaded = measure_dashboard()
+    logins = []
+    stormers = [
+        threading.Thread(target=storm, args=(port, f'storm{number}@example.com', stop, logins))
+        for number in range(1, args.storm + 1)
+    ]
+    for stormer in stormers:
+        stormer.start()
+    time.sleep(args.seconds)
+    stop.set()
+    thread.join()
+    for stormer in stormers:
+        stormer.join()
+    server.shutdown()
+
+    print(f'\n{mode}: {args.storm} login threads, PASSWORD_HASH_WORKERS={os.environ["PASSWORD_HASH_WORKERS"]}')
+    for label, samples in (('dashboard, quiet', quiet), ('dashboard, storm', loaded), ('login, storm', logins)):
+        samples.sort()
+        print(
+            f'  {label:<18} n={len(samples):5d}   p50 {percentile(samples, 0.5) * 1000:8.1f} ms   '
+            f'p99 {percentile(samples, 0.99) * 1000:8.1f} ms   max {samples[-1] * 1000 if samples else 0:8.1f} ms'
+        )
+    print(f'  logins/sec {len(logins) / args.seconds:.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=MODES)
+    parser.add_argument('--seconds', type=float, default=15)
+    parser.add_argument('--storm', type=int, default=8, help='Concurrent login threads.')
+    parser.add_argument('--workers', type=int, default=1, help='Hashing processes in pool mode.')
+    parser.add_argument('--rows', type=int, default=2000, help='Transactions per generated account.')
+    args = parser.parse_args()
+
+    if args.mode:
+        run(args.mode, args)
+        return
+
+    for mode in MODES:
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.login_storm_bench', '--mode', mode]
+            + [f'--{name.replace("_", "-")}={value}' for name, value in vars(args).items() if name != 'mode'],
+            check=True
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Compare integer minor-unit amounts with float amounts on a large history.
+
+Seeds one user, copies the amounts into a scratch table of float major-unit
+amounts with the same covering index, then times the same aggregates over
+both: per-type SUM, per-category GROUP BY, a Python running balance and
+pandas sums. Also reports how far the float results drift from the exact
+integer totals.
+
+    python -m benchmarks.money_bench --rows 1000000 --runs 5
+    python -m benchmarks.money_bench --database-url postgresql+psycopg://localhost/fintrack_bench
+"""
+import argparse
+
+from sqlalchemy import text
+
+from benchmarks.common import create_user, make_app, report, seed_transactions, timed
+
+QUERIES = {
+    'SUM by type': '''
+        SELECT type, SUM({amount}) FROM {table} WHERE user_id = :user_id GROUP BY type
+    ''',
+    'SUM by category': '''
+        SELECT category_id, SUM({amount}) FROM {table}
+        WHERE user_id = :user_id AND type = 'expense' GROUP BY category_id
+    ''',
+    'SUM in month window': '''
+        SELECT SUM({amount}) FROM {table}
+        WHERE user_id = :user_id AND type = 'expense' AND date >= :start AND date < :end
+    ''',
+}
+
+INTEGER = {'table': '"transaction"', 'amount': 'amount_minor'}
+FLOAT = {'table': 'float_amount', 'amount': 'amount'}
+
+
+def create_float_table(db, user_id):
+    db.session.execute(text('DROP TABLE IF EXISTS float_amount'))
+    db.session.execute(text('''
+        CREATE TABLE float_amount AS
+        SELECT user_id, type, category_id, date, amount_minor / 100.0 AS amount
+        FROM "transaction" WHERE user_id = :user_id
+    '''), {'user_id': user_id})
+    db.session.execute(text('CREATE INDEX ix_float_amount ON float_amount (user_id, type, date, amount)'))
+    db.session.execute(text('CREATE INDEX ix_float_amount_category ON float_amount (user_id, type, category_id, amount)'))
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+
+
+def running_balance_drift(minor_amounts):
+    """Count balances where a float running total no longer rounds to the exact cents."""
+    exact = 0
+    total = 0.0
+    drifted = 0
+    for minor in minor_amounts:
+        exact += minor
+        total += minor / 100
+        if round(total * 100) != exact:
+            drifted += 1
+    return drifted, abs(total * 100 - exact)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--database-url', default=None, help='Scratch database; defaults to a temporary SQLite file.')
+    args = parser.parse_args()
+
+    app = make_app(database_url=args.database_url)
+    from extensions import db
+
+    with app.app_context():
+        user_id = create_user(db)
+        seed_transactions(db, user_id, args.rows)
+        # The category GROUP BY gets the same covering index on both sides
+        db.session.execute(text(
+            'CREATE INDEX ix_bench_category ON "transaction" (user_id, type, category_id, amount_minor)'
+        ))
+        create_float_table(db, user_id)
+        print(f'Seeded {args.rows} transactions on {db.engine.dialect.name}')
+
+        params = {'user_id': user_id, 'start': '2000-01-01', 'end': '9999-12-31'}
+        results = {}
+        for _ in range(args.runs):
+            for name, query in QUERIES.items():
+                for label, names in (('integer', INTEGER), ('float', FLOAT)):
+                    with timed(results, f'{name}: {label}'):
+                        db.session.execute(text(query.format(**names)), params).fetchall()
+
+        signed = '''
+            SELECT CASE WHEN type = 'income' THEN {amount} ELSE -{amount} END
+            FROM {table} WHERE user_id = :user_id ORDER BY date
+        '''
+        minor_amounts = db.session.execute(text(signed.format(**INTEGER)), params).scalars().all()
+        float_amounts = db.session.execute(text(signed.format(**FLOAT)), params).scalars().all()
+        for _ in range(args.runs):
+            with timed(results, 'Python sum: integer'):
+                sum(minor_amounts)
+            with timed(results, 'Python sum: float'):
+                sum(float_amounts)
+
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        if np is not None:
+            minor_array = np.array(minor_amounts, dtype=np.int64)
+            float_array = np.array(float_amounts, dtype=np.float64)
+            for _ in range(args.runs):
+                with timed(results, 'NumPy sum: int64'):
+                    minor_array.sum()
+                with timed(results, 'NumPy sum: float64'):
+                    float_array.sum()
+
+        report(results)
+
+        exact = sum(minor_amounts)
+        sql_float = db.session.execute(
+            text('SELECT SUM(CASE WHEN type = \'income\' THEN amount ELSE -amount END) FROM float_amount')
+        ).scalar()
+        drifted, error = running_balance_drift(minor_amounts)
+        print(f'\nexact balance              {exact} minor units')
+        print(f'float SUM() balance error  {abs(sql_float * 100 - exact):.6f} minor units')
+        print(f'running float balance      {drifted} of {len(minor_amounts)} balances off by a cent or more, '
+              f'final error {error:.6f} minor units')
+
+        db.session.execute(text('DROP TABLE float_amount'))
+        db.session.commit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Compare FTS5 search with ``LIKE '%term%'`` scans of transaction descriptions.
+
+Generates realistic histories with ``datagen`` (10 users by default, so the
+index holds other users' rows too), then for each term times the first
+page of ``search.search_transactions`` against the first page of the
+transaction list's substring filter, and counting every match through the
+index against a full ``LIKE`` scan. SQLite only.
+
+    python -m benchmarks.search_bench --rows 1000000 --runs 5
+"""
+import argparse
+
+from sqlalchemy import text
+
+from benchmarks.common import make_app, report, timed
+
+# Frequent words, a rarer word, a prefix, two words, and a word that never matches
+TERMS = ['coffee', 'concert', 'tra', 'dinner out', 'zebra']
+
+LIKE_COUNT = '''
+    SELECT COUNT(*) FROM "transaction"
+    WHERE user_id = :user_id AND lower(description) LIKE lower(:pattern)
+'''
+
+FTS_COUNT = 'SELECT COUNT(*) FROM transaction_fts WHERE transaction_fts MATCH :match'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    app = make_app()
+    import datagen
+    import search
+    from extensions import db
+    from transaction_query import fetch_page
+
+    with app.app_context():
+        user_ids, written = datagen.generate(args.users, args.rows // args.users, email_prefix='search')
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        user_id = user_ids[0]
+        print(f'Generated {written} transactions for {len(user_ids)} users; searching user {user_id}')
+
+        results = {}
+        matches = {}
+        for _ in range(args.runs):
+            for term in TERMS:
+                with timed(results, f'{term!r}: FTS5 first page'):
+                    search.search_transactions(user_id, term, limit=20)
+                with timed(results, f'{term!r}: LIKE first page'):
+                    fetch_page(user_id, {'q': term}, limit=20)
+                with timed(results, f'{term!r}: FTS5 count'):
+                    fts = db.session.execute(
+                        text(FTS_COUNT), {'match': search.match_expression(user_id, term)}
+                    ).scalar()
+                with timed(results, f'{term!r}: LIKE count'):
+                    like = db.session.execute(
+                        text(LIKE_COUNT), {'user_id': user_id, 'pattern': f'%{term}%'}
+                    ).scalar()
+                matches[term] = (fts, like)
+        report(results)
+
+        print()
+        for term, (fts, like) in matches.items():
+            print(f'{term!r:<14} {fts:>8} FTS5 matches (word prefixes, with category)   {like:>8} LIKE matches')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""Concurrent read/write load test for the SQLite connection profiles.
+
+Reader threads run the dashboard queries while writer threads add
+transactions the way ``add_transaction`` (``--batch 1``) and statement
+imports (``--batch 5000``) do: insert, rollup update, data version bump,
+commit. Reports reader latency and throughput for each profile::
+
+    python -m benchmarks.sqlite_concurrency_bench --seconds 10 --readers 4 --writers 2 --batch 500
+
+Readers and writers run as separate processes. Without ``--profile`` both the ``baseline`` and ``tuned`` profiles are run,
+each in its own process and database.
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from benchmarks.common import create_user, make_app, seed_transactions
+
+PROFILES = ('baseline', 'tuned')
+
+
+def percentile(samples, fraction):
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)] if samples else 0.0
+
+
+def reader(app, user_id, stop, results):
+    from extensions import db
+
+    latencies, errors = [], 0
+    with app.app_context():
+        # Connections must not be shared with the parent process
+        db.engine.dispose(close=False)
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                db.session.execute(
+                    text('''
+                        SELECT t.id, t.type, c.name, t.amount_minor, t.currency, t.date, t.description
+                        FROM "transaction" t JOIN category c ON c.id = t.category_id
+                        WHERE t.user_id = :user_id
+                        ORDER BY t.date DESC, t.id DESC
+                        LIMIT 5
+                    '''),
+                    {'user_id': user_id}
+                ).fetchall()
+                db.session.execute(
+                    text('''
+                        SELECT type, category_id, SUM(total_minor)
+                        FROM monthly_rollup
+                        WHERE user_id = :user_id
+                        GROUP BY type, category_id
+                    '''),
+                    {'user_id': user_id}
+                ).fetchall()
+                db.session.rollback()
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+    results.put(('read', latencies, errors))
+
+
+def writer(app, user_id, stop, results, hold, batch):
+    from cache import bump_data_version
+    from categories import category_directory
+    from extensions import db
+    import rollups
+
+    latencies, errors = [], 0
+    with app.app_context():
+        db.engine.dispose(close=False)
+        rows = [{
+            'type': 'expense',
+            # Seeded by seed_transactions, so this only reads the category dictionary
+            'category_id': category_directory.resolve(user_id, 'Groceries'),
+            'amount_minor': 1250,
+            'currency': 'USD',
+            'date': date.today().isoformat(),
+            'description': 'Load test',
+            'user_id': user_id,
+        }] * batch
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                db.session.execute(
+                    text('''
+                        INSERT INTO "transaction" (type, category_id, amount_minor, currency, date, description, user_id)
+                        VALUES (:type, :category_id, :amount_minor, :currency, :date, :description, :user_id)
+                    '''),
+                    rows
+                )
+                rollups.record_bulk(user_id, rows)
+                bump_data_version(user_id)
+                # Stands in for the rest of the request while the write lock is held
+                time.sleep(hold)
+                db.session.commit()
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+    results.put(('write', latencies, errors))
+
+
+def run(profile, args):
+    os.environ['SQLITE_PROFILE'] = profile
+    app = make_app()
+    from extensions import db
+    import rollups
+
+    with app.app_context():
+        user_id = create_user(db)
+        seed_transactions(db, user_id, args.rows)
+        rollups.rebuild(user_id)
+
+    # Separate processes, like a multi-worker server, so the GIL does not skew latencies
+    context = multiprocessing.get_context('fork')
+    stop = context.Event()
+    results = context.Queue()
+    workers = [
+        context.Process(target=reader, args=(app, user_id, stop, results))
+        for _ in range(args.readers)
+    ] + [
+        context.Process(target=writer, args=(app, user_id, stop, results, args.hold_ms / 1000, args.batch))
+        for _ in range(args.writers)
+    ]
+    for worker in workers:
+        worker.start()
+    time.sleep(args.seconds)
+    stop.set()
+
+    read_latencies, read_errors = [], 0
+    write_latencies, write_errors = [], 0
+    for _ in workers:
+        kind, latencies, errors = results.get()
+        if kind == 'read':
+            read_latencies += latencies
+            read_errors += errors
+        else:
+            write_latencies += latencies
+            write_errors += errors
+    for worker in workers:
+        worker.join()
+
+    reads = sorted(read_latencies)
+    print(
+        f'{profile:<9} reads {len(reads) / args.seconds:9.0f}/s  '
+        f'p50 {percentile(reads, 0.5) * 1000:7.2f} ms  p99 {percentile(reads, 0.99) * 1000:8.2f} ms  '
+        f'max {(reads[-1] if reads else 0) * 1000:8.2f} ms  errors {read_errors}  |  '
+        f'commits {len(write_latencies) / args.seconds:6.0f}/s  errors {write_errors}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--profile', choices=PROFILES)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--batch', type=int, default=1, help='Rows inserted per write transaction.')
+    parser.add_argument('--hold-ms', type=float, default=5, help='Time each write keeps its transaction open.')
+    args = parser.parse_args()
+
+    if args.profile:
+        run(args.profile, args)
+        return
+
+    # Config is read once per process, so each profile gets a fresh interpreter
+    for profile in PROFILES:
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.sqlite_concurrency_bench', '--profile', profile]
+            + [f'--{name.replace("_", "-")}={value}' for name, value in vars(args).items() if name != 'profile'],
+            check=True
+        )
+
+
+if __name__ == '__main__':
+    main()
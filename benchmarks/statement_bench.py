@@ -0,0 +1,97 @@
+"""Per-request SQL overhead: inline ``text()`` versus the statement registry.
+
+Replays the statements an authenticated dashboard and transaction detail
+request runs (identity, data version, recent transactions, totals, category
+names, one transaction) against a small database, so the timings are
+dominated by statement construction and compilation rather than I/O.
+
+    python -m benchmarks.statement_bench --requests 2000
+"""
+import argparse
+import time
+
+from sqlalchemy import text
+
+from benchmarks.common import create_user, make_app, seed_transactions
+
+
+def inline_request(db, user_id, txn_id):
+    """The request as the views issued it before ``statements.py``."""
+    execute = db.session.execute
+    execute(text('SELECT id, name, email FROM "user" WHERE id = :user_id'), {'user_id': user_id}).mappings().fetchone()
+    execute(text('SELECT data_version FROM "user" WHERE id = :user_id'), {'user_id': user_id}).scalar()
+    execute(text('''
+        SELECT t.*, c.name AS category FROM "transaction" t JOIN category c ON c.id = t.category_id
+        WHERE t.user_id = :user_id ORDER BY t.date DESC, t.id DESC LIMIT 5
+    '''), {'user_id': user_id}).mappings().fetchall()
+    execute(text('''
+        SELECT type, category_id, SUM(total_minor) AS total_minor
+        FROM monthly_rollup
+        WHERE user_id = :user_id
+        GROUP BY type, category_id
+    '''), {'user_id': user_id}).mappings().fetchall()
+    execute(text('SELECT id, name FROM category WHERE user_id = :user_id'), {'user_id': user_id}).mappings().fetchall()
+    execute(text('''
+        SELECT t.*, c.name AS category FROM "transaction" t JOIN category c ON c.id = t.category_id
+        WHERE t.id = :id AND t.user_id = :user_id
+    '''), {'id': txn_id, 'user_id': user_id}).mappings().fetchone()
+
+
+def registry_request(statements, user_id, txn_id):
+    statements.USER_BY_ID(user_id=user_id)
+    statements.DATA_VERSION(user_id=user_id)
+    statements.RECENT_TRANSACTIONS(user_id=user_id)
+    statements.DASHBOARD_TOTALS(user_id=user_id)
+    statements.USER_CATEGORIES(user_id=user_id)
+    statements.TRANSACTION_BY_ID(id=txn_id, user_id=user_id)
+
+
+def measure(requests, run):
+    start = time.perf_counter()
+    for _ in range(requests):
+        run()
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--database-url', default=None, help='Scratch database; defaults to a temporary SQLite file.')
+    args = parser.parse_args()
+
+    app = make_app(database_url=args.database_url)
+    import rollups
+    import statements
+    from extensions import db
+
+    with app.app_context():
+        user_id = create_user(db)
+        seed_transactions(db, user_id, args.rows)
+        rollups.rebuild(user_id)
+        txn_id = db.session.execute(
+            text('SELECT MAX(id) FROM "transaction" WHERE user_id = :user_id'), {'user_id': user_id}
+        ).scalar()
+
+        variants = {
+            'inline text()': lambda: inline_request(db, user_id, txn_id),
+            'statement registry': lambda: registry_request(statements, user_id, txn_id),
+        }
+        for run in variants.values():
+            measure(50, run)
+
+        results = {label: [] for label in variants}
+        for _ in range(args.runs):
+            for label, run in variants.items():
+                results[label].append(measure(args.requests, run))
+
+        print(f'{len(statements.REGISTRY)} registered statements, 6 per request')
+        for label, samples in results.items():
+            samples.sort()
+            median = samples[len(samples) // 2]
+            print(f'{label:<24} median {median * 1e6:8.1f} us/request   best {samples[0] * 1e6:8.1f} us/request')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""Monthly spending limits per expense category.
+
+A budget caps what the user spends on one category each month. The
+spent-to-date counter it is measured against is the category's expense row
+in ``monthly_rollup``, which every write path already updates in the same
+transaction as the transaction itself, so whether a category is over budget
+is a primary key lookup rather than an aggregation of the month's rows.
+``overruns`` checks the categories a write touched; ``budget_status`` lists
+every budget for the dashboard.
+
+``reconcile`` verifies the counters of budgeted categories against raw
+transactions for a month and rebuilds the user's rollups when they disagree.
+It runs as the ``budgets.reconcile`` job and as ``flask budgets reconcile``.
+"""
+from datetime import date
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import text
+
+from cache import bump_data_version
+from categories import category_directory
+from extensions import db
+import insights
+from money import DEFAULT_CURRENCY, Money
+import rollups
+import statements
+from validation import MAX_CATEGORY_LENGTH, ValidationError
+
+_MONTH_EXPENSES = text('''
+    SELECT category_id, CAST(SUM(amount_minor) AS BIGINT) AS total_minor
+    FROM "transaction"
+    WHERE user_id = :user_id AND type = 'expense' AND date >= :start AND date < :end
+    GROUP BY category_id
+''')
+
+_BUDGET_USERS = text('SELECT DISTINCT user_id FROM budget ORDER BY user_id')
+
+
+def _status(row, name, month):
+    spent = row['spent_minor']
+    limit = row['budget_minor']
+    return {
+        'category': name,
+        'category_id': row['category_id'],
+        'month': month,
+        'budget': Money(limit, row['currency']),
+        'spent': Money(spent, row['currency']),
+        'remaining': Money(max(limit - spent, 0), row['currency']),
+        'over_by': Money(max(spent - limit, 0), row['currency']),
+        'percent': round(spent * 100 / limit),
+        'over': spent > limit,
+    }
+
+
+def budget_status(user_id, today=None):
+    """Return the user's budgets for the current month, by category name."""
+    month = insights.current_period(today)
+    rows = statements.BUDGET_STATUS(user_id=user_id, month=month)
+    names = category_directory.names_by_id(user_id, [row['category_id'] for row in rows])
+    return sorted(
+        (_status(row, names[row['category_id']], month) for row in rows),
+        key=lambda status: status['category']
+    )
+
+
+def overruns(user_id, rows):
+    """Return the status of each budget that the written ``rows`` leave overspent.
+
+    ``rows`` are mappings with ``type``, ``category_id`` and ``date``; each
+    category and month among the expenses costs one lookup.
+    """
+    keys = {
+        (row['category_id'], rollups.rollup_day(row['date'])[:7]) for row in rows if row['type'] == 'expense'
+    }
+    over = []
+    for category_id, month in sorted(keys):
+        row = statements.CATEGORY_BUDGET_STATUS(user_id=user_id, category_id=category_id, month=month)
+        if row is not None and row['spent_minor'] > row['budget_minor']:
+            over.append((category_id, month, row))
+    if not over:
+        return []
+    names = category_directory.names_by_id(user_id, [category_id for category_id, _, _ in over])
+    return [_status(row, names[category_id], month) for category_id, month, row in over]
+
+
+def overrun_message(status):
+    return (
+        f'You are over your {status["category"]} budget for '
+        f'{date.fromisoformat(status["month"] + "-01"):%B %Y}: '
+        f'{status["spent"].format()} spent of {status["budget"].format()}.'
+    )
+
+
+def set_budget(user_id, category, amount, currency=DEFAULT_CURRENCY):
+    """Validate and store the monthly budget of a category; return its id (caller commits).
+
+    Raises ``ValidationError`` for a blank or too long category name or an
+    amount that is not greater than zero.
+    """
+    category = (category or '').strip()
+    if not category:
+        raise ValidationError('Choose a category for the budget.')
+    if len(category) > MAX_CATEGORY_LENGTH:
+        raise ValidationError(f'Category must be at most {MAX_CATEGORY_LENGTH} characters.')
+    try:
+        amount = Money.parse(amount, currency)
+    except ValueError as e:
+        raise ValidationError(str(e))
+    if not amount.minor > 0:
+        raise ValidationError('Budget must be greater than 0.')
+
+    category_id = category_directory.resolve(user_id, category)
+    statements.UPSERT_BUDGET(
+        user_id=user_id, category_id=category_id, amount_minor=amount.minor, currency=amount.currency
+    )
+    insights.record_budget_change(user_id)
+    bump_data_version(user_id)
+    return category_id
+
+
+def remove_budget(user_id, category_id):
+    """Delete the budget of a category (caller commits)."""
+    statements.DELETE_BUDGET(user_id=user_id, category_id=category_id)
+    insights.record_budget_change(user_id)
+    bump_data_version(user_id)
+
+
+def reconcile(user_id, month=None, repair=True):
+    """Compare the user's budgeted spending counters for ``month`` with raw transactions.
+
+    Returns ``{'month', 'checked', 'mismatches', 'repaired'}``, where
+    ``mismatches`` lists ``(category_id, expected, actual)`` minor-unit
+    totals. With ``repair``, a mismatch rebuilds the user's rollups.
+    """
+    month = month or insights.current_period()
+    counters = {
+        row['category_id']: row['spent_minor'] for row in statements.BUDGET_STATUS(user_id=user_id, month=month)
+    }
+    expected = {
+        row.category_id: row.total_minor
+        for row in db.session.execute(_MONTH_EXPENSES, {
+            'user_id': user_id, 'start': f'{month}-01', 'end': f'{insights.shift_month(month, 1)}-01',
+        })
+    }
+    mismatches = [
+        (category_id, expected.get(category_id, 0), actual)
+        for category_id, actual in sorted(counters.items())
+        if expected.get(category_id, 0) != actual
+    ]
+
+    repaired = False
+    if mismatches and repair:
+        rollups.rebuild(user_id)
+        insights.invalidate(user_id)
+        bump_data_version(user_id)
+        db.session.commit()
+        repaired = True
+    return {'month': month, 'checked': len(counters), 'mismatches': mismatches, 'repaired': repaired}
+
+
+def budget_users():
+    """Ids of the users with at least one budget."""
+    return db.session.execute(_BUDGET_USERS).scalars().all()
+
+
+budgets_cli = AppGroup('budgets', help='Check the spending counters behind budgets.')
+
+
+@budgets_cli.command('reconcile')
+@click.option('--user-id', type=int, default=None, help='Only check this user.')
+@click.option('--month', default=None, help="'YYYY-MM' month to check; defaults to the current one.")
+@click.option('--check-only', is_flag=True, help='Report mismatches without rebuilding the rollups.')
+def reconcile_command(user_id, month, check_only):
+    """Verify budgeted spending counters against raw transactions."""
+    user_ids = [user_id] if user_id is not None else budget_users()
+    inconsistent = 0
+    for uid in user_ids:
+        result = reconcile(uid, month, repair=not check_only)
+        for category_id, expected, actual in result['mismatches']:
+            click.echo(f'user {uid} category {category_id} {result["month"]}: expected {expected}, found {actual}')
+        if result['mismatches']:
+            inconsistent += 1
+            if result['repaired']:
+                click.echo(f'user {uid}: rollups rebuilt')
+    if inconsistent and check_only:
+        raise click.ClickException(f'{inconsistent} users have inconsistent budget counters.')
+    click.echo(f'Checked budgets of {len(user_ids)} users.')
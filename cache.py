@@ -0,0 +1,221 @@
+"""Per-user result cache for expensive page computations.
+
+Cached values are keyed by user and by the user's ``data_version``, a counter
+on the ``user`` row that every write route bumps in the same transaction as the
+write. A stale entry is therefore never read again; it simply ages out through
+TTL or LRU eviction. Two backends are available:
+
+- ``memory``: an in-process LRU bounded by ``CACHE_MAX_ENTRIES`` with a TTL.
+- ``filesystem``: pickled entries under ``CACHE_DIR``, shared by every worker
+  process on the host.
+
+``CACHE_BACKEND = 'null'`` disables caching.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import statements
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class NullCache:
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key):
+        self.stats.incr('misses')
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class MemoryCache:
+    """Thread-safe LRU with per-entry expiry."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.stats.hits += 1
+                    return value
+                del self._entries[key]
+                self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FileSystemCache:
+    """Pickled entries in a directory shared by worker processes.
+
+    Counters are per process; the entries themselves are shared.
+    """
+
+    def __init__(self, directory, max_entries):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.cache')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires_at, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.stats.incr('misses')
+            return None
+
+        if expires_at <= time.time():
+            self._remove(path)
+            self.stats.incr('expirations')
+            self.stats.incr('misses')
+            return None
+
+        # Touch the file so eviction treats it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.stats.incr('hits')
+        return value
+
+    def set(self, key, value, ttl):
+        # Write to a temporary file and rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((time.time() + ttl, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def _entries(self):
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith('.cache')]
+
+    def _evict(self):
+        entries = self._entries()
+        overflow = len(entries) - self.max_entries
+        if overflow <= 0:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:overflow]:
+            if self._remove(entry.path):
+                self.stats.incr('evictions')
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def __len__(self):
+        return len(self._entries())
+
+
+class ResultCache:
+    """Flask extension wrapping the configured cache backend."""
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        self.default_ttl = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        max_entries = app.config.get('CACHE_MAX_ENTRIES', 1024)
+        if backend == 'memory':
+            self.backend = MemoryCache(max_entries)
+        elif backend == 'filesystem':
+            directory = app.config.get('CACHE_DIR') or os.path.join(app.instance_path, 'cache')
+            self.backend = FileSystemCache(directory, max_entries)
+        elif backend == 'null':
+            self.backend = NullCache()
+        else:
+            raise ValueError(f'Unknown CACHE_BACKEND {backend!r}')
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 300)
+        app.extensions['result_cache'] = self
+
+    def get_or_compute(self, user_id, name, compute, ttl=None, version=None):
+        """Return the cached result of ``compute()`` for the user's current data.
+
+        ``name`` identifies the computation and must include anything else the
+        result depends on (for example the current date). ``version`` skips
+        the data version lookup when the caller has already read it.
+        """
+        if version is None:
+            version = data_version(user_id)
+        key = f'{name}:{user_id}:{version}'
+        value = self.backend.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.backend.set(key, value, ttl or self.default_ttl)
+        return value
+
+    def stats(self):
+        return dict(self.backend.stats.as_dict(), entries=len(self.backend))
+
+
+def data_version(user_id):
+    return statements.DATA_VERSION(user_id=user_id) or 0
+
+
+def bump_data_version(user_id):
+    """Invalidate every cached result for the user (caller commits)."""
+    statements.BUMP_DATA_VERSION(user_id=user_id)
+
+
+result_cache = ResultCache()
@@ -0,0 +1,143 @@
+"""Per-user category dictionary.
+
+Transactions and rollups reference categories by integer ``category_id``.
+Each process keeps the categories of recently active users in an in-process
+LRU of name -> id and id -> name maps, so resolving a category on a write,
+naming the rows of an aggregate and filling the category dropdown cost no
+query once a user's categories are loaded.
+
+Categories are only ever added, never renamed or removed, so a cached entry
+can be incomplete but never wrong:
+
+- A name missing from the entry is created (or found, when another process
+  created it) in the caller's transaction by ``resolve``. The new id is added
+  to the entry only when that transaction commits, so a rolled-back category
+  is never cached.
+- An id missing from the entry (created by another process) reloads it.
+- Entries expire after ``CATEGORY_CACHE_TTL`` seconds, which bounds how long
+  a category added by another process can be missing from the dropdown.
+
+Entries are loaded on their own connection, so they only ever hold
+committed categories.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+from extensions import db
+import statements
+
+# Session.info key of the categories created in the session's transaction
+PENDING_KEY = 'categories_created'
+
+
+class UserCategories:
+    __slots__ = ('ids', 'names', 'expires_at')
+
+    def __init__(self, rows, expires_at):
+        self.ids = {name: category_id for category_id, name in rows}
+        self.names = {category_id: name for category_id, name in rows}
+        self.expires_at = expires_at
+
+
+class CategoryDirectory:
+    def __init__(self):
+        self.max_users = 1024
+        self.ttl = 300
+        self.loads = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_users = app.config['CATEGORY_CACHE_MAX_USERS']
+        self.ttl = app.config['CATEGORY_CACHE_TTL']
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _load(self, user_id):
+        with db.engine.connect() as connection:
+            rows = connection.execute(statements.USER_CATEGORIES.clause, {'user_id': user_id}).all()
+        entry = UserCategories(rows, time.monotonic() + self.ttl)
+        with self._lock:
+            self.loads += 1
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _entry(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self._entries.move_to_end(user_id)
+                return entry
+        return self._load(user_id)
+
+    def names(self, user_id):
+        """The user's category names, sorted, for pickers and filters."""
+        return sorted(self._entry(user_id).ids)
+
+    def names_by_id(self, user_id, ids=()):
+        """Return the user's ``{category_id: name}``, reloading if any of ``ids`` is unknown."""
+        entry = self._entry(user_id)
+        if any(category_id not in entry.names for category_id in ids):
+            entry = self._load(user_id)
+        return entry.names
+
+    def resolve(self, user_id, name):
+        """Return the id of the user's category ``name``, creating it if needed (caller commits)."""
+        return self.resolve_many(user_id, (name,))[name]
+
+    def resolve_many(self, user_id, names):
+        """Return ``{name: category_id}`` for ``names``, creating missing categories (caller commits)."""
+        entry = self._entry(user_id)
+        pending = db.session.info.setdefault(PENDING_KEY, {})
+        ids = {}
+        missing = []
+        for name in set(names):
+            category_id = entry.ids.get(name) or pending.get((user_id, name))
+            if category_id is None:
+                missing.append(name)
+            else:
+                ids[name] = category_id
+
+        if missing:
+            # Sorted so the same writes always assign the same ids
+            statements.INSERT_CATEGORY([{'name': name, 'user_id': user_id} for name in sorted(missing)])
+            created = {row['name']: row['id'] for row in statements.USER_CATEGORIES(user_id=user_id)}
+            for name in missing:
+                ids[name] = pending[(user_id, name)] = created[name]
+        return ids
+
+    def _publish(self, session):
+        pending = session.info.pop(PENDING_KEY, None)
+        if not pending:
+            return
+        by_user = {}
+        for (user_id, name), category_id in pending.items():
+            by_user.setdefault(user_id, {})[name] = category_id
+        with self._lock:
+            for user_id, created in by_user.items():
+                entry = self._entries.get(user_id)
+                if entry is not None:
+                    # Replaced rather than updated, so readers never see a dict change size
+                    entry.ids = {**entry.ids, **created}
+                    entry.names = {**entry.names, **{category_id: name for name, category_id in created.items()}}
+
+    def _discard(self, session):
+        session.info.pop(PENDING_KEY, None)
+
+    def stats(self):
+        return {'users': len(self._entries), 'loads': self.loads}
+
+
+category_directory = CategoryDirectory()
+
+event.listen(db.session, 'after_commit', category_directory._publish)
+event.listen(db.session, 'after_rollback', category_directory._discard)
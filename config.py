@@ -2,8 +2,33 @@ import os
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-here'
+    # A SQLite file by default; a PostgreSQL URL (postgresql+psycopg://...) also works
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///fintech.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # SQLite connection profile applied to every pooled connection (see extensions.init_db).
+    # 'tuned' lets dashboard reads proceed while a write is in progress; 'baseline'
+    # restores the rollback journal and the driver defaults.
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE') or 'tuned'
+    SQLITE_PRAGMAS = {
+        'tuned': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024),
+            # Negative values are KiB rather than pages
+            'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB') or 64 * 1024),
+            'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS') or 5000),
+            'foreign_keys': 'ON',
+        },
+        'baseline': {
+            'journal_mode': 'DELETE',
+        },
+    }
+
+    # Connection pool for threaded servers (file databases only)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 10)
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT') or 30)
     
     # Mail settings
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
@@ -12,6 +37,63 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     
+    # Password hashing (see passwords.py). The method string carries the cost;
+    # stored hashes made with another method are upgraded at the next login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE') or 16)
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT') or 10)
+
+    # Failed logins allowed per client address and per email in each window (seconds)
+    LOGIN_THROTTLE_WINDOW = int(os.environ.get('LOGIN_THROTTLE_WINDOW') or 900)
+    LOGIN_THROTTLE_PER_IP = int(os.environ.get('LOGIN_THROTTLE_PER_IP') or 20)
+    LOGIN_THROTTLE_PER_EMAIL = int(os.environ.get('LOGIN_THROTTLE_PER_EMAIL') or 5)
+
     # Application settings
     TRANSACTIONS_PER_PAGE = 10
+    TRANSACTIONS_API_MAX_LIMIT = 100
+    IMPORT_CHUNK_SIZE = 5000
+
+    # Operations accepted by one POST /api/transactions/batch request
+    BATCH_MAX_OPERATIONS = int(os.environ.get('BATCH_MAX_OPERATIONS') or 500)
+
+    # Statement uploads larger than this are imported by a background job
+    IMPORT_INLINE_MAX_BYTES = int(os.environ.get('IMPORT_INLINE_MAX_BYTES') or 1024 * 1024)
+
+    # Background jobs (see jobs.py): worker threads per web process (0 leaves
+    # jobs to `flask jobs work`), idle poll interval and running-job lease, in seconds
+    JOBS_WORKERS = int(os.environ.get('JOBS_WORKERS') or 2)
+    JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL') or 2)
+    JOBS_LEASE_SECONDS = int(os.environ.get('JOBS_LEASE_SECONDS') or 300)
+    JOBS_DIR = os.environ.get('JOBS_DIR')
+    # Finished jobs and their files (exports) are deleted after this many seconds
+    JOBS_RETENTION_SECONDS = int(os.environ.get('JOBS_RETENTION_SECONDS') or 7 * 24 * 3600)
+
+    # Analytics backend: 'sql' (rollups plus a single pass) or 'pandas' (vectorized)
+    ANALYTICS_BACKEND = os.environ.get('ANALYTICS_BACKEND') or 'sql'
+    # Calendar windows (in days) of the rolling expense series
+    ANALYTICS_ROLLING_WINDOWS = (7, 30, 90)
+
+    # Result cache: 'memory' (per process), 'filesystem' (shared by workers) or 'null'
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'memory'
+    CACHE_DIR = os.environ.get('CACHE_DIR')
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES') or 1024)
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL') or 300)
+
+    # Per-process category dictionary (see categories.py): users kept, and seconds
+    # before a user's categories are reloaded to pick up other processes' additions
+    CATEGORY_CACHE_MAX_USERS = int(os.environ.get('CATEGORY_CACHE_MAX_USERS') or 10000)
+    CATEGORY_CACHE_TTL = int(os.environ.get('CATEGORY_CACHE_TTL') or 300)
+
+    # Operational endpoints under /ops (cache statistics), served like /metrics
+    # only when INSTRUMENTATION_METRICS_TOKEN is set and sent as a bearer token
+    OPS_ENDPOINTS_ENABLED = os.environ.get('OPS_ENDPOINTS_ENABLED', '').lower() in ('1', 'true', 'yes')
+
+    # Request/SQL metrics, Server-Timing headers and ?_profile=1 (see instrumentation.py).
+    # /metrics is only served when a token is set, to requests sending
+    # "Authorization: Bearer <token>"; ?_profile=1 also needs PROFILING and debug mode.
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', '').lower() in ('1', 'true', 'yes')
+    INSTRUMENTATION_METRICS_TOKEN = os.environ.get('INSTRUMENTATION_METRICS_TOKEN')
+    INSTRUMENTATION_PROFILING = os.environ.get('INSTRUMENTATION_PROFILING', '').lower() in ('1', 'true', 'yes')
+    INSTRUMENTATION_PROFILE_DIR = os.environ.get('INSTRUMENTATION_PROFILE_DIR')
     
@@ -0,0 +1,221 @@
+"""Seeded synthetic users and transaction histories for capacity testing.
+
+Each generated user gets a persona (salary, pay day, rent, spending level)
+and a history of:
+
+- recurring monthly rows: salary, rent, utilities, phone and subscriptions;
+- occasional freelance income;
+- discretionary spending drawn day by day, busier at weekends and scaled by
+  season (December gifts and shopping, summer travel).
+
+The same seed and end date always produce the same users and rows; histories
+end on ``DEFAULT_END`` unless ``--end`` is given. Rows are written with
+``executemany`` in chunks, each chunk committed together with its rollup and
+category updates, so millions of rows can be generated in one run::
+
+    flask data generate --users 100 --transactions-per-user 10000 --seed 7
+"""
+import math
+import random
+import time
+from datetime import date, timedelta
+
+import click
+from flask.cli import AppGroup
+
+from cache import bump_data_version
+from categories import category_directory
+from extensions import db
+import insights
+from money import DEFAULT_CURRENCY, minor_per_major
+from passwords import password_hasher
+import rollups
+import search
+import statements
+
+DEFAULT_DAYS = 730
+# A fixed default so a seed alone reproduces a run on any day
+DEFAULT_END = date(2025, 12, 31)
+DEFAULT_CHUNK_SIZE = 10000
+
+# Generated amounts are in DEFAULT_CURRENCY
+MINOR_PER_MAJOR = minor_per_major(DEFAULT_CURRENCY)
+
+# Rows per month from the recurring schedule (salary, rent, utilities, phone, subscriptions)
+RECURRING_PER_MONTH = 5
+
+# category: (relative frequency, median amount, spread as lognormal sigma, descriptions)
+DISCRETIONARY = {
+    'Groceries': (30, 45.0, 0.5, ['Supermarket', 'Farmers market', 'Corner shop']),
+    'Dining': (18, 28.0, 0.6, ['Lunch', 'Dinner out', 'Coffee', 'Takeaway']),
+    'Transport': (20, 12.0, 0.7, ['Bus ticket', 'Train fare', 'Fuel', 'Taxi']),
+    'Entertainment': (8, 35.0, 0.7, ['Movie tickets', 'Concert', 'Games']),
+    'Shopping': (10, 60.0, 0.9, ['Clothes', 'Electronics', 'Home goods']),
+    'Health': (4, 40.0, 0.8, ['Pharmacy', 'Doctor', 'Gym']),
+    'Travel': (3, 250.0, 0.9, ['Flight', 'Hotel', 'Weekend trip']),
+    'Gifts': (2, 50.0, 0.8, ['Birthday gift', 'Flowers']),
+}
+
+# Spending multipliers by month (index 0 = January)
+SEASONAL = {
+    'Shopping': [0.8, 0.8, 0.9, 0.9, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.3, 1.9],
+    'Travel': [0.5, 0.5, 0.7, 0.9, 1.0, 1.8, 2.4, 2.2, 1.0, 0.7, 0.5, 1.3],
+    'Gifts': [0.4, 0.9, 0.6, 0.6, 0.8, 0.7, 0.7, 0.7, 0.7, 0.8, 1.2, 4.0],
+    'Entertainment': [0.8, 0.9, 1.0, 1.0, 1.1, 1.2, 1.2, 1.2, 1.0, 1.0, 0.9, 1.3],
+}
+
+# Discretionary activity by weekday (Monday = 0)
+WEEKDAY_ACTIVITY = [0.85, 0.85, 0.9, 0.95, 1.15, 1.4, 1.0]
+
+
+class Persona:
+    """Per-user spending parameters drawn from the generator's RNG."""
+
+    def __init__(self, rng):
+        self.salary = round(rng.uniform(2500, 9000), -1)
+        self.pay_day = rng.choice([1, 15, 28])
+        self.rent = round(self.salary * rng.uniform(0.2, 0.35), -1)
+        self.utilities = rng.uniform(60, 180)
+        self.phone = round(rng.uniform(15, 60), 2)
+        self.subscriptions = round(rng.uniform(8, 40), 2)
+        self.freelance_chance = rng.choice([0.0, 0.0, 0.02, 0.05])
+        self.spending = rng.uniform(0.6, 1.6)
+
+
+def _poisson(rng, mean):
+    # Knuth's method; the daily means here are small
+    limit = math.exp(-mean)
+    count, product = 0, rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+def _row(txn_type, category, amount, day, description, user_id):
+    return {
+        'type': txn_type,
+        'category': category,
+        'amount_minor': round(amount * MINOR_PER_MAJOR),
+        'currency': DEFAULT_CURRENCY,
+        'date': day.isoformat(),
+        'description': description,
+        'user_id': user_id,
+    }
+
+
+def generate_history(rng, user_id, transactions, days=DEFAULT_DAYS, end=DEFAULT_END):
+    """Yield about ``transactions`` rows for one user over the ``days`` days up to ``end``."""
+    start = end - timedelta(days=days - 1)
+    persona = Persona(rng)
+
+    months = days / 30.44
+    discretionary_rate = max(transactions - RECURRING_PER_MONTH * months, 0) / days
+
+    categories = list(DISCRETIONARY)
+    weights = [DISCRETIONARY[category][0] for category in categories]
+
+    day = start
+    for _ in range(days):
+        month = day.month - 1
+        if day.day == persona.pay_day:
+            yield _row('income', 'Salary', persona.salary, day, 'Monthly salary', user_id)
+        if day.day == 1:
+            yield _row('expense', 'Rent', persona.rent, day, 'Rent', user_id)
+        if day.day == 5:
+            # Heating in winter, cooling in summer
+            swing = 1 + 0.3 * math.cos(2 * math.pi * month / 12) ** 2
+            yield _row('expense', 'Utilities', persona.utilities * swing, day, 'Electricity and water', user_id)
+        if day.day == 12:
+            yield _row('expense', 'Utilities', persona.phone, day, 'Phone bill', user_id)
+        if day.day == 20:
+            yield _row('expense', 'Subscriptions', persona.subscriptions, day, 'Streaming', user_id)
+        if rng.random() < persona.freelance_chance:
+            yield _row('income', 'Freelance', rng.uniform(150, 2000), day, 'Freelance project', user_id)
+
+        for _ in range(_poisson(rng, discretionary_rate * WEEKDAY_ACTIVITY[day.weekday()])):
+            category = rng.choices(categories, weights)[0]
+            if category in SEASONAL and rng.random() > SEASONAL[category][month] / 4:
+                # Thin out off-season rows; peak months keep up to four times as many
+                category = 'Groceries'
+            _, median, sigma, descriptions = DISCRETIONARY[category]
+            amount = max(rng.lognormvariate(math.log(median * persona.spending), sigma), 0.5)
+            yield _row('expense', category, amount, day, rng.choice(descriptions), user_id)
+
+        day += timedelta(days=1)
+
+
+def _write_chunk(user_id, chunk):
+    category_ids = category_directory.resolve_many(user_id, {row['category'] for row in chunk})
+    for row in chunk:
+        row['category_id'] = category_ids[row['category']]
+    statements.INSERT_TRANSACTION(chunk)
+    rollups.record_bulk(user_id, chunk)
+    search.record_bulk(user_id, chunk)
+    insights.record_bulk(user_id, chunk)
+    bump_data_version(user_id)
+    db.session.commit()
+
+
+def generate(users, transactions_per_user, seed=42, days=DEFAULT_DAYS, end=DEFAULT_END,
+             email_prefix='synthetic', password='password', chunk_size=DEFAULT_CHUNK_SIZE):
+    """Create ``users`` users with generated histories; return ``(user ids, rows written)``.
+
+    Users are named ``<email_prefix><n>@example.com`` and all share ``password``.
+    """
+    rng = random.Random(seed)
+    password_hash = password_hasher.hash_password(password)
+    user_ids = []
+    written = 0
+
+    for number in range(1, users + 1):
+        email = f'{email_prefix}{number}@example.com'
+        if statements.USER_ID_BY_EMAIL(email=email) is not None:
+            raise ValueError(f'A user with email {email} already exists.')
+        statements.INSERT_USER(name=f'Synthetic User {number}', email=email, password=password_hash)
+        user_id = statements.USER_ID_BY_EMAIL(email=email)
+        user_ids.append(user_id)
+
+        chunk = []
+        for row in generate_history(rng, user_id, transactions_per_user, days, end):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                _write_chunk(user_id, chunk)
+                written += len(chunk)
+                chunk = []
+        if chunk:
+            _write_chunk(user_id, chunk)
+            written += len(chunk)
+
+    db.session.commit()
+    return user_ids, written
+
+
+data_cli = AppGroup('data', help='Synthetic data for development and load tests.')
+
+
+@data_cli.command('generate')
+@click.option('--users', default=10, show_default=True, help='Number of users to create.')
+@click.option('--transactions-per-user', default=2000, show_default=True, help='Approximate rows per user.')
+@click.option('--days', default=DEFAULT_DAYS, show_default=True, help='Length of each history in days.')
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), default=DEFAULT_END.isoformat(), show_default=True,
+              help='Last day of each history.')
+@click.option('--seed', default=42, show_default=True, help='Random seed; the same seed gives the same data.')
+@click.option('--email-prefix', default='synthetic', show_default=True, help='Users are <prefix><n>@example.com.')
+@click.option('--password', default='password', show_default=True, help='Password of every generated user.')
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True, help='Rows per insert transaction.')
+def generate_command(users, transactions_per_user, days, end, seed, email_prefix, password, chunk_size):
+    """Create users with seeded, realistic transaction histories."""
+    started = time.perf_counter()
+    try:
+        user_ids, written = generate(
+            users, transactions_per_user, seed=seed, days=days, end=end.date(), email_prefix=email_prefix,
+            password=password, chunk_size=chunk_size
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    elapsed = time.perf_counter() - started
+    click.echo(
+        f'Created {len(user_ids)} users and {written} transactions in {elapsed:.1f}s '
+        f'({written / elapsed:,.0f} rows/sec).'
+    )
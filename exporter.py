@@ -0,0 +1,184 @@
+"""Streaming export of a user's transactions.
+
+Rows are read through a streaming cursor in batches of
+``EXPORT_BATCH_SIZE`` and encoded batch by batch, so memory stays bounded
+whatever the history size. CSV and NDJSON are produced as generators of text
+chunks for a streamed response; Parquet needs a file footer, so it is written
+batch by batch to a temporary file that is then streamed and removed.
+Parquet support requires the optional ``pyarrow`` package.
+
+Amounts are exported exactly: as decimal strings in CSV and NDJSON and as a
+decimal column in Parquet, each next to the row's currency code.
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+
+import click
+from sqlalchemy import text
+
+from extensions import db
+from money import CURRENCY_EXPONENTS, Money
+from records import TRANSACTION_COLUMNS, TRANSACTION_TABLES
+from transaction_query import FilterError, filter_clause, parse_filters
+
+EXPORT_FORMATS = ('csv', 'ndjson', 'parquet')
+
+EXPORT_BATCH_SIZE = 5000
+
+FIELDS = ['id', 'date', 'type', 'category', 'amount', 'currency', 'description']
+
+# Parquet stores every amount at the largest minor-unit scale of any currency
+PARQUET_AMOUNT_SCALE = max(CURRENCY_EXPONENTS.values())
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+class ExportError(ValueError):
+    """Raised when an export cannot be produced in the requested format."""
+
+
+def iter_batches(user_id, filters, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of row mappings, oldest first, from a streaming cursor.
+
+    Rows carry ``amount`` as a ``Money`` built from the stored minor units.
+    """
+    where, params = filter_clause(filters)
+    params['user_id'] = user_id
+    result = db.session.execute(
+        text(f'''
+            SELECT {TRANSACTION_COLUMNS}
+            FROM {TRANSACTION_TABLES}
+            WHERE t.user_id = :user_id{where}
+            ORDER BY t.date, t.id
+        '''),
+        params,
+        execution_options={'stream_results': True, 'yield_per': batch_size}
+    ).mappings()
+    for batch in result.partitions(batch_size):
+        yield [{**row, 'amount': Money(row['amount_minor'], row['currency'])} for row in batch]
+
+
+def _csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for batch in batches:
+        writer.writerows([row[field] for field in FIELDS] for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _ndjson_chunks(batches):
+    for batch in batches:
+        yield ''.join(
+            json.dumps({**{field: row[field] for field in FIELDS}, 'amount': str(row['amount'])}) + '\n'
+            for row in batch
+        )
+
+
+def _parquet_file(batches):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError('Parquet export requires the pyarrow package.')
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('date', pa.string()),
+        ('type', pa.string()),
+        ('category', pa.string()),
+        ('amount', pa.decimal128(38, PARQUET_AMOUNT_SCALE)),
+        ('currency', pa.string()),
+        ('description', pa.string()),
+    ])
+    fd, path = tempfile.mkstemp(suffix='.parquet')
+    os.close(fd)
+    try:
+        with pq.ParquetWriter(path, schema) as writer:
+            for batch in batches:
+                columns = {field: [row[field] for row in batch] for field in FIELDS}
+                columns['amount'] = [amount.decimal for amount in columns['amount']]
+                writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def _file_chunks(path, chunk_size=65536):
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def export_chunks(user_id, filters, file_format):
+    """Return an iterator of ``str``/``bytes`` chunks for the export.
+
+    Parquet is fully written (to a temporary file) before the first chunk is
+    returned so that errors surface before a response starts streaming.
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ExportError(f'Unsupported format {file_format!r}; expected one of {", ".join(EXPORT_FORMATS)}.')
+
+    batches = iter_batches(user_id, filters)
+    if file_format == 'csv':
+        return _csv_chunks(batches)
+    if file_format == 'ndjson':
+        return _ndjson_chunks(batches)
+    return _file_chunks(_parquet_file(batches))
+
+
+@click.command('export-transactions')
+@click.option('--email', required=True, help='Owner of the exported transactions.')
+@click.option('--format', 'file_format', type=click.Choice(EXPORT_FORMATS), default='csv', show_default=True)
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), required=True)
+@click.option('--type', 'txn_type', default=None)
+@click.option('--category', default=None)
+@click.option('--date-from', default=None)
+@click.option('--date-to', default=None)
+@click.option('--min-amount', default=None)
+@click.option('--max-amount', default=None)
+@click.option('--q', default=None, help='Description substring.')
+def export_command(email, file_format, output, txn_type, category, date_from, date_to, min_amount, max_amount, q):
+    """Export a user's transactions to CSV, NDJSON or Parquet."""
+    user_id = db.session.execute(
+        text('SELECT id FROM "user" WHERE email = :email'), {'email': email}
+    ).scalar()
+    if user_id is None:
+        raise click.ClickException(f'No user with email {email}.')
+
+    try:
+        filters = parse_filters({
+            'type': txn_type,
+            'category': category,
+            'date_from': date_from,
+            'date_to': date_to,
+            'min_amount': min_amount,
+            'max_amount': max_amount,
+            'q': q,
+        })
+        chunks = export_chunks(user_id, filters, file_format)
+    except (FilterError, ExportError) as e:
+        raise click.ClickException(str(e))
+
+    with open(output, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk.encode() if isinstance(chunk, str) else chunk)
+    click.echo(f'Wrote {output}.')
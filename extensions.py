@@ -1,7 +1,51 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_mail import Mail
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 
 db = SQLAlchemy()
 login_manager = LoginManager()
-mail = Mail() 
\ No newline at end of file
+mail = Mail()
+
+
+def _is_memory_database(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def init_db(app):
+    """Initialize ``db`` with the configured pool sizing and SQLite profile.
+
+    Pool options only apply to file databases; in-memory SQLite keeps
+    Flask-SQLAlchemy's single static connection. The pragmas of
+    ``SQLITE_PRAGMAS[SQLITE_PROFILE]`` are run on every new connection.
+    """
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if not _is_memory_database(uri):
+        options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        options.setdefault('pool_size', app.config['DB_POOL_SIZE'])
+        options.setdefault('max_overflow', app.config['DB_MAX_OVERFLOW'])
+        options.setdefault('pool_timeout', app.config['DB_POOL_TIMEOUT'])
+
+    db.init_app(app)
+
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    profile = app.config['SQLITE_PROFILE']
+    try:
+        pragmas = app.config['SQLITE_PRAGMAS'][profile]
+    except KeyError:
+        raise ValueError(f'Unknown SQLITE_PROFILE {profile!r}')
+
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+        finally:
+            cursor.close()
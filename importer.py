@@ -0,0 +1,363 @@
+"""Streaming import of bank statements (CSV, OFX and QIF).
+
+Files are parsed record by record and never held in memory as a whole.
+Parsed rows go through the same validation as ``add_transaction`` and are
+written in chunks: one category lookup (usually answered from
+``categories.category_directory``), one duplicate lookup, one
+``executemany`` insert and one rollup update per chunk, each chunk committed
+in its own transaction.
+
+Duplicates are detected against the rows the user had before the import
+started, matching on date, type, amount (in minor units) and description. Matching is
+count-aware, so re-importing a statement with two identical coffees on the
+same day skips both, while a new statement that repeats them inserts both.
+"""
+import csv
+import io
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+import click
+from sqlalchemy import bindparam, text
+
+from cache import bump_data_version
+from categories import category_directory
+from extensions import db
+import insights
+import rollups
+import search
+from validation import DEFAULT_CATEGORY, ValidationError, clean_transaction
+
+IMPORT_FORMATS = ('csv', 'ofx', 'qif')
+
+MAX_REPORTED_ERRORS = 100
+
+# Days fetched per duplicate lookup query
+DUPLICATE_LOOKUP_DAYS = 500
+
+QIF_DATE_FORMATS = ('%m/%d/%Y', '%m/%d/%y', '%Y-%m-%d', '%d.%m.%Y')
+
+_TYPE_ALIASES = {
+    'income': 'income',
+    'credit': 'income',
+    'expense': 'expense',
+    'debit': 'expense',
+}
+
+
+class ImportReport:
+    def __init__(self):
+        self.parsed = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    @property
+    def rows_per_second(self):
+        return self.parsed / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'parsed': self.parsed,
+            'inserted': self.inserted,
+            'duplicates': self.duplicates,
+            'errors': self.error_count,
+            'error_samples': [{'line': line, 'message': message} for line, message in self.errors],
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+def _signed(amount, txn_type):
+    """Resolve type and a positive amount from a signed statement amount.
+
+    The amount is kept as a decimal string so validation parses it exactly.
+    """
+    if txn_type:
+        return _TYPE_ALIASES.get(txn_type.strip().lower(), txn_type.strip().lower()), amount
+    try:
+        value = Decimal(amount.strip().replace(',', ''))
+    except (AttributeError, InvalidOperation):
+        return 'expense', amount
+    # copy_abs and is_signed skip the decimal context, which overflows on huge exponents
+    return ('expense' if value.is_signed() else 'income'), str(value.copy_abs())
+
+
+def parse_csv(stream):
+    """Yield ``(line, fields)`` from a CSV with a header row.
+
+    ``date`` and ``amount`` columns are required; ``type``, ``category`` and
+    ``description`` are optional. Without a ``type`` column, negative amounts
+    are expenses and positive amounts income.
+    """
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = {name.strip().lower(): index for index, name in enumerate(header)}
+    for required in ('date', 'amount'):
+        if required not in columns:
+            raise ValidationError(f'CSV header is missing the "{required}" column.')
+
+    def column(row, name):
+        index = columns.get(name)
+        return row[index].strip() if index is not None and index < len(row) else ''
+
+    for row in reader:
+        if not row:
+            continue
+        txn_type, amount = _signed(column(row, 'amount'), column(row, 'type'))
+        yield reader.line_num, {
+            'type': txn_type,
+            'category': column(row, 'category'),
+            'amount': amount,
+            'date': column(row, 'date'),
+            'description': column(row, 'description') or None,
+        }
+
+
+_OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+def _ofx_tags(stream, chunk_size=65536):
+    """Yield ``(closing, tag, value)`` for every tag in an OFX (SGML or XML) stream."""
+    buffer = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        buffer += chunk
+        # Only consume tags whose value is known to be complete
+        end = max(buffer.rfind('<'), 0) if chunk else len(buffer)
+        for match in _OFX_TAG.finditer(buffer, 0, end):
+            yield match.group(1) == '/', match.group(2).upper(), match.group(3).strip()
+        buffer = buffer[end:]
+        if not chunk:
+            return
+
+
+def parse_ofx(stream):
+    """Yield ``(record number, fields)`` for each ``<STMTTRN>`` in an OFX file."""
+    record = None
+    number = 0
+    for closing, tag, value in _ofx_tags(stream):
+        if tag == 'STMTTRN':
+            if not closing:
+                record = {}
+                continue
+            if record is not None:
+                number += 1
+                yield number, _ofx_fields(record)
+            record = None
+        elif record is not None and not closing:
+            record[tag] = value
+
+
+def _ofx_fields(record):
+    posted = record.get('DTPOSTED', '')[:8]
+    txn_type, amount = _signed(record.get('TRNAMT', ''), None)
+    return {
+        'type': txn_type,
+        'category': DEFAULT_CATEGORY,
+        'amount': amount,
+        'date': f'{posted[:4]}-{posted[4:6]}-{posted[6:8]}' if len(posted) == 8 else posted,
+        'description': record.get('NAME') or record.get('MEMO') or None,
+    }
+
+
+def _qif_date(value):
+    value = value.replace("'", '/').replace(' ', '')
+    for date_format in QIF_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date().isoformat()
+        except ValueError:
+            continue
+    return value
+
+
+def parse_qif(stream):
+    """Yield ``(line, fields)`` for each ``^``-terminated QIF record."""
+    record = {}
+    for line_number, line in enumerate(stream, start=1):
+        line = line.rstrip('\r\n')
+        if not line or line.startswith('!'):
+            continue
+        code, value = line[0], line[1:].strip()
+        if code == '^':
+            if record:
+                txn_type, amount = _signed(record.get('T', ''), None)
+                yield line_number, {
+                    'type': txn_type,
+                    'category': record.get('L', ''),
+                    'amount': amount,
+                    'date': _qif_date(record.get('D', '')),
+                    'description': record.get('P') or record.get('M') or None,
+                }
+            record = {}
+        else:
+            record[code] = value
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'ofx': parse_ofx,
+    'qif': parse_qif,
+}
+
+
+def detect_format(filename):
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    return extension if extension in PARSERS else None
+
+
+def _duplicate_key(row):
+    return row['date'], row['type'], row['amount_minor'], row['description'] or ''
+
+
+class _ChunkWriter:
+    def __init__(self, user_id, report):
+        self.user_id = user_id
+        self.report = report
+        # Rows inserted by this import must not count as pre-existing duplicates
+        self.baseline_id = db.session.execute(text('SELECT COALESCE(MAX(id), 0) FROM "transaction"')).scalar()
+        # day -> Counter of duplicate keys still available to match on that day.
+        # Each existing row is loaded at most once, however the file is ordered.
+        self.existing = {}
+
+    def _load_days(self, days):
+        missing = sorted(days - self.existing.keys())
+        for start in range(0, len(missing), DUPLICATE_LOOKUP_DAYS):
+            batch = missing[start:start + DUPLICATE_LOOKUP_DAYS]
+            for day in batch:
+                self.existing[day] = Counter()
+            rows = db.session.execute(
+                text('''
+                    SELECT date, type, amount_minor, description FROM "transaction"
+                    WHERE user_id = :user_id AND date IN :days AND id <= :baseline_id
+                ''').bindparams(bindparam('days', expanding=True)),
+                {'user_id': self.user_id, 'days': batch, 'baseline_id': self.baseline_id}
+            ).mappings()
+            for row in rows:
+                self.existing[row['date']][_duplicate_key(row)] += 1
+
+    def write(self, chunk):
+        self._load_days({row['date'] for row in chunk})
+        fresh = []
+        for row in chunk:
+            available = self.existing[row['date']]
+            key = _duplicate_key(row)
+            if available[key] > 0:
+                available[key] -= 1
+                self.report.duplicates += 1
+            else:
+                fresh.append(row)
+
+        if not fresh:
+            return
+
+        category_ids = category_directory.resolve_many(self.user_id, {row['category'] for row in fresh})
+        for row in fresh:
+            row['category_id'] = category_ids[row['category']]
+
+        db.session.execute(
+            text('''
+                INSERT INTO "transaction" (type, category_id, amount_minor, currency, date, description, user_id)
+                VALUES (:type, :category_id, :amount_minor, :currency, :date, :description, :user_id)
+            '''),
+            fresh
+        )
+        rollups.record_bulk(self.user_id, fresh)
+        search.record_bulk(self.user_id, fresh)
+        insights.record_bulk(self.user_id, fresh)
+        bump_data_version(self.user_id)
+        db.session.commit()
+        self.report.inserted += len(fresh)
+
+
+def import_transactions(user_id, stream, file_format, date_format='%Y-%m-%d', chunk_size=5000, on_chunk=None):
+    """Import a statement from a text ``stream`` and return an ``ImportReport``.
+
+    ``on_chunk(report)`` is called after each chunk is committed.
+    """
+    if file_format not in PARSERS:
+        raise ValidationError(f'Unsupported format {file_format!r}; expected one of {", ".join(IMPORT_FORMATS)}.')
+
+    report = ImportReport()
+    writer = _ChunkWriter(user_id, report)
+    chunk = []
+
+    for line, fields in PARSERS[file_format](stream):
+        report.parsed += 1
+        try:
+            row = clean_transaction(
+                fields['type'],
+                fields['category'],
+                fields['amount'],
+                fields['date'],
+                fields['description'],
+                date_format=date_format if file_format == 'csv' else '%Y-%m-%d'
+            )
+        except ValidationError as e:
+            report.add_error(line, str(e))
+            continue
+        row['user_id'] = user_id
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            writer.write(chunk)
+            chunk = []
+            if on_chunk is not None:
+                on_chunk(report)
+
+    if chunk:
+        writer.write(chunk)
+
+    report.elapsed = time.perf_counter() - report.started
+    return report
+
+
+def open_text(binary_stream):
+    """Wrap an uploaded binary stream for line-by-line text parsing."""
+    return io.TextIOWrapper(binary_stream, encoding='utf-8-sig', errors='replace', newline='')
+
+
+@click.command('import-transactions')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--email', required=True, help='Owner of the imported transactions.')
+@click.option('--format', 'file_format', type=click.Choice(IMPORT_FORMATS), default=None,
+              help='File format; detected from the extension when omitted.')
+@click.option('--date-format', default='%Y-%m-%d', show_default=True, help='strptime format of CSV dates.')
+@click.option('--chunk-size', default=5000, show_default=True, help='Rows per insert transaction.')
+def import_command(path, email, file_format, date_format, chunk_size):
+    """Import a CSV, OFX or QIF statement for a user."""
+    user_id = db.session.execute(
+        text('SELECT id FROM "user" WHERE email = :email'), {'email': email}
+    ).scalar()
+    if user_id is None:
+        raise click.ClickException(f'No user with email {email}.')
+
+    file_format = file_format or detect_format(path)
+    if file_format is None:
+        raise click.ClickException('Cannot detect the file format; pass --format.')
+
+    with open(path, 'rb') as f:
+        try:
+            report = import_transactions(user_id, open_text(f), file_format, date_format, chunk_size)
+        except ValidationError as e:
+            raise click.ClickException(str(e))
+
+    for line, message in report.errors:
+        click.echo(f'line {line}: {message}', err=True)
+    click.echo(
+        f'Parsed {report.parsed} rows: {report.inserted} inserted, {report.duplicates} duplicates, '
+        f'{report.error_count} errors in {report.elapsed:.2f}s ({report.rows_per_second:,.0f} rows/sec).'
+    )
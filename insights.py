@@ -0,0 +1,318 @@
+"""Per-user insights, stored and refreshed only when their inputs change.
+
+Each insight rule is registered with ``@rule`` along with what it depends on:
+the transaction types it reads and, for rules about the current month, how
+many earlier months it looks at. Results are stored per user and rule in the
+``insight`` table. The write paths call ``record_change``, ``record_update``
+or ``record_bulk`` next to the rollup updates, which delete only the stored
+results the write can affect: an income leaves the spending rules alone, and
+an expense dated last year leaves this month's comparisons alone. Setting or
+removing a budget calls ``record_budget_change``. Results of
+month-dependent rules also expire when the month rolls over.
+``insights_for_user`` recomputes whatever is missing or expired, mostly
+from ``monthly_rollup``, and returns the rest as stored.
+
+A result is stored only if the user's ``data_version`` is unchanged since
+it was read before computing, so a write that lands while a rule runs never
+leaves a stale result behind.
+"""
+import json
+from datetime import date
+
+from cache import data_version
+from categories import category_directory
+from extensions import db
+from money import Money
+from rollups import rollup_day
+import statements
+
+FREQUENT_EXPENSE_MIN_COUNT = 3
+
+# A category with a budget (see budgets.py) is over budget when this month's
+# spending exceeds it; one without, when it exceeds its average over this
+# many preceding months
+BUDGET_BASELINE_MONTHS = 3
+
+# An expense is unusual at this multiple of its category's average expense,
+# once the category has at least UNUSUAL_MIN_HISTORY expenses
+UNUSUAL_MULTIPLE = 3
+UNUSUAL_MIN_HISTORY = 5
+
+# Most budget and unusual-transaction insights shown at once
+MAX_ITEMS = 3
+
+RULES = {}
+
+
+class Rule:
+    __slots__ = ('kind', 'compute', 'types', 'monthly', 'months')
+
+    def __init__(self, kind, compute, types, monthly, months):
+        self.kind = kind
+        self.compute = compute
+        self.types = types
+        self.monthly = monthly
+        self.months = months
+
+    def affected_by(self, type, month, period):
+        """Whether a write of ``type`` dated in ``month`` can change this rule's result in ``period``."""
+        if type not in self.types:
+            return False
+        if self.months is None:
+            return True
+        return shift_month(period, -self.months) <= month <= period
+
+
+def rule(kind, types=('expense',), monthly=False, months=None):
+    """Register an insight rule computed as ``compute(user_id, period)``.
+
+    ``types`` are the transaction types the rule reads. The result of a
+    ``monthly`` rule describes the current month and expires with it. A rule
+    that only reads the current month and the ``months`` before it is
+    affected only by writes dated in that window; with ``months = None``,
+    writes of any date affect it.
+    """
+    def register(compute):
+        RULES[kind] = Rule(kind, compute, frozenset(types), monthly, months)
+        return compute
+    return register
+
+
+def shift_month(period, months):
+    """Move a ``'YYYY-MM'`` month by ``months`` (negative for earlier)."""
+    index = int(period[:4]) * 12 + int(period[5:7]) - 1 + months
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+
+def current_period(today=None):
+    return (today or date.today()).isoformat()[:7]
+
+
+def affected_kinds(type, txn_date, period):
+    month = rollup_day(txn_date)[:7]
+    return {kind for kind, insight_rule in RULES.items() if insight_rule.affected_by(type, month, period)}
+
+
+def _invalidate(user_id, kinds):
+    if kinds:
+        statements.DELETE_INSIGHT([{'user_id': user_id, 'kind': kind} for kind in sorted(kinds)])
+
+
+def record_change(user_id, type, txn_date, today=None):
+    """Drop the stored results an inserted or deleted transaction affects (caller commits)."""
+    _invalidate(user_id, affected_kinds(type, txn_date, current_period(today)))
+
+
+def record_update(user_id, old, new, today=None):
+    """Like ``record_change`` for both sides of an update.
+
+    ``old`` and ``new`` are mappings with ``type`` and ``date`` keys.
+    """
+    period = current_period(today)
+    _invalidate(
+        user_id,
+        affected_kinds(old['type'], old['date'], period) | affected_kinds(new['type'], new['date'], period)
+    )
+
+
+def record_bulk(user_id, rows, today=None):
+    """Like ``record_change`` for many inserted or deleted rows with ``type`` and ``date`` keys."""
+    period = current_period(today)
+    kinds = set()
+    seen = set()
+    for row in rows:
+        key = (row['type'], rollup_day(row['date'])[:7])
+        if key in seen:
+            continue
+        seen.add(key)
+        kinds |= affected_kinds(row['type'], row['date'], period)
+        if len(kinds) == len(RULES):
+            break
+    _invalidate(user_id, kinds)
+
+
+def record_budget_change(user_id):
+    """Drop the stored budget insight after a budget was set or removed (caller commits)."""
+    _invalidate(user_id, {'budget'})
+
+
+def invalidate(user_id):
+    """Drop every stored result for the user, e.g. after a rollup rebuild (caller commits)."""
+    _invalidate(user_id, RULES)
+
+
+def insights_for_user(user_id, today=None, refresh=False):
+    """Return the user's insights, recomputing only missing or expired results.
+
+    ``refresh`` recomputes every rule. New results are written on their own
+    connection, so calling this leaves the session's transaction read-only.
+    """
+    period = current_period(today)
+    stored = {} if refresh else {row['kind']: row for row in statements.USER_INSIGHTS(user_id=user_id)}
+
+    version = None
+    computed = []
+    insights = []
+    for kind, insight_rule in RULES.items():
+        row = stored.get(kind)
+        if row is not None and not (insight_rule.monthly and row['period'] != period):
+            insights.extend(json.loads(row['items']))
+            continue
+        if version is None:
+            version = data_version(user_id)
+        items = insight_rule.compute(user_id, period)
+        computed.append({
+            'user_id': user_id, 'kind': kind, 'period': period, 'items': json.dumps(items), 'version': version,
+        })
+        insights.extend(items)
+
+    if computed:
+        with db.engine.begin() as connection:
+            connection.execute(statements.STORE_INSIGHT.clause, computed)
+    return insights
+
+
+@rule('spending')
+def _spending(user_id, period):
+    categories = statements.INSIGHT_EXPENSE_CATEGORIES(user_id=user_id)
+    total = sum(row['total_minor'] for row in categories)
+    count = sum(row['txn_count'] for row in categories)
+    average = Money(round(total / count) if count else 0)
+
+    insights = [{
+        'title': 'Average Spending',
+        'message': f'Your average spending is ${average}. Consider reducing it if necessary.'
+    }]
+
+    names = category_directory.names_by_id(user_id, [row['category_id'] for row in categories])
+    top_categories = [
+        names[row['category_id']]
+        for row in sorted(categories, key=lambda row: row['total_minor'], reverse=True)[:3]
+        if row['total_minor']
+    ]
+    if top_categories:
+        insights.append({
+            'title': 'Top Spending Categories',
+            'message': f'Your top 3 spending categories are: {", ".join(top_categories)}.'
+        })
+    return insights
+
+
+@rule('balance', types=('income', 'expense'))
+def _balance(user_id, period):
+    totals = {row['type']: row['total_minor'] for row in statements.TYPE_TOTALS(user_id=user_id)}
+    if (totals.get('expense') or 0) > (totals.get('income') or 0):
+        return [{
+            'title': 'Spending Alert',
+            'message': 'Your expenses exceed your income. Consider reviewing your spending habits.'
+        }]
+    return [{
+        'title': 'Good Job',
+        'message': 'Your income exceeds your expenses. Keep up the good financial management!'
+    }]
+
+
+@rule('monthly_change', monthly=True, months=1)
+def _monthly_change(user_id, period):
+    last_period = shift_month(period, -1)
+    spent = {period: 0, last_period: 0}
+    for row in statements.INSIGHT_MONTHLY_EXPENSES(user_id=user_id, start=last_period, end=period):
+        spent[row['month']] += row['total_minor']
+
+    if spent[period] > spent[last_period]:
+        return [{
+            'title': 'Increased Spending',
+            'message': 'Your spending has increased compared to the previous month.'
+        }]
+    if spent[period] < spent[last_period]:
+        return [{
+            'title': 'Reduced Spending',
+            'message': 'Good job! Your spending has decreased compared to the previous month.'
+        }]
+    return [{
+        'title': 'Stable Spending',
+        'message': 'Your spending is similar to the previous month.'
+    }]
+
+
+@rule('frequent')
+def _frequent(user_id, period):
+    most_frequent = statements.INSIGHT_FREQUENT_EXPENSE(user_id=user_id)
+    if most_frequent is None or most_frequent['freq'] <= FREQUENT_EXPENSE_MIN_COUNT:
+        return []
+    return [{
+        'title': 'Frequent Expenses',
+        'message': (
+            f'You have made {most_frequent["freq"]} transactions on "{most_frequent["description"]}". '
+            'Consider if these are necessary.'
+        )
+    }]
+
+
+@rule('budget', monthly=True, months=BUDGET_BASELINE_MONTHS)
+def _budget(user_id, period):
+    spent = {}
+    baseline = {}
+    rows = statements.INSIGHT_MONTHLY_EXPENSES(
+        user_id=user_id, start=shift_month(period, -BUDGET_BASELINE_MONTHS), end=period
+    )
+    for row in rows:
+        totals = spent if row['month'] == period else baseline
+        totals[row['category_id']] = totals.get(row['category_id'], 0) + row['total_minor']
+
+    budgets = {
+        row['category_id']: row['budget_minor'] for row in statements.BUDGET_STATUS(user_id=user_id, month=period)
+    }
+
+    names = category_directory.names_by_id(user_id, spent)
+    overruns = []
+    for category_id, amount in spent.items():
+        limit = budgets.get(category_id)
+        if limit is not None:
+            if amount > limit:
+                overruns.append((amount - limit, names[category_id], amount, limit, 'budget'))
+            continue
+        usual = round(baseline.get(category_id, 0) / BUDGET_BASELINE_MONTHS)
+        if usual and amount > usual:
+            overruns.append((amount - usual, names[category_id], amount, usual, 'usual'))
+    overruns.sort(reverse=True)
+
+    items = []
+    for over, category, amount, limit, source in overruns[:MAX_ITEMS]:
+        if source == 'budget':
+            compared = f'${Money(over)} over your ${Money(limit)} budget'
+        else:
+            compared = f'${Money(over)} more than your usual ${Money(limit)} a month'
+        items.append({
+            'title': 'Over Budget',
+            'message': f'You have spent ${Money(amount)} on {category} this month, {compared}.',
+            'comparison': 'above',
+        })
+    return items
+
+
+@rule('unusual', monthly=True)
+def _unusual(user_id, period):
+    averages = {
+        row['category_id']: row['total_minor'] / row['txn_count']
+        for row in statements.INSIGHT_EXPENSE_CATEGORIES(user_id=user_id)
+        if row['txn_count'] >= UNUSUAL_MIN_HISTORY and row['total_minor']
+    }
+
+    unusual = []
+    expenses = statements.INSIGHT_MONTH_EXPENSES(
+        user_id=user_id, start=f'{period}-01', end=f'{shift_month(period, 1)}-01'
+    )
+    for expense in expenses:
+        average = averages.get(expense.category_id)
+        if average and expense.amount_minor >= UNUSUAL_MULTIPLE * average:
+            unusual.append((expense.amount_minor / average, expense.id, expense, average))
+    unusual.sort(key=lambda item: item[:2], reverse=True)
+
+    return [{
+        'title': 'Unusual Transaction',
+        'message': (
+            f'{expense.description or expense.category} on {expense.date:%B %d} cost ${expense.amount}, '
+            f'{ratio:.1f} times your average {expense.category} expense of ${Money(round(average))}.'
+        ),
+    } for ratio, _, expense, average in unusual[:MAX_ITEMS]]
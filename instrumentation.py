@@ -0,0 +1,283 @@
+"""Opt-in request and SQL instrumentation.
+
+Enabled with ``INSTRUMENTATION_ENABLED``. When it is off, ``init_app``
+registers nothing, so requests and queries run exactly as without it. When
+on, it records:
+
+- per route: latency histogram, request count, queries issued and time
+  spent in SQL;
+- per statement: executions, time and rows returned, labelled with the
+  ``statements.py`` name where there is one and the leading SQL otherwise;
+- the result cache counters;
+
+and serves them from ``/metrics`` in the Prometheus text format. Every
+response carries a ``Server-Timing`` header with the request's total, SQL
+time and query count.
+
+Neither the metrics nor the profiler are open to any client: ``/metrics``
+exists only when ``INSTRUMENTATION_METRICS_TOKEN`` is set and answers 401
+unless the request sends ``Authorization: Bearer <token>``, and adding
+``?_profile=1`` to a request only runs it under cProfile (writing the stats
+to ``INSTRUMENTATION_PROFILE_DIR``) with ``INSTRUMENTATION_PROFILING`` set
+and the app in debug mode.
+
+Rows returned come from the driver's ``rowcount`` where it reports one.
+SQLite reports -1 for SELECTs, so on SQLite a row factory counts rows as they
+are fetched.
+"""
+import cProfile
+import hmac
+import os
+import tempfile
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from cache import result_cache
+from extensions import db
+import statements
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROFILE_PARAM = '_profile'
+
+# Label for SQL that did not come from the statement registry
+STATEMENT_LABEL_LENGTH = 80
+
+
+class RouteStats:
+    __slots__ = ('buckets', 'count', 'seconds', 'queries', 'sql_seconds')
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.sql_seconds = 0.0
+
+
+class StatementStats:
+    __slots__ = ('calls', 'seconds', 'rows')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows = 0
+
+
+class Metrics:
+    """Process-wide counters; every update takes the one lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+        self.statements = {}
+
+    def record_request(self, endpoint, method, seconds, queries, sql_seconds):
+        with self._lock:
+            stats = self.routes.get((endpoint, method))
+            if stats is None:
+                stats = self.routes[(endpoint, method)] = RouteStats()
+            stats.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            stats.count += 1
+            stats.seconds += seconds
+            stats.queries += queries
+            stats.sql_seconds += sql_seconds
+
+    def record_statement(self, label, seconds, rows):
+        with self._lock:
+            stats = self.statements.get(label)
+            if stats is None:
+                stats = self.statements[label] = StatementStats()
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.rows += rows
+
+    def record_rows(self, label, rows):
+        with self._lock:
+            self.statements[label].rows += rows
+
+    def render(self, cache_stats):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+
+        def family(name, kind, help):
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            routes = sorted(self.routes.items())
+            statement_stats = sorted(self.statements.items())
+
+            family('fintrack_request_duration_seconds', 'histogram', 'Request latency by endpoint.')
+            for (endpoint, method), stats in routes:
+                labels = f'endpoint="{_escape(endpoint)}",method="{method}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    cumulative += count
+                    lines.append(f'fintrack_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'fintrack_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+                lines.append(f'fintrack_request_duration_seconds_sum{{{labels}}} {stats.seconds:.6f}')
+                lines.append(f'fintrack_request_duration_seconds_count{{{labels}}} {stats.count}')
+
+            family('fintrack_request_queries_total', 'counter', 'SQL statements executed by endpoint.')
+            for (endpoint, method), stats in routes:
+                lines.append(
+                    f'fintrack_request_queries_total{{endpoint="{_escape(endpoint)}",method="{method}"}} {stats.queries}'
+                )
+
+            family('fintrack_request_sql_seconds_total', 'counter', 'Time spent in SQL by endpoint.')
+            for (endpoint, method), stats in routes:
+                lines.append(
+                    f'fintrack_request_sql_seconds_total{{endpoint="{_escape(endpoint)}",method="{method}"}} '
+                    f'{stats.sql_seconds:.6f}'
+                )
+
+            for name, attribute, help in (
+                ('fintrack_sql_statement_calls_total', 'calls', 'Executions by statement.'),
+                ('fintrack_sql_statement_seconds_total', 'seconds', 'Execution time by statement.'),
+                ('fintrack_sql_statement_rows_total', 'rows', 'Rows returned or affected by statement.'),
+            ):
+                family(name, 'counter', help)
+                for label, stats in statement_stats:
+                    value = getattr(stats, attribute)
+                    value = f'{value:.6f}' if isinstance(value, float) else value
+                    lines.append(f'{name}{{statement="{_escape(label)}"}} {value}')
+
+        for counter in ('hits', 'misses', 'evictions', 'expirations'):
+            family(f'fintrack_cache_{counter}_total', 'counter', f'Result cache {counter}.')
+            lines.append(f'fintrack_cache_{counter}_total {cache_stats[counter]}')
+        family('fintrack_cache_entries', 'gauge', 'Entries in the result cache.')
+        lines.append(f'fintrack_cache_entries {cache_stats["entries"]}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+metrics = Metrics()
+
+
+class RequestTiming:
+    __slots__ = ('start', 'queries', 'sql_seconds', 'profiler')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.profiler = None
+
+
+def _statement_labels():
+    return {id(statement.clause): name for name, statement in statements.REGISTRY.items()}
+
+
+def _instrument_engine(engine):
+    labels = _statement_labels()
+    # Cursors whose rows are still being fetched, and the statement they ran
+    open_cursors = weakref.WeakKeyDictionary()
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('instrumentation_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def end_statement(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['instrumentation_start'].pop()
+        label = None
+        if context.compiled is not None:
+            label = labels.get(id(context.compiled.statement))
+        if label is None:
+            label = ' '.join(statement.split())[:STATEMENT_LABEL_LENGTH]
+
+        rows = cursor.rowcount
+        if rows < 0:
+            rows = 0
+            if cursor.description is not None:
+                open_cursors[cursor] = label
+        metrics.record_statement(label, elapsed, rows)
+
+        if has_request_context():
+            timing = g.get('_instrumentation')
+            if timing is not None:
+                timing.queries += 1
+                timing.sql_seconds += elapsed
+
+    if engine.dialect.name == 'sqlite':
+        def count_row(cursor, row):
+            label = open_cursors.get(cursor)
+            if label is not None:
+                metrics.record_rows(label, 1)
+            return row
+
+        @event.listens_for(engine, 'connect')
+        def install_row_counter(dbapi_connection, connection_record):
+            dbapi_connection.row_factory = count_row
+
+
+def _profiling_allowed():
+    return current_app.debug and current_app.config.get('INSTRUMENTATION_PROFILING')
+
+
+def _before_request():
+    timing = g._instrumentation = RequestTiming()
+    if request.args.get(PROFILE_PARAM) and _profiling_allowed():
+        timing.profiler = cProfile.Profile()
+        timing.profiler.enable()
+
+
+def _after_request(response):
+    timing = g.pop('_instrumentation', None)
+    if timing is None:
+        return response
+    elapsed = time.perf_counter() - timing.start
+    endpoint = request.endpoint or 'unmatched'
+
+    if timing.profiler is not None:
+        timing.profiler.disable()
+        directory = current_app.config['INSTRUMENTATION_PROFILE_DIR'] or tempfile.gettempdir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{endpoint}-{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}.prof')
+        timing.profiler.dump_stats(path)
+        current_app.logger.info('Wrote profile of %s %s to %s', request.method, request.path, path)
+
+    metrics.record_request(endpoint, request.method, elapsed, timing.queries, timing.sql_seconds)
+    response.headers.add(
+        'Server-Timing',
+        f'app;dur={elapsed * 1000:.1f}, db;dur={timing.sql_seconds * 1000:.1f};desc="{timing.queries} queries"'
+    )
+    return response
+
+
+def require_token():
+    """Return a 401 response unless the request carries ``INSTRUMENTATION_METRICS_TOKEN``, else ``None``."""
+    expected = f'Bearer {current_app.config["INSTRUMENTATION_METRICS_TOKEN"]}'
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected.encode()):
+        return Response('Unauthorized\n', 401, {'WWW-Authenticate': 'Bearer'}, mimetype='text/plain')
+    return None
+
+
+def metrics_view():
+    unauthorized = require_token()
+    if unauthorized is not None:
+        return unauthorized
+    return Response(metrics.render(result_cache.stats()), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """Install the hooks when ``INSTRUMENTATION_ENABLED`` is set, and ``/metrics`` when it has a token."""
+    if not app.config.get('INSTRUMENTATION_ENABLED'):
+        return
+
+    with app.app_context():
+        _instrument_engine(db.engine)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    if app.config.get('INSTRUMENTATION_METRICS_TOKEN'):
+        app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,447 @@
+"""Background jobs backed by the ``job`` table.
+
+Work that can take seconds (rollup rebuilds, large imports, exports,
+insight recomputation, budget reconciliation) is queued with ``enqueue`` and run out of band by a
+pool of ``JOBS_WORKERS`` threads in each web process, or by a dedicated
+``flask jobs work`` process. The queue lives in the application database, so
+there is no broker to run and queued jobs survive restarts.
+
+A worker claims a job by moving it from ``queued`` to ``running`` with a
+conditional UPDATE, so each job runs once even with several processes
+polling. A running job holds a lease of ``JOBS_LEASE_SECONDS``, renewed on
+every progress report; if the process dies, the job becomes claimable again
+when the lease runs out. A handler that raises is retried with exponential
+backoff until ``max_attempts`` is reached, then marked ``failed``; invalid
+input (``PERMANENT_ERRORS``) fails the job at once, since a retry would
+fail the same way.
+
+The files under ``JOBS_DIR`` that belong to a job, its ``context.file_path``
+outputs and the upload named by its payload's ``path``, are deleted when it
+fails for good. Finished jobs are deleted with their files once they are
+``JOBS_RETENTION_SECONDS`` old, by idle workers about every
+``PURGE_INTERVAL`` seconds or by ``flask jobs purge``.
+
+Handlers are registered with ``@handler(kind)`` and receive a ``JobContext``.
+``context.report(progress, message)`` records progress (0 to 1) on a
+separate connection, so handlers should call it between committed units of
+work.
+"""
+import glob
+import json
+import os
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, select, update
+
+from cache import bump_data_version
+from exporter import ExportError
+from extensions import db
+import insights
+import schema
+from transaction_query import FilterError
+from validation import ValidationError
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+# Seconds between progress writes from one job
+PROGRESS_INTERVAL = 0.5
+
+# Seconds between retention sweeps by one worker
+PURGE_INTERVAL = 3600
+
+# Raised for bad input, so retrying cannot succeed
+PERMANENT_ERRORS = (ValidationError, FilterError, ExportError)
+
+HANDLERS = {}
+
+
+def handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+class JobContext:
+    def __init__(self, runner, row):
+        self.runner = runner
+        self.id = row['id']
+        self.kind = row['kind']
+        self.user_id = row['user_id']
+        self.payload = json.loads(row['payload'])
+        self.attempt = row['attempts']
+        self._last_report = 0.0
+
+    def report(self, progress=None, message=None, force=False):
+        """Record progress and renew the lease; writes are rate-limited unless ``force``."""
+        now = time.time()
+        if not force and now - self._last_report < PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        values = {'lease_expires': now + self.runner.lease_seconds}
+        if progress is not None:
+            values['progress'] = min(max(progress, 0.0), 1.0)
+        if message is not None:
+            values['message'] = message[:255]
+        with db.engine.begin() as connection:
+            connection.execute(update(schema.job).where(schema.job.c.id == self.id).values(**values))
+
+    def file_path(self, suffix):
+        """A path under ``JOBS_DIR`` for a file this job produces."""
+        return os.path.join(self.runner.directory, f'job-{self.id}{suffix}')
+
+
+def enqueue(kind, user_id=None, payload=None, max_attempts=None):
+    """Queue a job and return its id (commits the current session)."""
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind {kind!r}')
+    values = {
+        'kind': kind,
+        'user_id': user_id,
+        'payload': json.dumps(payload or {}),
+        'run_after': time.time(),
+    }
+    if max_attempts is not None:
+        values['max_attempts'] = max_attempts
+    job_id = db.session.execute(schema.job.insert().values(**values)).inserted_primary_key[0]
+    db.session.commit()
+    job_runner.wake()
+    return job_id
+
+
+def get_job(job_id, user_id=None):
+    """Return a job as a dict, or ``None``; ``user_id`` restricts it to that owner."""
+    query = select(schema.job).where(schema.job.c.id == job_id)
+    if user_id is not None:
+        query = query.where(schema.job.c.user_id == user_id)
+    row = db.session.execute(query).mappings().first()
+    return _as_dict(row) if row is not None else None
+
+
+def list_jobs(user_id, limit=20):
+    rows = db.session.execute(
+        select(schema.job)
+        .where(schema.job.c.user_id == user_id)
+        .order_by(schema.job.c.id.desc())
+        .limit(limit)
+    ).mappings().all()
+    return [_as_dict(row) for row in rows]
+
+
+def _as_dict(row):
+    return {
+        'id': row['id'],
+        'kind': row['kind'],
+        'status': row['status'],
+        'progress': row['progress'],
+        'message': row['message'],
+        'attempts': row['attempts'],
+        'max_attempts': row['max_attempts'],
+        'result': json.loads(row['result']) if row['result'] else None,
+        'error': row['error'],
+        'created_at': str(row['created_at']) if row['created_at'] else None,
+        'finished_at': str(row['finished_at']) if row['finished_at'] else None,
+    }
+
+
+class JobRunner:
+    def __init__(self):
+        self.app = None
+        self.workers = 0
+        self.poll_interval = 2.0
+        self.lease_seconds = 300
+        self.retention_seconds = 7 * 24 * 3600
+        self.directory = None
+        self._next_purge = 0.0
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config['JOBS_WORKERS']
+        self.poll_interval = app.config['JOBS_POLL_INTERVAL']
+        self.lease_seconds = app.config['JOBS_LEASE_SECONDS']
+        self.retention_seconds = app.config['JOBS_RETENTION_SECONDS']
+        self.directory = app.config['JOBS_DIR'] or os.path.join(app.instance_path, 'jobs')
+        os.makedirs(self.directory, exist_ok=True)
+        # Worker threads start with the first request, so CLI commands and
+        # pre-fork servers do not start them in the wrong process
+        app.before_request(self.ensure_started)
+
+    def ensure_started(self):
+        if not self.workers or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self.work, name=f'job-worker-{number}', daemon=True)
+                for number in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self._pid = None
+
+    def work(self, once=False):
+        """Run jobs until stopped; with ``once``, until the queue is empty."""
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    ran = self.run_next()
+                    if not ran:
+                        self._purge_if_due()
+                except Exception:
+                    self.app.logger.exception('Job worker error')
+                    db.session.rollback()
+                    ran = False
+                finally:
+                    db.session.remove()
+                if ran:
+                    continue
+                if once:
+                    return
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _purge_if_due(self):
+        now = time.monotonic()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + PURGE_INTERVAL
+        purged = purge_finished(self.retention_seconds)
+        if purged:
+            self.app.logger.info('Deleted %s finished jobs older than %s seconds', purged, self.retention_seconds)
+
+    def remove_files(self, job_id, payload):
+        """Delete the job's outputs and its upload, if any, from ``JOBS_DIR``."""
+        paths = glob.glob(os.path.join(glob.escape(self.directory), f'job-{job_id}.*'))
+        upload = payload.get('path')
+        if upload and os.path.dirname(os.path.abspath(upload)) == os.path.abspath(self.directory):
+            paths.append(upload)
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _claim(self):
+        job = schema.job
+        now = time.time()
+        claimable = (
+            ((job.c.status == QUEUED) & (job.c.run_after <= now))
+            | ((job.c.status == RUNNING) & (job.c.lease_expires < now))
+        )
+        candidate = db.session.execute(
+            select(job.c.id, job.c.status).where(claimable).order_by(job.c.id).limit(1)
+        ).first()
+        if candidate is None:
+            db.session.rollback()
+            return None
+
+        # The status and lease conditions are repeated so only one worker wins
+        claimed = db.session.execute(
+            update(job)
+            .where(job.c.id == candidate.id)
+            .where(claimable)
+            .values(status=RUNNING, attempts=job.c.attempts + 1, lease_expires=now + self.lease_seconds)
+        ).rowcount
+        db.session.commit()
+        if not claimed:
+            return None
+        return db.session.execute(select(job).where(job.c.id == candidate.id)).mappings().first()
+
+    def run_next(self):
+        """Claim and run one job; return ``False`` when none was ready."""
+        row = self._claim()
+        if row is None:
+            return False
+
+        context = JobContext(self, row)
+        job = schema.job
+        try:
+            result = HANDLERS[row['kind']](context)
+        except Exception as e:
+            db.session.rollback()
+            error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+            self.app.logger.warning('Job %s (%s) attempt %s failed: %s', row['id'], row['kind'], row['attempts'], error)
+            if row['attempts'] < row['max_attempts'] and not isinstance(e, PERMANENT_ERRORS):
+                values = {'status': QUEUED, 'run_after': time.time() + 2 ** row['attempts'], 'error': error}
+            else:
+                values = {'status': FAILED, 'error': error, 'finished_at': func.current_timestamp()}
+            db.session.execute(update(job).where(job.c.id == row['id']).values(lease_expires=None, **values))
+            db.session.commit()
+            if values['status'] == FAILED:
+                self.remove_files(row['id'], context.payload)
+            return True
+
+        db.session.execute(
+            update(job).where(job.c.id == row['id']).values(
+                status=SUCCEEDED, progress=1.0, result=json.dumps(result), error=None,
+                lease_expires=None, finished_at=func.current_timestamp()
+            )
+        )
+        db.session.commit()
+        return True
+
+
+job_runner = JobRunner()
+
+
+def purge_finished(older_than):
+    """Delete the jobs that finished more than ``older_than`` seconds ago, and their files; return how many."""
+    job = schema.job
+    # finished_at is CURRENT_TIMESTAMP, which is UTC
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=older_than)
+    rows = db.session.execute(
+        select(job.c.id, job.c.payload)
+        .where(job.c.status.in_((SUCCEEDED, FAILED)))
+        .where(job.c.finished_at < cutoff)
+    ).all()
+    if not rows:
+        db.session.rollback()
+        return 0
+    db.session.execute(delete(job).where(job.c.id.in_([row.id for row in rows])))
+    db.session.commit()
+    for row in rows:
+        job_runner.remove_files(row.id, json.loads(row.payload))
+    return len(rows)
+
+
+@handler('rollups.rebuild')
+def _rebuild_rollups(context):
+    import rollups
+
+    context.report(0.0, 'Rebuilding rollups', force=True)
+    if context.user_id is not None:
+        user_ids = [context.user_id]
+    else:
+        user_ids = db.session.execute(select(schema.user.c.id).order_by(schema.user.c.id)).scalars().all()
+    # One user at a time, so the progress reports between them renew the lease
+    mismatches = 0
+    for index, user_id in enumerate(user_ids):
+        rollups.rebuild(user_id)
+        insights.invalidate(user_id)
+        bump_data_version(user_id)
+        db.session.commit()
+        context.report((index + 0.5) / len(user_ids), f'Checking rollups of user {index + 1} of {len(user_ids)}')
+        mismatches += len(rollups.check(user_id))
+        context.report((index + 1) / len(user_ids), f'{index + 1} of {len(user_ids)} users rebuilt')
+    return {'mismatches': mismatches}
+
+
+@handler('budgets.reconcile')
+def _reconcile_budgets(context):
+    import budgets
+
+    context.report(0.0, 'Checking budget counters', force=True)
+    user_ids = [context.user_id] if context.user_id is not None else budgets.budget_users()
+    checked = mismatches = repaired = 0
+    for index, user_id in enumerate(user_ids):
+        result = budgets.reconcile(user_id, context.payload.get('month'))
+        checked += result['checked']
+        mismatches += len(result['mismatches'])
+        repaired += result['repaired']
+        context.report((index + 1) / len(user_ids), f'{index + 1} of {len(user_ids)} users checked')
+    return {'budgets': checked, 'mismatches': mismatches, 'users_repaired': repaired}
+
+
+@handler('import')
+def _import_statement(context):
+    import importer
+
+    path = context.payload['path']
+    size = os.path.getsize(path) or 1
+    with open(path, 'rb') as f:
+        def on_chunk(report):
+            context.report(f.tell() / size, f'{report.parsed} rows parsed, {report.inserted} inserted')
+
+        report = importer.import_transactions(
+            context.user_id,
+            importer.open_text(f),
+            context.payload['format'],
+            date_format=context.payload.get('date_format') or '%Y-%m-%d',
+            chunk_size=context.payload.get('chunk_size') or 5000,
+            on_chunk=on_chunk
+        )
+    # Re-running after a partial import only inserts the rows still missing,
+    # so the upload is kept until the job succeeds
+    os.remove(path)
+    return report.as_dict()
+
+
+@handler('export')
+def _export_transactions(context):
+    import exporter
+
+    file_format = context.payload['format']
+    filters = exporter.parse_filters(context.payload.get('filters') or {})
+    path = context.file_path(f'.{file_format}')
+    written = 0
+    with open(path, 'wb') as f:
+        for chunk in exporter.export_chunks(context.user_id, filters, file_format):
+            f.write(chunk.encode() if isinstance(chunk, str) else chunk)
+            written += len(chunk)
+            context.report(message=f'{written} bytes written')
+    return {'file': os.path.basename(path), 'format': file_format, 'bytes': os.path.getsize(path)}
+
+
+@handler('insights')
+def _recompute_insights(context):
+    context.report(0.0, 'Recomputing insights', force=True)
+    return {'insights': len(insights.insights_for_user(context.user_id, refresh=True))}
+
+
+jobs_cli = AppGroup('jobs', help='Run and inspect background jobs.')
+
+
+@jobs_cli.command('work')
+@click.option('--once', is_flag=True, help='Exit when the queue is empty.')
+def work_command(once):
+    """Run queued jobs in this process."""
+    job_runner.work(once=once)
+
+
+@jobs_cli.command('purge')
+@click.option('--older-than', type=int, default=None, help='Seconds since finishing; defaults to JOBS_RETENTION_SECONDS.')
+def purge_command(older_than):
+    """Delete finished jobs and their files."""
+    older_than = job_runner.retention_seconds if older_than is None else older_than
+    click.echo(f'Deleted {purge_finished(older_than)} finished jobs.')
+
+
+@jobs_cli.command('list')
+@click.option('--status', type=click.Choice([QUEUED, RUNNING, SUCCEEDED, FAILED]), default=None)
+@click.option('--limit', default=20, show_default=True)
+def list_command(status, limit):
+    """Show recent jobs."""
+    query = select(schema.job).order_by(schema.job.c.id.desc()).limit(limit)
+    if status:
+        query = query.where(schema.job.c.status == status)
+    for row in db.session.execute(query).mappings():
+        click.echo(
+            f'{row["id"]:>6}  {row["kind"]:<16} {row["status"]:<10} {row["progress"]:4.0%}  '
+            f'attempts {row["attempts"]}/{row["max_attempts"]}  {row["message"] or row["error"] or ""}'
+        )
@@ -0,0 +1,348 @@
+"""Versioned schema and data migrations.
+
+The current schema is declared in ``schema.py``. A new database is created
+from it directly and stamped with every migration version. Changes to
+existing databases (new indexes and columns, data rewrites, backfills) are
+registered here in order and applied once each by ``upgrade()``, which
+records the applied versions in ``schema_migration``. Migrations must run on
+both SQLite and PostgreSQL.
+
+A migration meets the database as the migrations before it left it, not in
+the shape ``schema.py`` describes today, so it spells out its own SQL rather
+than reusing the current table definitions or ``rollups.rebuild()``, and it
+never commits: ``upgrade()`` runs each one in a transaction of its own. Once
+a migration has shipped its body does not change; a later change to the
+schema is a new migration.
+"""
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, inspect, text, update
+
+from extensions import db
+from money import DEFAULT_CURRENCY, Money, minor_per_major
+import schema
+import statements
+from transaction_query import encode_cursor, page_query
+
+MIGRATIONS = []
+
+
+def migration(version, name):
+    def register(func):
+        MIGRATIONS.append((version, name, func))
+        return func
+    return register
+
+
+@migration(1, 'normalize transaction dates to YYYY-MM-DD')
+def _normalize_dates():
+    # Dates were written both as 'YYYY-MM-DD' and as ISO timestamps, which
+    # forced every query to wrap the column in date(); store the bare day so
+    # the column can be compared and indexed directly.
+    txn = schema.transaction
+    db.session.execute(
+        update(txn)
+        .values(date=func.day_bucket(txn.c.date))
+        .where(txn.c.date != func.day_bucket(txn.c.date))
+    )
+
+
+def _create_rollups(connection, category, total, amount):
+    """Recreate both rollup tables and fill them from "transaction".
+
+    ``category`` and ``total`` declare the rollups' category and total
+    columns as of the calling migration; ``amount`` is the transaction
+    column summed into the total. Dates are already bare days (migration 1).
+    """
+    category_name, total_name = category.split()[0], total.split()[0]
+    for table, period, width in (('daily_rollup', 'day', 10), ('monthly_rollup', 'month', 7)):
+        connection.execute(text(f'DROP TABLE IF EXISTS {table}'))
+        connection.execute(text(f'''
+            CREATE TABLE {table} (
+                user_id INTEGER NOT NULL REFERENCES "user" (id) ON DELETE CASCADE,
+                {period} VARCHAR({width}) NOT NULL,
+                {category} NOT NULL,
+                type VARCHAR(50) NOT NULL,
+                {total} NOT NULL DEFAULT 0,
+                txn_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, {period}, {category_name}, type)
+            )
+        '''))
+        connection.execute(text(f'''
+            INSERT INTO {table} (user_id, {period}, {category_name}, type, {total_name}, txn_count)
+            SELECT user_id, substr(date, 1, {width}), {category_name}, type, SUM({amount}), COUNT(*)
+            FROM "transaction"
+            WHERE user_id IS NOT NULL
+            GROUP BY user_id, substr(date, 1, {width}), {category_name}, type
+        '''))
+
+
+@migration(2, 'backfill transaction rollups')
+def _backfill_rollups():
+    # The first rollups: category names and float totals
+    _create_rollups(db.session.connection(), 'category VARCHAR(50)', 'total FLOAT', 'amount')
+
+
+@migration(3, 'index transactions by user, date and type')
+def _index_transactions():
+    connection = db.session.connection()
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_transaction_user_date ON "transaction" (user_id, date)'))
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_transaction_user_type_date ON "transaction" (user_id, type, date, amount)'
+    ))
+
+
+@migration(4, 'add per-user data version for cache invalidation')
+def _add_data_version():
+    db.session.execute(text('''
+        ALTER TABLE "user" ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0
+    '''))
+
+
+@migration(5, 'index expenses by description for insights')
+def _index_descriptions():
+    db.session.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_transaction_user_type_description ON "transaction" (user_id, type, description)'
+    ))
+
+
+@migration(6, 'store amounts as integer minor units')
+def _amounts_in_minor_units():
+    # Float amounts made sums drift by fractions of a cent. Rows recorded no
+    # currency, so they are all DEFAULT_CURRENCY.
+    connection = db.session.connection()
+    connection.execute(text('DROP INDEX IF EXISTS ix_transaction_user_type_date'))
+    connection.execute(text('ALTER TABLE "transaction" ADD COLUMN amount_minor BIGINT NOT NULL DEFAULT 0'))
+    connection.execute(text(
+        f"ALTER TABLE \"transaction\" ADD COLUMN currency VARCHAR(3) NOT NULL DEFAULT '{DEFAULT_CURRENCY}'"
+    ))
+    connection.execute(
+        text('UPDATE "transaction" SET amount_minor = CAST(ROUND(amount * :unit) AS BIGINT)'),
+        {'unit': minor_per_major(DEFAULT_CURRENCY)}
+    )
+    connection.execute(text('ALTER TABLE "transaction" DROP COLUMN amount'))
+    if connection.dialect.name != 'sqlite':
+        # SQLite cannot add a constraint to an existing table; validation enforces it there
+        connection.execute(text(
+            'ALTER TABLE "transaction" ADD CONSTRAINT transaction_amount_minor_check CHECK (amount_minor > 0)'
+        ))
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_transaction_user_type_date ON "transaction" (user_id, type, date, amount_minor)'
+    ))
+
+    # The rollups are derived data, so they are recreated with integer totals
+    _create_rollups(connection, 'category VARCHAR(50)', 'total_minor BIGINT', 'amount_minor')
+
+
+@migration(7, 'reference categories by id')
+def _category_ids():
+    # Transactions repeated the category name on every row, and category.name
+    # was unique across all users, so two users could not share a name.
+    # Every name in use becomes a row of its user's categories.
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite':
+        # SQLite cannot drop a constraint, so the table is rebuilt
+        connection.execute(text('ALTER TABLE category RENAME TO category_old'))
+        connection.execute(text('''
+            CREATE TABLE category (
+                id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+                name VARCHAR(50) NOT NULL,
+                user_id INTEGER NOT NULL,
+                UNIQUE (user_id, name),
+                FOREIGN KEY (user_id) REFERENCES "user" (id) ON DELETE CASCADE
+            )
+        '''))
+        connection.execute(text('INSERT INTO category (id, name, user_id) SELECT id, name, user_id FROM category_old'))
+        connection.execute(text('DROP TABLE category_old'))
+    else:
+        connection.execute(text('ALTER TABLE category DROP CONSTRAINT IF EXISTS category_name_key'))
+        connection.execute(text('ALTER TABLE category DROP CONSTRAINT IF EXISTS category_name_user_id_key'))
+        connection.execute(text('ALTER TABLE category ADD CONSTRAINT category_user_id_name_key UNIQUE (user_id, name)'))
+
+    # Rows without a user belong to nobody and cannot be given a category
+    connection.execute(text('DELETE FROM "transaction" WHERE user_id IS NULL'))
+    connection.execute(text('''
+        INSERT INTO category (name, user_id)
+        SELECT DISTINCT category, user_id FROM "transaction"
+        WHERE true  -- SQLite needs a WHERE before an upsert on INSERT ... SELECT
+        ON CONFLICT DO NOTHING
+    '''))
+    connection.execute(text('ALTER TABLE "transaction" ADD COLUMN category_id INTEGER REFERENCES category (id)'))
+    connection.execute(text('''
+        UPDATE "transaction" SET category_id = (
+            SELECT c.id FROM category c WHERE c.user_id = "transaction".user_id AND c.name = "transaction".category
+        )
+    '''))
+    if connection.dialect.name != 'sqlite':
+        # SQLite cannot add NOT NULL to an existing column; every write path sets it there
+        connection.execute(text('ALTER TABLE "transaction" ALTER COLUMN category_id SET NOT NULL'))
+    connection.execute(text('ALTER TABLE "transaction" DROP COLUMN category'))
+
+    # The rollups are derived data, so they are recreated keyed by category_id
+    _create_rollups(connection, 'category_id INTEGER', 'total_minor BIGINT', 'amount_minor')
+
+
+@migration(8, 'index transaction text for search')
+def _search_index():
+    connection = db.session.connection()
+    if connection.dialect.name != 'sqlite':
+        # search.py falls back to a substring scan on PostgreSQL
+        return
+    for statement in schema.TRANSACTION_SEARCH_DDL:
+        connection.execute(text(statement))
+    connection.execute(text('''
+        INSERT INTO transaction_fts (rowid, owner, description, category)
+        SELECT t.id, 'u' || t.user_id, COALESCE(t.description, ''), c.name
+        FROM "transaction" t JOIN category c ON c.id = t.category_id
+    '''))
+
+
+@migration(9, 'add monthly category budgets')
+def _budgets():
+    connection = db.session.connection()
+    # Upgrades that created budget from schema.py before migration 7 ran
+    # left its foreign key naming category_old; SQLite keeps the rows in a new table
+    rebuild = inspect(connection).has_table('budget')
+    if rebuild and connection.dialect.name != 'sqlite':
+        return
+    if rebuild:
+        connection.execute(text('ALTER TABLE budget RENAME TO budget_old'))
+    connection.execute(text(f'''
+        CREATE TABLE budget (
+            user_id INTEGER NOT NULL REFERENCES "user" (id) ON DELETE CASCADE,
+            category_id INTEGER NOT NULL REFERENCES category (id),
+            amount_minor BIGINT NOT NULL CHECK (amount_minor > 0),
+            currency VARCHAR(3) NOT NULL DEFAULT '{DEFAULT_CURRENCY}',
+            PRIMARY KEY (user_id, category_id)
+        )
+    '''))
+    if rebuild:
+        connection.execute(text('''
+            INSERT INTO budget (user_id, category_id, amount_minor, currency)
+            SELECT user_id, category_id, amount_minor, currency FROM budget_old
+        '''))
+        connection.execute(text('DROP TABLE budget_old'))
+
+
+def applied_versions():
+    return {
+        row[0] for row in db.session.execute(text('SELECT version FROM schema_migration'))
+    }
+
+
+def upgrade():
+    """Apply every pending migration in its own transaction, then create missing tables.
+
+    A new database is created from ``schema.py`` first and only stamped.
+    """
+    fresh = not inspect(db.engine).has_table('user')
+    if fresh:
+        schema.metadata.create_all(db.engine)
+    else:
+        # Tables created now would already have their current shape when the
+        # migrations that lead up to it run, so they wait until the end
+        schema.schema_migration.create(db.engine, checkfirst=True)
+
+    pending = [item for item in sorted(MIGRATIONS, key=lambda item: item[0]) if item[0] not in applied_versions()]
+    for version, name, apply in pending:
+        # A database created from schema.py already has everything the migrations add
+        if not fresh:
+            if db.engine.dialect.name == 'sqlite':
+                # pysqlite only opens a transaction before DML, so DDL would
+                # otherwise commit as it runs and survive a failed migration
+                db.session.execute(text('BEGIN'))
+            try:
+                apply()
+            except Exception:
+                db.session.rollback()
+                raise
+        db.session.execute(
+            text('INSERT INTO schema_migration (version, name) VALUES (:version, :name)'),
+            {'version': version, 'name': name}
+        )
+        db.session.commit()
+
+    if not fresh:
+        schema.metadata.create_all(db.engine)
+
+
+# A value for every bind parameter of the statements whose plans are
+# checked; the plans must not depend on them
+PLAN_PARAMS = {
+    'user_id': 1, 'id': 1, 'category_id': 1, 'version': 0, 'amount_minor': 100,
+    'name': 'Ann', 'email': 'ann@example.com', 'password': 'x', 'type': 'expense', 'currency': DEFAULT_CURRENCY,
+    'date': '2000-01-15', 'description': 'Coffee', 'kind': 'balance', 'period': '2000-01', 'items': '[]',
+    'month': '2000-01', 'start': '2000-01-01', 'end': '2000-02-01',
+}
+
+# One value per filter of the transactions listing
+PLAN_FILTERS = {
+    'type': 'expense', 'category': 'Food', 'date_from': '2000-01-01', 'date_to': '2000-12-31',
+    'min_amount': Money.parse('1'), 'max_amount': Money.parse('100'), 'q': 'coffee',
+}
+
+
+def _plan(sql, params):
+    """Return the plan lines of ``sql`` that read a whole table."""
+    if db.engine.dialect.name == 'sqlite':
+        plan = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql), params).fetchall()
+        return [row[-1] for row in plan if row[-1].startswith('SCAN ') and row[-1] != 'SCAN CONSTANT ROW']
+
+    # Small tables make a sequential scan the cheapest plan; disable it so a
+    # Seq Scan only remains where no index can answer the query.
+    db.session.execute(text('SET LOCAL enable_seqscan = off'))
+    plan = db.session.execute(text('EXPLAIN ' + sql), params).fetchall()
+    return [row[0].strip() for row in plan if 'Seq Scan' in row[0]]
+
+
+def hot_queries():
+    """Yield ``(name, sql, params)`` for every statement on the request path.
+
+    These are each statement in ``statements.REGISTRY`` and the transactions
+    listing's keyset query unfiltered, with each filter and with all of
+    them, on the first page and after a cursor.
+    """
+    for stmt in statements.REGISTRY.values():
+        params = stmt.clause.compile(dialect=db.engine.dialect).params
+        yield stmt.name, stmt.sql, {name: PLAN_PARAMS[name] for name in params}
+
+    shapes = {'unfiltered': {}, 'all filters': PLAN_FILTERS}
+    shapes.update((name, {name: value}) for name, value in PLAN_FILTERS.items())
+    for shape, filters in shapes.items():
+        for cursor in (None, encode_cursor('2000-06-01', 1000)):
+            statement, params = page_query(1, filters, cursor, 10)
+            yield f'transactions page, {shape}{", after a cursor" if cursor else ""}', str(statement), params
+
+
+def full_scans():
+    """Return ``{query name: [plan detail, ...]}`` for hot queries that scan a table."""
+    offenders = {}
+    try:
+        for name, sql, params in hot_queries():
+            scans = _plan(sql, params)
+            if scans:
+                offenders[name] = scans
+    finally:
+        db.session.rollback()
+    return offenders
+
+
+db_cli = AppGroup('db', help='Schema migrations and query plan checks.')
+
+
+@db_cli.command('upgrade')
+def upgrade_command():
+    """Apply pending migrations."""
+    upgrade()
+    click.echo('Database is up to date.')
+
+
+@db_cli.command('check-plans')
+def check_plans_command():
+    """Fail if any hot query needs a full table scan."""
+    offenders = full_scans()
+    for name, scans in offenders.items():
+        click.echo(f'{name}: {"; ".join(scans)}')
+    if offenders:
+        raise click.ClickException(f'{len(offenders)} hot queries scan a full table.')
+    click.echo('All hot queries use an index.')
@@ -0,0 +1,125 @@
+"""Fixed-point money amounts.
+
+Amounts are stored as 64-bit integers in the currency's minor unit (cents
+for USD) next to an ISO 4217 currency code, so every sum is exact integer
+arithmetic on every backend. ``Money`` is the value type at the edges: form
+fields and statement amounts are parsed with ``Money.parse``, which rejects
+more decimal places than the currency has, and pages, exports and JSON read
+amounts back from it as exact decimal strings. Aggregates (rollup totals,
+chart series) stay in minor units until ``to_major`` converts them for
+display.
+
+Every write path records ``DEFAULT_CURRENCY`` for now, and aggregates assume
+a user's amounts share one currency.
+"""
+from decimal import Decimal, InvalidOperation
+
+DEFAULT_CURRENCY = 'USD'
+
+# Digits after the decimal point in each currency's minor unit; others use 2
+CURRENCY_EXPONENTS = {
+    'BHD': 3,
+    'CLP': 0,
+    'ISK': 0,
+    'JPY': 0,
+    'KRW': 0,
+    'KWD': 3,
+    'OMR': 3,
+    'TND': 3,
+    'VND': 0,
+}
+
+# Symbols written before an amount; other currencies are followed by their code
+CURRENCY_SYMBOLS = {
+    'EUR': '€',
+    'GBP': '£',
+    'JPY': '¥',
+    'USD': '$',
+}
+
+# Stored amounts are signed 64-bit integers
+MAX_MINOR = 2 ** 63 - 1
+
+
+def exponent(currency=DEFAULT_CURRENCY):
+    return CURRENCY_EXPONENTS.get(currency, 2)
+
+
+def minor_per_major(currency=DEFAULT_CURRENCY):
+    return 10 ** exponent(currency)
+
+
+def to_major(minor, currency=DEFAULT_CURRENCY):
+    """Convert a minor-unit amount or aggregate to a float for charts and metrics."""
+    return minor / minor_per_major(currency)
+
+
+class Money:
+    """An amount of ``minor`` units of ``currency``."""
+    __slots__ = ('minor', 'currency')
+
+    def __init__(self, minor, currency=DEFAULT_CURRENCY):
+        self.minor = minor
+        self.currency = currency
+
+    @classmethod
+    def parse(cls, value, currency=DEFAULT_CURRENCY):
+        """Parse a major-unit amount such as ``'1,234.50'``; raise ``ValueError`` if it is not exact.
+
+        Floats are read through their shortest repr, so ``12.3`` is 1230 cents.
+        """
+        if isinstance(value, float):
+            value = repr(value)
+        elif isinstance(value, str):
+            value = value.strip().replace(',', '')
+        try:
+            amount = Decimal(value)
+        except (InvalidOperation, TypeError, ValueError):
+            raise ValueError('Amount must be a number.')
+        if not amount.is_finite():
+            raise ValueError('Amount must be a number.')
+
+        places = exponent(currency)
+        # Exponents out of range are rejected before scaling, which would
+        # overflow the decimal context or silently round a tiny amount to 0
+        if amount and amount.adjusted() >= len(str(MAX_MINOR)) - places:
+            raise ValueError('Amount is too large.')
+        if amount and amount.adjusted() < -places:
+            raise ValueError(f'Amount cannot have more than {places} decimal places.')
+
+        minor = amount.scaleb(places)
+        if minor != minor.to_integral_value():
+            raise ValueError(f'Amount cannot have more than {places} decimal places.')
+        minor = int(minor)
+        if abs(minor) > MAX_MINOR:
+            raise ValueError('Amount is too large.')
+        return cls(minor, currency)
+
+    @property
+    def decimal(self):
+        return Decimal(self.minor).scaleb(-exponent(self.currency))
+
+    def __str__(self):
+        return str(self.decimal)
+
+    def format(self):
+        """Return the amount for messages, such as ``'$12.50'`` or ``'12.500 KWD'``."""
+        symbol = CURRENCY_SYMBOLS.get(self.currency)
+        if symbol is None:
+            return f'{self} {self.currency}'
+        sign = '-' if self.minor < 0 else ''
+        return f'{sign}{symbol}{Money(abs(self.minor), self.currency)}'
+
+    def __float__(self):
+        return to_major(self.minor, self.currency)
+
+    def __eq__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.minor == other.minor and self.currency == other.currency
+
+    def __hash__(self):
+        return hash((self.minor, self.currency))
+
+    def __repr__(self):
+        return f'Money({str(self)!r}, {self.currency!r})'
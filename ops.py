@@ -0,0 +1,30 @@
+"""Operational endpoints, disabled unless ``OPS_ENDPOINTS_ENABLED`` is set.
+
+Like ``/metrics``, they are only served when ``INSTRUMENTATION_METRICS_TOKEN``
+is set, to requests that send it as a bearer token.
+"""
+from flask import Blueprint, abort, current_app, jsonify
+
+from cache import result_cache
+from categories import category_directory
+from instrumentation import require_token
+
+ops = Blueprint('ops', __name__, url_prefix='/ops')
+
+
+@ops.before_request
+def require_enabled():
+    config = current_app.config
+    if not config.get('OPS_ENDPOINTS_ENABLED') or not config.get('INSTRUMENTATION_METRICS_TOKEN'):
+        abort(404)
+    return require_token()
+
+
+@ops.route('/cache')
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+
+@ops.route('/categories')
+def category_stats():
+    return jsonify(category_directory.stats())
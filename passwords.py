@@ -0,0 +1,157 @@
+"""Password hashing off the request threads, and login throttling.
+
+Hashing and verification run in a small process pool of
+``PASSWORD_HASH_WORKERS`` processes, so a burst of logins occupies at most
+that many CPUs and the request threads stay free for other pages. At most
+``PASSWORD_HASH_QUEUE`` operations may be waiting; beyond that, or after
+``PASSWORD_HASH_TIMEOUT`` seconds, ``PasswordHasherBusy`` is raised and the
+caller answers 503 instead of queueing without bound. With
+``PASSWORD_HASH_WORKERS = 0`` hashing runs inline.
+
+New hashes use ``PASSWORD_HASH_METHOD`` (a werkzeug method string, which
+carries the cost parameters). ``verify_password`` reports when a stored hash
+was made with another method so the login route can rehash it. Werkzeug
+fills in the defaults of a short method such as ``scrypt``, so stored hashes
+are compared with the prefix of a hash made at startup, not with the method
+string itself.
+
+``LoginThrottle`` counts failed logins per client address and per email in
+fixed windows and refuses further attempts, before any hashing, once either
+limit is reached. Counts live in process memory, so each worker process
+enforces the limits separately.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Expired throttle entries are swept once this many keys are tracked
+THROTTLE_SWEEP_SIZE = 10000
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when the hashing pool cannot take another operation in time."""
+
+
+class PasswordHasher:
+    def __init__(self):
+        self.method = 'scrypt'
+        self.prefix = None
+        self.workers = 0
+        self.timeout = 10.0
+        self._slots = None
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(self.workers + app.config['PASSWORD_HASH_QUEUE'])
+        self.shutdown()
+
+    def _executor(self):
+        # A pool inherited through fork belongs to the parent; start a new one
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                    )
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        deadline = time.monotonic() + self.timeout
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy('Too many password operations in progress.')
+        try:
+            future = self._executor().submit(func, *args)
+            try:
+                return future.result(timeout=max(deadline - time.monotonic(), 0))
+            except FutureTimeoutError:
+                future.cancel()
+                raise PasswordHasherBusy('Password operation timed out.')
+        finally:
+            self._slots.release()
+
+    def hash_password(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify_password(self, password_hash, password):
+        """Return ``(matches, needs_rehash)``."""
+        if not self._run(check_password_hash, password_hash, password):
+            return False, False
+        return True, password_hash.split('$', 1)[0] != self.prefix
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._pool_pid = None
+
+
+class LoginThrottle:
+    def __init__(self):
+        self.window = 900
+        self.limits = {'ip': 20, 'email': 5}
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.window = app.config['LOGIN_THROTTLE_WINDOW']
+        self.limits = {
+            'ip': app.config['LOGIN_THROTTLE_PER_IP'],
+            'email': app.config['LOGIN_THROTTLE_PER_EMAIL'],
+        }
+        with self._lock:
+            self._failures.clear()
+
+    def _keys(self, ip, email):
+        return [('ip', ip), ('email', (email or '').strip().lower())]
+
+    def retry_after(self, ip, email):
+        """Seconds until another attempt is allowed, or 0 when it is allowed now."""
+        now = time.monotonic()
+        wait = 0
+        with self._lock:
+            for key in self._keys(ip, email):
+                entry = self._failures.get(key)
+                if entry is None:
+                    continue
+                started, count = entry
+                if now - started >= self.window:
+                    del self._failures[key]
+                elif count >= self.limits[key[0]]:
+                    wait = max(wait, self.window - (now - started))
+        return int(wait) + 1 if wait else 0
+
+    def record_failure(self, ip, email):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._failures) >= THROTTLE_SWEEP_SIZE:
+                self._failures = {
+                    key: entry for key, entry in self._failures.items() if now - entry[0] < self.window
+                }
+            for key in self._keys(ip, email):
+                entry = self._failures.get(key)
+                if entry is None or now - entry[0] >= self.window:
+                    self._failures[key] = (now, 1)
+                else:
+                    self._failures[key] = (entry[0], entry[1] + 1)
+
+    def record_success(self, ip, email):
+        with self._lock:
+            self._failures.pop(('email', (email or '').strip().lower()), None)
+
+
+password_hasher = PasswordHasher()
+login_throttle = LoginThrottle()
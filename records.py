@@ -0,0 +1,93 @@
+"""Compact transaction rows for the list and detail views.
+
+Transaction dates are stored as ``'YYYY-MM-DD'`` text. ``Day`` decodes them
+to ``datetime.date`` in the result processor, once per row as it leaves the
+driver, and ``TransactionRecord`` holds each row in a fixed set of slots
+instead of a per-row dict, so a listing of many rows costs one small object
+per row and no date parsing in the view or template. Amounts stay integer
+minor units until ``amount`` is read as ``money.Money``. Rows are read from
+``TRANSACTION_TABLES``, which joins each transaction to its category by
+primary key for the name.
+"""
+from datetime import date
+
+from sqlalchemy import BigInteger, Integer, String, Text
+from sqlalchemy.types import TypeDecorator
+
+from money import Money
+
+
+class Day(TypeDecorator):
+    """A ``'YYYY-MM-DD'`` text column read as ``datetime.date``."""
+    impl = String(10)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, date):
+            return value.isoformat()
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return date.fromisoformat(value[:10])
+
+
+# Transaction rows with their category name, for statements reading records
+TRANSACTION_COLUMNS = 't.id, t.type, c.name AS category, t.category_id, t.amount_minor, t.currency, t.date, t.description'
+TRANSACTION_TABLES = '"transaction" t JOIN category c ON c.id = t.category_id'
+
+# Result column types for statements selecting TRANSACTION_COLUMNS
+TRANSACTION_COLUMN_TYPES = {
+    'id': Integer,
+    'type': String,
+    'category': String,
+    'category_id': Integer,
+    'amount_minor': BigInteger,
+    'currency': String,
+    'date': Day,
+    'description': Text,
+}
+
+
+class TransactionRecord:
+    __slots__ = ('id', 'type', 'category', 'category_id', 'amount_minor', 'currency', 'date', 'description')
+
+    def __init__(self, id, type, category, category_id, amount_minor, currency, date, description):
+        self.id = id
+        self.type = type
+        self.category = category
+        self.category_id = category_id
+        self.amount_minor = amount_minor
+        self.currency = currency
+        self.date = date
+        self.description = description
+
+    @property
+    def amount(self):
+        return Money(self.amount_minor, self.currency)
+
+    def as_dict(self):
+        """JSON-ready mapping with the date back in ``'YYYY-MM-DD'`` form.
+
+        ``amount`` is an exact decimal string such as ``'12.50'``.
+        """
+        return {
+            'id': self.id,
+            'type': self.type,
+            'category': self.category,
+            'category_id': self.category_id,
+            'amount': str(self.amount),
+            'amount_minor': self.amount_minor,
+            'currency': self.currency,
+            'date': self.date.isoformat(),
+            'description': self.description,
+        }
+
+    def __repr__(self):
+        return f'<TransactionRecord {self.id} {self.date} {self.type} {self.amount} {self.currency}>'
+
+
+def transaction_records(result):
+    """Map a result of TRANSACTION_COLUMNS rows to a list of records."""
+    return [TransactionRecord(*row) for row in result]
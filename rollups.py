@@ -0,0 +1,243 @@
+"""Per-user daily and monthly rollups of transaction totals.
+
+``daily_rollup`` holds one row per user x day x category_id x type with the summed
+amount (in minor units) and transaction count; ``monthly_rollup`` is the same keyed by month.
+Both are maintained incrementally by the write paths through ``record_insert``,
+``record_delete``, ``record_update`` and ``record_bulk`` so that read paths
+can aggregate a few hundred rows instead of the user's full history.
+``rebuild`` regenerates them from ``"transaction"`` and ``check`` reports any
+drift.
+"""
+from datetime import date, datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, select, text
+
+from extensions import db
+import schema
+
+_UPSERT_DAILY = text('''
+    INSERT INTO daily_rollup (user_id, day, category_id, type, total_minor, txn_count)
+    VALUES (:user_id, :day, :category_id, :type, :amount_minor, :count)
+    ON CONFLICT (user_id, day, category_id, type) DO UPDATE SET
+        total_minor = daily_rollup.total_minor + excluded.total_minor,
+        txn_count = daily_rollup.txn_count + excluded.txn_count
+''')
+
+_UPSERT_MONTHLY = text('''
+    INSERT INTO monthly_rollup (user_id, month, category_id, type, total_minor, txn_count)
+    VALUES (:user_id, :month, :category_id, :type, :amount_minor, :count)
+    ON CONFLICT (user_id, month, category_id, type) DO UPDATE SET
+        total_minor = monthly_rollup.total_minor + excluded.total_minor,
+        txn_count = monthly_rollup.txn_count + excluded.txn_count
+''')
+
+_PRUNE_DAILY = text('''
+    DELETE FROM daily_rollup
+    WHERE user_id = :user_id AND day = :day AND category_id = :category_id AND type = :type
+      AND txn_count <= 0
+''')
+
+_PRUNE_MONTHLY = text('''
+    DELETE FROM monthly_rollup
+    WHERE user_id = :user_id AND month = :month AND category_id = :category_id AND type = :type
+      AND txn_count <= 0
+''')
+
+
+def rollup_day(value):
+    """Normalize a stored transaction date to its ``'YYYY-MM-DD'`` day."""
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    return value[:10]
+
+
+def _apply(user_id, type, category_id, amount_minor, day, count):
+    params = {
+        'user_id': user_id,
+        'day': day,
+        'month': day[:7],
+        'category_id': category_id,
+        'type': type,
+        'amount_minor': amount_minor * count,
+        'count': count,
+    }
+    db.session.execute(_UPSERT_DAILY, params)
+    db.session.execute(_UPSERT_MONTHLY, params)
+    if count < 0:
+        db.session.execute(_PRUNE_DAILY, params)
+        db.session.execute(_PRUNE_MONTHLY, params)
+
+
+def record_insert(user_id, type, category_id, amount_minor, txn_date):
+    """Add a newly inserted transaction to the rollups (caller commits)."""
+    _apply(user_id, type, category_id, amount_minor, rollup_day(txn_date), 1)
+
+
+def record_delete(user_id, type, category_id, amount_minor, txn_date):
+    """Remove a deleted transaction from the rollups (caller commits)."""
+    _apply(user_id, type, category_id, amount_minor, rollup_day(txn_date), -1)
+
+
+def record_update(user_id, old, new):
+    """Move a transaction's contribution from its old values to its new ones.
+
+    ``old`` and ``new`` are mappings with ``type``, ``category_id``,
+    ``amount_minor`` and ``date`` keys.
+    """
+    record_delete(user_id, old['type'], old['category_id'], old['amount_minor'], old['date'])
+    record_insert(user_id, new['type'], new['category_id'], new['amount_minor'], new['date'])
+
+
+def record_bulk(user_id, rows, removed=()):
+    """Add many inserted transactions at once, one upsert per rollup key.
+
+    ``rows`` are mappings with ``type``, ``category_id``, ``amount_minor`` and
+    ``date``. ``removed`` rows (deleted transactions, or the old side of
+    updated ones) are subtracted in the same upserts.
+    """
+    daily = {}
+    for sign, changed in ((1, rows), (-1, removed)):
+        for row in changed:
+            key = (rollup_day(row['date']), row['category_id'], row['type'])
+            totals = daily.get(key)
+            if totals is None:
+                totals = daily[key] = [0, 0]
+            totals[0] += sign * row['amount_minor']
+            totals[1] += sign
+    # An update that moves nothing between keys leaves them unchanged
+    daily = {key: totals for key, totals in daily.items() if totals != [0, 0]}
+
+    monthly = {}
+    for (day, category_id, type), (total, count) in daily.items():
+        key = (day[:7], category_id, type)
+        totals = monthly.get(key)
+        if totals is None:
+            totals = monthly[key] = [0, 0]
+        totals[0] += total
+        totals[1] += count
+
+    if daily:
+        db.session.execute(_UPSERT_DAILY, [
+            {'user_id': user_id, 'day': day, 'category_id': category_id, 'type': type, 'amount_minor': total,
+             'count': count}
+            for (day, category_id, type), (total, count) in daily.items()
+        ])
+        db.session.execute(_UPSERT_MONTHLY, [
+            {'user_id': user_id, 'month': month, 'category_id': category_id, 'type': type, 'amount_minor': total,
+             'count': count}
+            for (month, category_id, type), (total, count) in monthly.items()
+        ])
+
+    pruned = [
+        {'user_id': user_id, 'day': day, 'month': day[:7], 'category_id': category_id, 'type': type}
+        for (day, category_id, type), (total, count) in daily.items() if count < 0
+    ]
+    if pruned:
+        db.session.execute(_PRUNE_DAILY, pruned)
+        db.session.execute(_PRUNE_MONTHLY, pruned)
+
+
+def rebuild(user_id=None):
+    """Regenerate the rollups from raw transactions for one user or everyone."""
+    txn = schema.transaction
+    daily = schema.daily_rollup
+    monthly = schema.monthly_rollup
+
+    def for_user(statement, table):
+        return statement.where(table.c.user_id == user_id) if user_id is not None else statement
+
+    db.session.execute(for_user(delete(daily), daily))
+    db.session.execute(for_user(delete(monthly), monthly))
+    db.session.execute(insert(daily).from_select(
+        ['user_id', 'day', 'category_id', 'type', 'total_minor', 'txn_count'],
+        for_user(
+            select(txn.c.user_id, txn.c.date, txn.c.category_id, txn.c.type,
+                   func.sum(txn.c.amount_minor), func.count()),
+            txn
+        ).group_by(txn.c.user_id, txn.c.date, txn.c.category_id, txn.c.type)
+    ))
+    month = func.month_bucket(daily.c.day)
+    db.session.execute(insert(monthly).from_select(
+        ['user_id', 'month', 'category_id', 'type', 'total_minor', 'txn_count'],
+        for_user(
+            select(daily.c.user_id, month, daily.c.category_id, daily.c.type,
+                   func.sum(daily.c.total_minor), func.sum(daily.c.txn_count)),
+            daily
+        ).group_by(daily.c.user_id, month, daily.c.category_id, daily.c.type)
+    ))
+    db.session.commit()
+
+
+def check(user_id=None):
+    """Compare the rollups with raw transactions.
+
+    Returns a list of ``(table, key, expected, actual)`` tuples, where
+    ``expected``/``actual`` are ``(total, count)`` pairs or ``None`` when the
+    row is missing on that side. An empty list means the rollups are consistent.
+    """
+    where = 'WHERE user_id = :user_id' if user_id is not None else ''
+    params = {'user_id': user_id}
+
+    expected_daily = {
+        tuple(row[:4]): (row[4], row[5])
+        for row in db.session.execute(text(f'''
+            SELECT user_id, date, category_id, type, SUM(amount_minor), COUNT(*)
+            FROM "transaction"
+            {where}
+            GROUP BY user_id, date, category_id, type
+        '''), params)
+    }
+    expected_monthly = {}
+    for (uid, day, category_id, type), (total, count) in expected_daily.items():
+        key = (uid, day[:7], category_id, type)
+        month_total, month_count = expected_monthly.get(key, (0, 0))
+        expected_monthly[key] = (month_total + total, month_count + count)
+
+    actual_daily = {
+        tuple(row[:4]): (row[4], row[5])
+        for row in db.session.execute(text(f'''
+            SELECT user_id, day, category_id, type, total_minor, txn_count FROM daily_rollup {where}
+        '''), params)
+    }
+    actual_monthly = {
+        tuple(row[:4]): (row[4], row[5])
+        for row in db.session.execute(text(f'''
+            SELECT user_id, month, category_id, type, total_minor, txn_count FROM monthly_rollup {where}
+        '''), params)
+    }
+
+    mismatches = []
+    for table, expected, actual in (
+        ('daily_rollup', expected_daily, actual_daily),
+        ('monthly_rollup', expected_monthly, actual_monthly),
+    ):
+        for key in sorted(expected.keys() | actual.keys(), key=repr):
+            want, got = expected.get(key), actual.get(key)
+            if want != got:
+                mismatches.append((table, key, want, got))
+    return mismatches
+
+
+rollups_cli = AppGroup('rollups', help='Maintain the per-user transaction rollup tables.')
+
+
+@rollups_cli.command('rebuild')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user.')
+def rebuild_command(user_id):
+    """Regenerate the rollups from scratch."""
+    rebuild(user_id)
+    click.echo('Rollups rebuilt.')
+
+
+@rollups_cli.command('check')
+@click.option('--user-id', type=int, default=None, help='Only check this user.')
+def check_command(user_id):
+    """Report rollup rows that disagree with raw transactions."""
+    mismatches = check(user_id)
+    for table, key, expected, actual in mismatches:
+        click.echo(f'{table} {key}: expected {expected}, found {actual}')
+    if mismatches:
+        raise click.ClickException(f'{len(mismatches)} inconsistent rollup rows.')
+    click.echo('Rollups are consistent.')
@@ -0,0 +1,192 @@
+"""Portable table definitions and date-bucketing helpers.
+
+The schema is declared once with SQLAlchemy Core so it can be created on
+SQLite or PostgreSQL. Transaction and rollup dates are stored as
+``'YYYY-MM-DD'`` text on every backend, so range filters, keyset cursors and
+month prefixes compare identically everywhere; the helpers below cover the
+few places where the SQL for a date bucket differs between dialects.
+Amounts and rollup totals are 64-bit integers of the currency's minor unit
+(see ``money.py``). Transactions and rollups reference the user's
+categories by ``category_id`` (see ``categories.py``). A ``budget`` is a
+monthly limit on one of those categories (see ``budgets.py``).
+
+On SQLite, ``transaction_fts`` is an FTS5 index of each transaction's
+description and category name (see ``search.py``).
+"""
+from sqlalchemy import (
+    DDL, BigInteger, CheckConstraint, Column, Float, ForeignKey, Index, Integer, MetaData, PrimaryKeyConstraint,
+    String, Table, Text, TIMESTAMP, UniqueConstraint, func, literal_column, text,
+)
+from sqlalchemy import event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import GenericFunction
+
+from money import DEFAULT_CURRENCY
+
+metadata = MetaData()
+
+user = Table(
+    'user', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(150), nullable=False),
+    Column('email', String(150), nullable=False, unique=True),
+    Column('password', String(255), nullable=False),
+    Column('created_at', TIMESTAMP, server_default=func.current_timestamp()),
+    Column('data_version', Integer, nullable=False, server_default=text('0')),
+    CheckConstraint("email LIKE '%_@__%.__%'"),
+    sqlite_autoincrement=True,
+)
+
+transaction = Table(
+    'transaction', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('type', String(50), nullable=False),
+    Column('category_id', Integer, ForeignKey('category.id'), nullable=False),
+    Column('amount_minor', BigInteger, CheckConstraint('amount_minor > 0'), nullable=False),
+    Column('currency', String(3), nullable=False, server_default=text(f"'{DEFAULT_CURRENCY}'")),
+    Column('date', String(10), nullable=False),
+    Column('description', Text),
+    Column('user_id', Integer, ForeignKey('user.id', ondelete='CASCADE')),
+    # Recent transactions, listings and date windows
+    Index('ix_transaction_user_date', 'user_id', 'date'),
+    # Per-type sums and month windows, covering the amount so SUM() never touches the table
+    Index('ix_transaction_user_type_date', 'user_id', 'type', 'date', 'amount_minor'),
+    # Repeated expenses by description for the insights, without a sort
+    Index('ix_transaction_user_type_description', 'user_id', 'type', 'description'),
+    sqlite_autoincrement=True,
+)
+
+category = Table(
+    'category', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(50), nullable=False),
+    Column('user_id', Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False),
+    # Names are unique per user; the index also serves each user's category list
+    UniqueConstraint('user_id', 'name'),
+    sqlite_autoincrement=True,
+)
+
+# Contentless: the text lives in "transaction" and category, so the index
+# only stores tokens. ``owner`` holds 'u<user_id>' so a search intersects
+# with the user's own rows inside the index; it is weighted 0 in the rank.
+# Prefix indexes serve 2 and 3 letter prefixes; detail=column drops token
+# positions, which only phrase queries need.
+TRANSACTION_SEARCH_DDL = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS transaction_fts USING fts5(
+        owner, description, category,
+        content='', detail=column, tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    ''',
+    "INSERT INTO transaction_fts (transaction_fts, rank) VALUES ('rank', 'bm25(0.0, 1.0, 0.5)')",
+]
+
+daily_rollup = Table(
+    'daily_rollup', metadata,
+    Column('user_id', Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False),
+    Column('day', String(10), nullable=False),
+    Column('category_id', Integer, nullable=False),
+    Column('type', String(50), nullable=False),
+    Column('total_minor', BigInteger, nullable=False, server_default=text('0')),
+    Column('txn_count', Integer, nullable=False, server_default=text('0')),
+    PrimaryKeyConstraint('user_id', 'day', 'category_id', 'type'),
+)
+
+monthly_rollup = Table(
+    'monthly_rollup', metadata,
+    Column('user_id', Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False),
+    Column('month', String(7), nullable=False),
+    Column('category_id', Integer, nullable=False),
+    Column('type', String(50), nullable=False),
+    Column('total_minor', BigInteger, nullable=False, server_default=text('0')),
+    Column('txn_count', Integer, nullable=False, server_default=text('0')),
+    PrimaryKeyConstraint('user_id', 'month', 'category_id', 'type'),
+)
+
+# Spending against a budget is the category's monthly_rollup expense row
+budget = Table(
+    'budget', metadata,
+    Column('user_id', Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False),
+    Column('category_id', Integer, ForeignKey('category.id'), nullable=False),
+    Column('amount_minor', BigInteger, CheckConstraint('amount_minor > 0'), nullable=False),
+    Column('currency', String(3), nullable=False, server_default=text(f"'{DEFAULT_CURRENCY}'")),
+    PrimaryKeyConstraint('user_id', 'category_id'),
+)
+
+insight = Table(
+    'insight', metadata,
+    Column('user_id', Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False),
+    Column('kind', String(50), nullable=False),
+    # The 'YYYY-MM' month the items were computed in
+    Column('period', String(7), nullable=False),
+    Column('items', Text, nullable=False, server_default=text("'[]'")),
+    Column('computed_at', TIMESTAMP, server_default=func.current_timestamp()),
+    PrimaryKeyConstraint('user_id', 'kind'),
+)
+
+job = Table(
+    'job', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('kind', String(50), nullable=False),
+    Column('user_id', Integer, ForeignKey('user.id', ondelete='CASCADE')),
+    Column('status', String(20), nullable=False, server_default=text("'queued'")),
+    Column('payload', Text, nullable=False, server_default=text("'{}'")),
+    Column('result', Text),
+    Column('error', Text),
+    Column('progress', Float, nullable=False, server_default=text('0')),
+    Column('message', String(255)),
+    Column('attempts', Integer, nullable=False, server_default=text('0')),
+    Column('max_attempts', Integer, nullable=False, server_default=text('3')),
+    # Epoch seconds: earliest start for a queued job, lease expiry for a running one
+    Column('run_after', Float, nullable=False, server_default=text('0')),
+    Column('lease_expires', Float),
+    Column('created_at', TIMESTAMP, server_default=func.current_timestamp()),
+    Column('finished_at', TIMESTAMP),
+    Index('ix_job_status_run_after', 'status', 'run_after'),
+    Index('ix_job_user_id', 'user_id', 'id'),
+    sqlite_autoincrement=True,
+)
+
+for _statement in TRANSACTION_SEARCH_DDL:
+    # Existing databases get the index from migration 8
+    event.listen(transaction, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+
+schema_migration = Table(
+    'schema_migration', metadata,
+    Column('version', Integer, primary_key=True, autoincrement=False),
+    Column('name', String(150), nullable=False),
+    Column('applied_at', TIMESTAMP, server_default=func.current_timestamp()),
+)
+
+
+class day_bucket(GenericFunction):
+    """The ``'YYYY-MM-DD'`` day of a stored date or timestamp string."""
+    type = String()
+    inherit_cache = True
+
+
+class month_bucket(GenericFunction):
+    """The ``'YYYY-MM'`` month of a stored date string."""
+    type = String()
+    inherit_cache = True
+
+
+def _prefix(element, length):
+    # Literal offsets keep SELECT and GROUP BY expressions identical on PostgreSQL
+    return func.substr(*element.clauses, literal_column('1'), literal_column(str(length)))
+
+
+@compiles(day_bucket)
+def _day_bucket_default(element, compiler, **kw):
+    return compiler.process(_prefix(element, 10), **kw)
+
+
+@compiles(day_bucket, 'sqlite')
+def _day_bucket_sqlite(element, compiler, **kw):
+    # date() also normalizes timestamps written with a 'T' separator or an offset
+    return compiler.process(func.date(*element.clauses), **kw)
+
+
+@compiles(month_bucket)
+def _month_bucket(element, compiler, **kw):
+    return compiler.process(_prefix(element, 7), **kw)
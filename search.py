@@ -0,0 +1,206 @@
+"""Ranked full-text search over transaction descriptions and categories.
+
+On SQLite the search reads the ``transaction_fts`` FTS5 index declared in
+``schema.py``. Every word of the query matches as a prefix of a word in the
+description or the category name ("cof lun" finds "Coffee with lunch"), and
+results are ordered by bm25 rank, description matches weighing twice as
+much as category matches, then most recently added first. Pages are
+addressed by an opaque cursor holding the offset of the next page.
+
+The write paths keep the index in step through ``record_insert``,
+``record_bulk``, ``record_update``, ``record_delete`` and, for batches,
+``record_changes``, next to the rollup updates. A bulk insert is indexed with one ``INSERT ... SELECT``; FTS5 tables
+written from triggers flush their pending terms on every row, which halved
+import throughput. ``rebuild`` regenerates the index.
+
+PostgreSQL has no FTS5, so there the search falls back to the transaction
+list's substring filter, newest first, and the ``record_*`` functions do
+nothing.
+"""
+import base64
+import re
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from extensions import db
+from records import TRANSACTION_COLUMN_TYPES, TRANSACTION_COLUMNS, TRANSACTION_TABLES, transaction_records
+from transaction_query import FilterError, fetch_page, page_size
+
+# Words searched per query; longer queries only narrow an already small result
+MAX_TERMS = 8
+
+# Words as the unicode61 tokenizer splits them: it treats '_' as a separator,
+# and a quoted term it splits into several would be a phrase, which
+# detail=column cannot answer
+_WORD = re.compile(r'[^\W_]+')
+
+# The page is ranked and cut inside the index, so only its rows are joined
+SEARCH_STATEMENT = text(f'''
+    SELECT {TRANSACTION_COLUMNS}
+    FROM {TRANSACTION_TABLES} JOIN (
+        SELECT rowid AS id, rank FROM transaction_fts
+        WHERE transaction_fts MATCH :match
+        ORDER BY rank, rowid DESC
+        LIMIT :limit OFFSET :offset
+    ) page ON page.id = t.id
+    WHERE t.user_id = :user_id
+    ORDER BY page.rank, page.id DESC
+''').columns(**TRANSACTION_COLUMN_TYPES)
+
+# SQLite runs one write transaction at a time and AUTOINCREMENT ids only
+# grow, so right after an insert the table's newest ``:count`` rows are the
+# inserted ones: a primary key range ending at MAX(id). The unary + keeps
+# SQLite from reading the user's whole history through ix_transaction_user_date.
+_INDEX_NEWEST = text('''
+    INSERT INTO transaction_fts (rowid, owner, description, category)
+    SELECT t.id, 'u' || t.user_id, COALESCE(t.description, ''), c.name
+    FROM "transaction" t JOIN category c ON c.id = t.category_id
+    WHERE t.id > (SELECT MAX(id) FROM "transaction") - :count AND +t.user_id = :user_id
+''')
+
+# A contentless index deletes a row given the values it was indexed with
+_UNINDEX = text('''
+    INSERT INTO transaction_fts (transaction_fts, rowid, owner, description, category)
+    VALUES ('delete', :id, 'u' || :user_id, :description, :category)
+''')
+
+_INDEX = text('''
+    INSERT INTO transaction_fts (rowid, owner, description, category)
+    VALUES (:id, 'u' || :user_id, :description, :category)
+''')
+
+
+def _enabled():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def _indexed(user_id, row):
+    return {
+        'id': row['id'],
+        'user_id': user_id,
+        'description': row['description'] or '',
+        'category': row['category'],
+    }
+
+
+def record_insert(user_id):
+    """Index the transaction just inserted for the user (caller commits)."""
+    if _enabled():
+        db.session.execute(_INDEX_NEWEST, {'user_id': user_id, 'count': 1})
+
+
+def record_bulk(user_id, rows):
+    """Index the transactions of ``rows``, just inserted for the user, with one statement (caller commits)."""
+    if _enabled() and rows:
+        db.session.execute(_INDEX_NEWEST, {'user_id': user_id, 'count': len(rows)})
+
+
+def record_changes(user_id, removed=(), added=()):
+    """Unindex the ``removed`` rows and index the ``added`` ones, one statement each (caller commits).
+
+    Rows are dicts with the transaction's ``id``, ``description`` and
+    ``category`` name; ``removed`` rows carry the values they were indexed with.
+    """
+    if not _enabled():
+        return
+    if removed:
+        db.session.execute(_UNINDEX, [_indexed(user_id, row) for row in removed])
+    if added:
+        db.session.execute(_INDEX, [_indexed(user_id, row) for row in added])
+
+
+def record_update(user_id, old, new):
+    """Re-index a transaction whose description or category changed (caller commits).
+
+    ``old`` and ``new`` are dicts with the transaction's ``id``,
+    ``description`` and ``category`` name.
+    """
+    if (old['description'] or '') == (new['description'] or '') and old['category'] == new['category']:
+        return
+    record_changes(user_id, removed=[old], added=[dict(new, id=old['id'])])
+
+
+def record_delete(user_id, row):
+    """Remove a deleted transaction from the index (caller commits)."""
+    record_changes(user_id, removed=[row])
+
+
+def rebuild():
+    """Regenerate the index from every transaction."""
+    if not _enabled():
+        return
+    db.session.execute(text("INSERT INTO transaction_fts (transaction_fts) VALUES ('delete-all')"))
+    db.session.execute(text('''
+        INSERT INTO transaction_fts (rowid, owner, description, category)
+        SELECT t.id, 'u' || t.user_id, COALESCE(t.description, ''), c.name
+        FROM "transaction" t JOIN category c ON c.id = t.category_id
+    '''))
+    db.session.commit()
+
+
+def match_expression(user_id, query):
+    """Build the FTS5 query for ``query``, restricted to the user's rows.
+
+    Raises ``FilterError`` when the query has no word to search for.
+    """
+    terms = _WORD.findall(query.lower())[:MAX_TERMS]
+    if not terms:
+        raise FilterError('q must contain a word to search for.')
+    # Words are quoted so FTS5 operators typed by the user are searched literally
+    words = ' AND '.join(f'"{term}"*' for term in terms)
+    return f'owner : "u{user_id}" AND {{description category}} : ({words})'
+
+
+def _encode_offset(offset):
+    return base64.urlsafe_b64encode(f'offset|{offset}'.encode()).decode()
+
+
+def _decode_offset(cursor):
+    try:
+        label, offset = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        offset = int(offset)
+    except (ValueError, UnicodeDecodeError):
+        raise FilterError('cursor is invalid.')
+    if label != 'offset' or offset < 0:
+        raise FilterError('cursor is invalid.')
+    return offset
+
+
+def search_transactions(user_id, query, cursor=None, limit=None):
+    """Return ``(records, next_cursor)`` for one page of the user's matches, best first."""
+    limit = limit or page_size()
+    if not _enabled():
+        return fetch_page(user_id, {'q': query.strip()}, cursor=cursor, limit=limit)
+
+    offset = _decode_offset(cursor) if cursor else 0
+    try:
+        rows = transaction_records(db.session.execute(SEARCH_STATEMENT, {
+            'match': match_expression(user_id, query),
+            'user_id': user_id,
+            'limit': limit + 1,
+            'offset': offset,
+        }))
+    except OperationalError as e:
+        # A query FTS5 cannot parse or answer is the caller's, not a server error
+        if 'fts5' not in str(e.orig):
+            raise
+        raise FilterError('q cannot be searched for.')
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_offset(offset + limit)
+    return rows, next_cursor
+
+
+search_cli = AppGroup('search', help='Maintain the transaction search index.')
+
+
+@search_cli.command('rebuild')
+def rebuild_command():
+    """Regenerate the search index from scratch."""
+    rebuild()
+    click.echo('Search index rebuilt.')
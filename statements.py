@@ -0,0 +1,399 @@
+"""Named, pre-built SQL statements for the request path.
+
+Each statement is built once at import with its result column types, and
+views run it by name instead of constructing ``text()`` on every call. Reusing
+the same statement object skips re-parsing the SQL for bind parameters and
+lets SQLAlchemy memoize its cache key, so every execution after the first is
+a straight hit in the engine's compiled-statement cache. ``prepare()`` runs
+``EXPLAIN`` for the whole registry against the configured database at
+startup, with every parameter bound to NULL, so a statement with a syntax
+error or a missing table or column fails there rather than on first use.
+
+A statement's mapper turns the raw ``Result`` into what callers use:
+
+``scalar``    the first column of the first row, or ``None``
+``first``     the first row as a mapping, or ``None``
+``rows``      every row as a mapping
+``records``   every row as a ``records.TransactionRecord``
+``record``    the first row as a ``records.TransactionRecord``, or ``None``
+``column``    the first column of every row
+``stream``    the ``Result`` itself, iterated row by row by the caller
+``execute``   nothing; for writes (pass a list of dicts for executemany)
+
+Amounts are integer minor units (see ``money.py``). PostgreSQL widens
+``SUM(bigint)`` to ``numeric``, so sums of amounts are cast back to
+``BIGINT`` to reach Python as ``int`` on every backend.
+"""
+from sqlalchemy import BigInteger, Integer, String, text
+from sqlalchemy.exc import DBAPIError
+
+from extensions import db
+from records import (
+    TRANSACTION_COLUMN_TYPES, TRANSACTION_COLUMNS, TRANSACTION_TABLES, TransactionRecord, transaction_records,
+)
+
+REGISTRY = {}
+
+
+def scalar(result):
+    return result.scalar()
+
+
+def first(result):
+    return result.mappings().first()
+
+
+def rows(result):
+    return result.mappings().all()
+
+
+def records(result):
+    return transaction_records(result)
+
+
+def record(result):
+    row = result.first()
+    return TransactionRecord(*row) if row is not None else None
+
+
+def column(result):
+    return result.scalars().all()
+
+
+def stream(result):
+    return result
+
+
+def execute(result):
+    return None
+
+
+class Statement:
+    __slots__ = ('name', 'sql', 'clause', 'mapper')
+
+    def __init__(self, name, sql, mapper, columns=None):
+        clause = text(sql)
+        if columns:
+            clause = clause.columns(**columns)
+        self.name = name
+        self.sql = sql
+        self.clause = clause
+        self.mapper = mapper
+
+    def __call__(self, params=None, **kwargs):
+        return self.mapper(db.session.execute(self.clause, params if params is not None else kwargs))
+
+    def __repr__(self):
+        return f'<Statement {self.name}>'
+
+
+def statement(name, sql, mapper, /, **columns):
+    """Build, register and return a named statement."""
+    if name in REGISTRY:
+        raise ValueError(f'Statement {name!r} is already registered')
+    REGISTRY[name] = Statement(name, sql, mapper, columns)
+    return REGISTRY[name]
+
+
+def prepare(engine):
+    """Check every registered statement against ``engine``'s database; return how many.
+
+    Raises ``ValueError`` naming the first statement the database rejects.
+    ``EXPLAIN`` plans a write without running it.
+    """
+    with engine.connect() as connection:
+        for stmt in REGISTRY.values():
+            compiled = stmt.clause.compile(dialect=engine.dialect)
+            try:
+                connection.execute(text(f'EXPLAIN {stmt.sql}'), dict.fromkeys(compiled.params))
+            except DBAPIError as e:
+                raise ValueError(f'Statement {stmt.name!r} does not prepare: {e.orig}') from e
+        connection.rollback()
+    return len(REGISTRY)
+
+
+# Users
+
+USER_BY_ID = statement(
+    'user_by_id',
+    'SELECT id, name, email FROM "user" WHERE id = :user_id',
+    first, id=Integer, name=String, email=String,
+)
+
+USER_LOGIN = statement(
+    'user_login',
+    'SELECT id, name, email, password FROM "user" WHERE email = :email',
+    first, id=Integer, name=String, email=String, password=String,
+)
+
+USER_ID_BY_EMAIL = statement(
+    'user_id_by_email',
+    'SELECT id FROM "user" WHERE email = :email',
+    scalar, id=Integer,
+)
+
+INSERT_USER = statement(
+    'insert_user',
+    'INSERT INTO "user" (name, email, password) VALUES (:name, :email, :password)',
+    execute,
+)
+
+UPDATE_USER_PASSWORD = statement(
+    'update_user_password',
+    'UPDATE "user" SET password = :password WHERE id = :user_id',
+    execute,
+)
+
+DATA_VERSION = statement(
+    'data_version',
+    'SELECT data_version FROM "user" WHERE id = :user_id',
+    scalar, data_version=Integer,
+)
+
+BUMP_DATA_VERSION = statement(
+    'bump_data_version',
+    'UPDATE "user" SET data_version = data_version + 1 WHERE id = :user_id',
+    execute,
+)
+
+# Transactions
+
+RECENT_TRANSACTIONS = statement(
+    'recent_transactions',
+    f'''
+        SELECT {TRANSACTION_COLUMNS}
+        FROM {TRANSACTION_TABLES}
+        WHERE t.user_id = :user_id
+        ORDER BY t.date DESC, t.id DESC
+        LIMIT 5
+    ''',
+    records, **TRANSACTION_COLUMN_TYPES,
+)
+
+TRANSACTION_BY_ID = statement(
+    'transaction_by_id',
+    f'''
+        SELECT {TRANSACTION_COLUMNS}
+        FROM {TRANSACTION_TABLES}
+        WHERE t.id = :id AND t.user_id = :user_id
+    ''',
+    record, **TRANSACTION_COLUMN_TYPES,
+)
+
+INSERT_TRANSACTION = statement(
+    'insert_transaction',
+    '''
+        INSERT INTO "transaction" (type, category_id, amount_minor, currency, date, description, user_id)
+        VALUES (:type, :category_id, :amount_minor, :currency, :date, :description, :user_id)
+    ''',
+    execute,
+)
+
+UPDATE_TRANSACTION = statement(
+    'update_transaction',
+    '''
+        UPDATE "transaction"
+        SET date = :date, type = :type, category_id = :category_id, amount_minor = :amount_minor,
+            currency = :currency, description = :description
+        WHERE id = :id AND user_id = :user_id
+    ''',
+    execute,
+)
+
+DELETE_TRANSACTION = statement(
+    'delete_transaction',
+    'DELETE FROM "transaction" WHERE id = :id AND user_id = :user_id',
+    execute,
+)
+
+# Categories
+
+USER_CATEGORIES = statement(
+    'user_categories',
+    'SELECT id, name FROM category WHERE user_id = :user_id',
+    rows, id=Integer, name=String,
+)
+
+# Another process may have created the same category since it was looked up
+INSERT_CATEGORY = statement(
+    'insert_category',
+    'INSERT INTO category (name, user_id) VALUES (:name, :user_id) ON CONFLICT DO NOTHING',
+    execute,
+)
+
+# Dashboard and analytics
+
+DASHBOARD_TOTALS = statement(
+    'dashboard_totals',
+    '''
+        SELECT type, category_id, CAST(SUM(total_minor) AS BIGINT) AS total_minor
+        FROM monthly_rollup
+        WHERE user_id = :user_id
+        GROUP BY type, category_id
+    ''',
+    rows, type=String, category_id=Integer, total_minor=BigInteger,
+)
+
+TYPE_TOTALS = statement(
+    'type_totals',
+    '''
+        SELECT type, CAST(SUM(total_minor) AS BIGINT) AS total_minor, SUM(txn_count) AS txn_count
+        FROM monthly_rollup
+        WHERE user_id = :user_id
+        GROUP BY type
+    ''',
+    rows, type=String, total_minor=BigInteger, txn_count=Integer,
+)
+
+ANALYTICS_ROLLUP = statement(
+    'analytics_rollup',
+    '''
+        SELECT type, category_id, total_minor, txn_count, day
+        FROM daily_rollup
+        WHERE user_id = :user_id
+    ''',
+    stream,
+)
+
+ANALYTICS_EXPENSE_ROWS = statement(
+    'analytics_expense_rows',
+    '''
+        SELECT amount_minor, date AS day
+        FROM "transaction"
+        WHERE user_id = :user_id AND type = 'expense'
+        ORDER BY date, id
+    ''',
+    stream,
+)
+
+ANALYTICS_TRANSACTIONS = statement(
+    'analytics_transactions',
+    '''
+        SELECT type, category_id, amount_minor, date AS day
+        FROM "transaction"
+        WHERE user_id = :user_id
+        ORDER BY date, id
+    ''',
+    stream,
+)
+
+# Budgets
+
+# One primary key lookup in monthly_rollup per budget, whatever the month holds
+BUDGET_STATUS = statement(
+    'budget_status',
+    '''
+        SELECT b.category_id, b.amount_minor AS budget_minor, b.currency,
+               COALESCE(m.total_minor, 0) AS spent_minor
+        FROM budget b
+        LEFT JOIN monthly_rollup m
+          ON m.user_id = b.user_id AND m.month = :month AND m.category_id = b.category_id AND m.type = 'expense'
+        WHERE b.user_id = :user_id
+    ''',
+    rows, category_id=Integer, budget_minor=BigInteger, currency=String, spent_minor=BigInteger,
+)
+
+CATEGORY_BUDGET_STATUS = statement(
+    'category_budget_status',
+    '''
+        SELECT b.category_id, b.amount_minor AS budget_minor, b.currency,
+               COALESCE(m.total_minor, 0) AS spent_minor
+        FROM budget b
+        LEFT JOIN monthly_rollup m
+          ON m.user_id = b.user_id AND m.month = :month AND m.category_id = b.category_id AND m.type = 'expense'
+        WHERE b.user_id = :user_id AND b.category_id = :category_id
+    ''',
+    first, category_id=Integer, budget_minor=BigInteger, currency=String, spent_minor=BigInteger,
+)
+
+UPSERT_BUDGET = statement(
+    'upsert_budget',
+    '''
+        INSERT INTO budget (user_id, category_id, amount_minor, currency)
+        VALUES (:user_id, :category_id, :amount_minor, :currency)
+        ON CONFLICT (user_id, category_id) DO UPDATE SET
+            amount_minor = excluded.amount_minor,
+            currency = excluded.currency
+    ''',
+    execute,
+)
+
+DELETE_BUDGET = statement(
+    'delete_budget',
+    'DELETE FROM budget WHERE user_id = :user_id AND category_id = :category_id',
+    execute,
+)
+
+# Insights
+
+USER_INSIGHTS = statement(
+    'user_insights',
+    'SELECT kind, period, items FROM insight WHERE user_id = :user_id',
+    rows, kind=String, period=String, items=String,
+)
+
+# Only stored while the user's data version is the one read before computing
+STORE_INSIGHT = statement(
+    'store_insight',
+    '''
+        INSERT INTO insight (user_id, kind, period, items, computed_at)
+        SELECT :user_id, :kind, :period, :items, CURRENT_TIMESTAMP
+        WHERE (SELECT data_version FROM "user" WHERE id = :user_id) = :version
+        ON CONFLICT (user_id, kind) DO UPDATE SET
+            period = excluded.period,
+            items = excluded.items,
+            computed_at = excluded.computed_at
+    ''',
+    execute,
+)
+
+DELETE_INSIGHT = statement(
+    'delete_insight',
+    'DELETE FROM insight WHERE user_id = :user_id AND kind = :kind',
+    execute,
+)
+
+INSIGHT_EXPENSE_CATEGORIES = statement(
+    'insight_expense_categories',
+    '''
+        SELECT category_id, CAST(SUM(total_minor) AS BIGINT) AS total_minor, SUM(txn_count) AS txn_count
+        FROM monthly_rollup
+        WHERE user_id = :user_id AND type = 'expense'
+        GROUP BY category_id
+    ''',
+    rows, category_id=Integer, total_minor=BigInteger, txn_count=Integer,
+)
+
+INSIGHT_MONTHLY_EXPENSES = statement(
+    'insight_monthly_expenses',
+    '''
+        SELECT month, category_id, total_minor
+        FROM monthly_rollup
+        WHERE user_id = :user_id AND type = 'expense' AND month >= :start AND month <= :end
+    ''',
+    rows, month=String, category_id=Integer, total_minor=BigInteger,
+)
+
+INSIGHT_FREQUENT_EXPENSE = statement(
+    'insight_frequent_expense',
+    '''
+        SELECT description, COUNT(*) AS freq
+        FROM "transaction"
+        WHERE user_id = :user_id AND type = 'expense'
+        GROUP BY description
+        ORDER BY freq DESC
+        LIMIT 1
+    ''',
+    first, description=String, freq=Integer,
+)
+
+INSIGHT_MONTH_EXPENSES = statement(
+    'insight_month_expenses',
+    f'''
+        SELECT {TRANSACTION_COLUMNS}
+        FROM {TRANSACTION_TABLES}
+        WHERE t.user_id = :user_id AND t.type = 'expense' AND t.date >= :start AND t.date < :end
+        ORDER BY t.date, t.id
+    ''',
+    records, **TRANSACTION_COLUMN_TYPES,
+)
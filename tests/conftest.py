@@ -0,0 +1,155 @@
+import os
+import sqlite3
+
+import pytest
+from sqlalchemy import MetaData, create_engine
+from sqlalchemy.engine import make_url
+from werkzeug.security import generate_password_hash
+
+from config import Config
+
+# Run the suite against another database, e.g. a throwaway PostgreSQL, with
+# TEST_DATABASE_URL=postgresql+psycopg://...; every table in it is dropped
+# before each test. Unset, each test gets its own SQLite file.
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+# For tests of SQLite features: FTS5, PRAGMAs and upgrades of baseline database files
+sqlite_only = pytest.mark.skipif(
+    TEST_DATABASE_URL is not None and make_url(TEST_DATABASE_URL).get_backend_name() != 'sqlite',
+    reason='SQLite only',
+)
+
+# The tables as the first release of the app created them
+BASELINE_DDL = [
+    '''
+    CREATE TABLE user (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name VARCHAR(150) NOT NULL,
+        email VARCHAR(150) UNIQUE NOT NULL CHECK (email LIKE '%_@__%.__%'),
+        password VARCHAR(255) NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE "transaction" (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type VARCHAR(50) NOT NULL,
+        category VARCHAR(50) NOT NULL,
+        amount FLOAT NOT NULL CHECK (amount > 0),
+        date TIMESTAMP NOT NULL,
+        description TEXT,
+        user_id INTEGER,
+        FOREIGN KEY (user_id) REFERENCES user (id) ON DELETE CASCADE
+    )
+    ''',
+    '''
+    CREATE TABLE category (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name VARCHAR(50) UNIQUE NOT NULL,
+        user_id INTEGER NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES user (id) ON DELETE CASCADE,
+        UNIQUE(name, user_id)
+    )
+    ''',
+]
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    """URL of an empty database for the test."""
+    if TEST_DATABASE_URL is None:
+        return f'sqlite:///{tmp_path / "fintrack.db"}'
+
+    engine = create_engine(TEST_DATABASE_URL)
+    metadata = MetaData()
+    metadata.reflect(engine)
+    metadata.drop_all(engine)
+    engine.dispose()
+    return TEST_DATABASE_URL
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch, database_url):
+    """Return a factory for apps on the test database; keyword arguments override the config.
+
+    ``database_path`` opens that SQLite file instead.
+    """
+    def make(database_path=None, **config):
+        settings = {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database_path}' if database_path else database_url,
+            'PASSWORD_HASH_WORKERS': 0,
+            'JOBS_WORKERS': 0,
+            'JOBS_DIR': str(tmp_path / 'jobs'),
+            **config,
+        }
+        for name, value in settings.items():
+            monkeypatch.setattr(Config, name, value, raising=False)
+
+        from app import create_app
+
+        app = create_app()
+        app.config['TESTING'] = True
+        return app
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def baseline_database(tmp_path):
+    """Path of a SQLite database in the baseline schema with one user's transactions."""
+    path = tmp_path / 'baseline.db'
+    connection = sqlite3.connect(path)
+    for statement in BASELINE_DDL:
+        connection.execute(statement)
+    connection.execute(
+        "INSERT INTO user (name, email, password) VALUES ('Ann', 'ann@example.com', ?)",
+        (generate_password_hash('secret'),)
+    )
+    connection.executemany(
+        'INSERT INTO "transaction" (type, category, amount, date, description, user_id) VALUES (?, ?, ?, ?, ?, 1)',
+        [
+            ('expense', 'Food', 5, '2024-01-02 10:11:12', 'Lunch'),
+            ('income', 'Salary', 100, '2024-01-03', 'Pay day'),
+            ('expense', 'Food', 7.29, '2024-02-01T08:00:00', None),
+            ('expense', 'Food', 0.1 + 0.2, '2024-02-02', 'Coffee'),
+        ]
+    )
+    connection.execute("INSERT INTO category (name, user_id) VALUES ('Food', 1)")
+    connection.commit()
+    connection.close()
+    return path
+
+
+def create_user(app):
+    """Add a user who can log in as ann@example.com with password 'secret'; return the id."""
+    import statements
+    from extensions import db
+
+    with app.app_context():
+        statements.INSERT_USER(name='Ann', email='ann@example.com', password=generate_password_hash('secret'))
+        user_id = statements.USER_ID_BY_EMAIL(email='ann@example.com')
+        db.session.commit()
+    return user_id
+
+
+@pytest.fixture
+def user(app):
+    return create_user(app)
+
+
+def log_in(app):
+    """Return a test client logged in as ann@example.com."""
+    client = app.test_client()
+    response = client.post('/login', data={'email': 'ann@example.com', 'password': 'secret'})
+    assert response.status_code == 302
+    return client
+
+
+@pytest.fixture
+def client(app, user):
+    """A test client logged in as ``user``."""
+    return log_in(app)
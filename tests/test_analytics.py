@@ -0,0 +1,34 @@
+import analytics_engine
+
+
+def add(client, day, amount, type='expense'):
+    response = client.post('/add_transaction', data={
+        'type': type, 'category': 'Food', 'amount': amount, 'date': day, 'description': 'x',
+    })
+    assert response.status_code == 302
+
+
+def test_analytics_page_builds_no_charts(app, user, client, monkeypatch):
+    add(client, '2024-01-02', '12.50')
+    add(client, '2024-01-03', '100.00', type='income')
+    add(client, '2024-02-01', '7.25')
+    with app.app_context():
+        expected = analytics_engine.build_analytics(user)['metrics']
+
+    def build_charts(*args, **kwargs):
+        raise AssertionError('the page must not build charts')
+
+    monkeypatch.setattr(analytics_engine, 'build_analytics', build_charts)
+    with app.app_context():
+        assert analytics_engine.build_metrics(user) == expected
+    response = client.get('/analytics')
+    assert response.status_code == 200
+    assert b'No Data Available' not in response.data
+
+
+def test_analytics_page_without_transactions(client):
+    response = client.get('/analytics')
+    assert response.status_code == 200
+    assert b'No Data Available' in response.data
+    with client.application.app_context():
+        assert analytics_engine.build_metrics(1) is None
@@ -0,0 +1,59 @@
+import sqlite3
+
+from sqlalchemy import text
+
+import budgets
+import migrations
+from conftest import log_in, sqlite_only
+from extensions import db
+
+
+@sqlite_only
+def test_budget_after_upgrading_baseline_database(make_app, baseline_database):
+    app = make_app(baseline_database)
+    client = log_in(app)
+
+    response = client.post('/budgets', data={'category': 'Food', 'amount': '10.00'})
+    assert response.status_code == 302
+    with app.app_context():
+        [status] = budgets.budget_status(1)
+        assert (status['category'], str(status['budget'])) == ('Food', '10.00')
+        foreign_keys = db.session.execute(text('PRAGMA foreign_key_list(budget)')).fetchall()
+        assert {row[2] for row in foreign_keys} == {'user', 'category'}
+
+
+@sqlite_only
+def test_upgrade_repairs_budget_created_before_category_migration(make_app, baseline_database):
+    make_app(baseline_database)
+    # The state left by upgrades that created budget before migration 7
+    connection = sqlite3.connect(baseline_database)
+    connection.executescript('''
+        DROP TABLE budget;
+        CREATE TABLE budget (
+            user_id INTEGER NOT NULL REFERENCES "user" (id) ON DELETE CASCADE,
+            category_id INTEGER NOT NULL REFERENCES "category_old" (id),
+            amount_minor BIGINT NOT NULL CHECK (amount_minor > 0),
+            currency VARCHAR(3) DEFAULT 'USD' NOT NULL,
+            PRIMARY KEY (user_id, category_id)
+        );
+        INSERT INTO budget (user_id, category_id, amount_minor) VALUES (1, 1, 2500);
+        DELETE FROM schema_migration WHERE version = 9;
+    ''')
+    connection.close()
+
+    app = make_app(baseline_database)
+    with app.app_context():
+        assert 9 in migrations.applied_versions()
+        assert [str(status['budget']) for status in budgets.budget_status(1)] == ['25.00']
+        budgets.set_budget(1, 'Salary', '50')
+        db.session.commit()
+        assert len(budgets.budget_status(1)) == 2
+
+
+def test_overrun_message_uses_the_budget_currency():
+    status = budgets._status(
+        {'category_id': 1, 'spent_minor': 12500, 'budget_minor': 10000, 'currency': 'KWD'}, 'Food', '2024-03'
+    )
+    assert budgets.overrun_message(status) == (
+        'You are over your Food budget for March 2024: 12.500 KWD spent of 10.000 KWD.'
+    )
@@ -0,0 +1,35 @@
+import random
+from datetime import date
+
+from sqlalchemy import text
+
+import datagen
+from extensions import db
+
+
+def _history(seed, **kwargs):
+    return list(datagen.generate_history(random.Random(seed), 1, 200, days=90, **kwargs))
+
+
+def test_seed_alone_reproduces_a_history():
+    first = _history(7)
+    assert first == _history(7)
+    assert first != _history(8)
+    assert max(row['date'] for row in first) <= datagen.DEFAULT_END.isoformat()
+
+
+def test_history_ends_on_the_given_day():
+    rows = _history(7, end=date(2024, 2, 29))
+    assert min(row['date'] for row in rows) >= '2023-12-02'
+    assert max(row['date'] for row in rows) <= '2024-02-29'
+
+
+def test_generate_command_takes_an_end_date(app):
+    result = app.test_cli_runner().invoke(args=[
+        'data', 'generate', '--users', '1', '--transactions-per-user', '100', '--days', '60',
+        '--end', '2024-06-30',
+    ])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        last = db.session.execute(text('SELECT MAX(date) FROM "transaction"')).scalar()
+    assert '2024-05-02' <= last[:10] <= '2024-06-30'
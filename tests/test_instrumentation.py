@@ -0,0 +1,39 @@
+import pytest
+
+
+@pytest.fixture
+def instrumented(make_app, tmp_path):
+    def make(**config):
+        return make_app(INSTRUMENTATION_ENABLED=True, INSTRUMENTATION_PROFILE_DIR=str(tmp_path / 'profiles'), **config)
+    return make
+
+
+def test_metrics_are_not_served_without_a_token(instrumented):
+    client = instrumented().test_client()
+    assert client.get('/metrics').status_code == 404
+    assert 'Server-Timing' in client.get('/login').headers
+
+
+def test_metrics_require_the_token(instrumented):
+    client = instrumented(INSTRUMENTATION_METRICS_TOKEN='s3cret').test_client()
+    client.get('/login')
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert 'fintrack_request_duration_seconds_bucket{endpoint="login"' in response.text
+
+
+@pytest.mark.parametrize('profiling, debug, written', [
+    (False, False, False),
+    (False, True, False),
+    (True, False, False),
+    (True, True, True),
+])
+def test_profiling_needs_the_flag_and_debug_mode(instrumented, tmp_path, profiling, debug, written):
+    app = instrumented(INSTRUMENTATION_PROFILING=profiling)
+    app.debug = debug
+    assert app.test_client().get('/login?_profile=1').status_code == 200
+    profiles = tmp_path / 'profiles'
+    assert (profiles.exists() and any(profiles.iterdir())) == written
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+from sqlalchemy import text
+
+import jobs
+from extensions import db
+import statements
+
+
+@pytest.fixture
+def run_jobs(app):
+    def run():
+        jobs.job_runner.work(once=True)
+    return run
+
+
+def job(app, job_id):
+    with app.app_context():
+        return jobs.get_job(job_id)
+
+
+def test_invalid_input_fails_at_once_and_removes_the_upload(app, user, run_jobs):
+    upload = os.path.join(jobs.job_runner.directory, 'upload-test')
+    with open(upload, 'w') as f:
+        f.write('date,amount\n2024-01-01,5\n')
+    with app.app_context():
+        job_id = jobs.enqueue('import', user_id=user, payload={'path': upload, 'format': 'xlsx'}, max_attempts=3)
+    run_jobs()
+
+    failed = job(app, job_id)
+    assert (failed['status'], failed['attempts']) == (jobs.FAILED, 1)
+    assert 'Unsupported format' in failed['error']
+    assert not os.path.exists(upload)
+
+
+def test_other_errors_are_retried_and_keep_the_upload(app, user, run_jobs, monkeypatch):
+    def flaky(context):
+        raise RuntimeError('disk full')
+
+    monkeypatch.setitem(jobs.HANDLERS, 'flaky', flaky)
+    upload = os.path.join(jobs.job_runner.directory, 'upload-flaky')
+    open(upload, 'w').close()
+    with app.app_context():
+        job_id = jobs.enqueue('flaky', user_id=user, payload={'path': upload}, max_attempts=2)
+    run_jobs()
+    assert job(app, job_id)['status'] == jobs.QUEUED
+    assert os.path.exists(upload)
+
+    with app.app_context():
+        db.session.execute(text('UPDATE job SET run_after = 0'))
+        db.session.commit()
+    run_jobs()
+    assert (job(app, job_id)['status'], job(app, job_id)['attempts']) == (jobs.FAILED, 2)
+    assert not os.path.exists(upload)
+
+
+def test_finished_jobs_are_purged_with_their_files(app, client, run_jobs):
+    old = client.post('/api/jobs/export?format=csv').get_json()['id']
+    recent = client.post('/api/jobs/export?format=csv').get_json()['id']
+    run_jobs()
+    assert client.get(f'/api/jobs/{old}/download').status_code == 200
+    old_file = os.path.join(jobs.job_runner.directory, job(app, old)['result']['file'])
+    recent_file = os.path.join(jobs.job_runner.directory, job(app, recent)['result']['file'])
+
+    with app.app_context():
+        db.session.execute(text("UPDATE job SET finished_at = '2000-01-01 00:00:00' WHERE id = :id"), {'id': old})
+        db.session.commit()
+        assert jobs.purge_finished(3600) == 1
+
+    assert job(app, old) is None
+    assert not os.path.exists(old_file)
+    assert client.get(f'/api/jobs/{old}/download').status_code == 404
+    assert os.path.exists(recent_file)
+
+
+def test_rollup_rebuild_reports_progress_between_users(app, client, run_jobs, monkeypatch):
+    with app.app_context():
+        statements.INSERT_USER(name='Bob', email='bob@example.com', password='x')
+        db.session.commit()
+    client.post('/add_transaction', data={
+        'type': 'expense', 'category': 'Food', 'amount': '5', 'date': '2024-01-01', 'description': 'x',
+    })
+
+    leases = []
+    report = jobs.JobContext.report
+
+    def recording_report(self, progress=None, message=None, force=False):
+        report(self, progress, message, force=True)
+        leases.append(progress)
+
+    monkeypatch.setattr(jobs.JobContext, 'report', recording_report)
+    with app.app_context():
+        job_id = jobs.enqueue('rollups.rebuild')
+    run_jobs()
+
+    finished = job(app, job_id)
+    assert (finished['status'], finished['result']) == (jobs.SUCCEEDED, {'mismatches': 0})
+    assert leases == [0.0, 0.25, 0.5, 0.75, 1.0]
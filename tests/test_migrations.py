@@ -0,0 +1,99 @@
+import pytest
+from sqlalchemy import inspect, text
+
+from conftest import sqlite_only
+import migrations
+import rollups
+import search
+import statements
+from extensions import db
+
+
+def test_fresh_database_is_stamped_with_every_migration(app):
+    with app.app_context():
+        assert migrations.applied_versions() == {version for version, _, _ in migrations.MIGRATIONS}
+
+
+@sqlite_only
+def test_upgrade_baseline_database(make_app, baseline_database):
+    app = make_app(baseline_database)
+    with app.app_context():
+        assert migrations.applied_versions() == {version for version, _, _ in migrations.MIGRATIONS}
+        assert db.session.execute(text(
+            'SELECT date, amount_minor, currency FROM "transaction" ORDER BY id'
+        )).fetchall() == [
+            ('2024-01-02', 500, 'USD'),
+            ('2024-01-03', 10000, 'USD'),
+            ('2024-02-01', 729, 'USD'),
+            ('2024-02-02', 30, 'USD'),
+        ]
+        assert rollups.check() == []
+        assert migrations.full_scans() == {}
+
+        columns = {column['name'] for column in inspect(db.engine).get_columns('daily_rollup')}
+        assert {'category_id', 'total_minor'} <= columns
+
+
+@sqlite_only
+def test_upgrade_is_idempotent(make_app, baseline_database):
+    make_app(baseline_database)
+    app = make_app(baseline_database)
+    with app.app_context():
+        assert rollups.check() == []
+
+
+@sqlite_only
+def test_failed_migration_leaves_nothing_behind(make_app, baseline_database, monkeypatch):
+    create_rollups = migrations._create_rollups
+
+    def fail_in_category_migration(connection, category, total, amount):
+        create_rollups(connection, category, total, amount)
+        if category.startswith('category_id'):
+            raise RuntimeError('interrupted')
+
+    monkeypatch.setattr(migrations, '_create_rollups', fail_in_category_migration)
+    try:
+        make_app(baseline_database)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError('the upgrade should have failed')
+    monkeypatch.setattr(migrations, '_create_rollups', create_rollups)
+
+    with make_app(baseline_database).app_context():
+        assert 7 in migrations.applied_versions()
+        assert not inspect(db.engine).has_table('category_old')
+        assert db.session.execute(text('SELECT COUNT(*) FROM category')).scalar() == 2
+        assert rollups.check() == []
+
+
+@sqlite_only
+def test_upgrade_indexes_existing_transactions_for_search(make_app, baseline_database):
+    app = make_app(baseline_database)
+    with app.app_context():
+        rows, _ = search.search_transactions(1, 'coffee')
+        assert [row.description for row in rows] == ['Coffee']
+        rows, _ = search.search_transactions(1, 'food')
+        assert len(rows) == 3
+
+
+def test_plan_check_covers_registered_statements_and_listing_shapes(app, monkeypatch):
+    with app.app_context():
+        assert migrations.full_scans() == {}
+        names = [name for name, _, _ in migrations.hot_queries()]
+        assert set(statements.REGISTRY) <= set(names)
+        assert 'transactions page, all filters, after a cursor' in names
+
+        scan = statements.Statement(
+            'by_description', 'SELECT id FROM "transaction" WHERE description = :description', statements.column
+        )
+        monkeypatch.setitem(statements.REGISTRY, 'by_description', scan)
+        assert list(migrations.full_scans()) == ['by_description']
+
+
+def test_plan_check_needs_a_value_for_every_parameter(app, monkeypatch):
+    unknown = statements.Statement('unknown', 'SELECT id FROM "user" WHERE id = :unknown', statements.scalar)
+    monkeypatch.setitem(statements.REGISTRY, 'unknown', unknown)
+    with app.app_context():
+        with pytest.raises(KeyError, match='unknown'):
+            migrations.full_scans()
@@ -0,0 +1,73 @@
+import pytest
+
+from importer import _signed
+from money import MAX_MINOR, Money
+
+
+@pytest.mark.parametrize('value, minor', [
+    ('12.50', 1250),
+    ('1,234.5', 123450),
+    (12.3, 1230),
+    (7, 700),
+    ('1.500', 150),
+    ('1e-2', 1),
+    ('0e999999999', 0),
+    ('92233720368547758.07', MAX_MINOR),
+])
+def test_parse(value, minor):
+    assert Money.parse(value).minor == minor
+
+
+@pytest.mark.parametrize('value, message', [
+    ('abc', 'must be a number'),
+    ('NaN', 'must be a number'),
+    ('-Infinity', 'must be a number'),
+    ('0.001', 'decimal places'),
+    ('1e-999999999', 'decimal places'),
+    ('92233720368547758.08', 'too large'),
+    ('1e999999999', 'too large'),
+    ('-1E+999999999999999999', 'too large'),
+])
+def test_parse_rejects(value, message):
+    with pytest.raises(ValueError, match=message):
+        Money.parse(value)
+
+
+def test_parse_uses_the_currency_exponent():
+    assert Money.parse('9223372036854775807', 'JPY').minor == MAX_MINOR
+    with pytest.raises(ValueError, match='decimal places'):
+        Money.parse('1.5', 'JPY')
+
+
+def test_signed_statement_amounts_with_huge_exponents():
+    assert _signed('-1e999999999', None) == ('expense', '1E+999999999')
+    assert _signed('NaN', None) == ('income', 'NaN')
+
+
+HUGE = '1e999999999'
+
+
+def test_huge_amounts_are_rejected_everywhere(client):
+    assert client.get('/api/transactions', query_string={'min_amount': HUGE}).status_code == 400
+
+    form = {'type': 'expense', 'category': 'Food', 'amount': HUGE, 'date': '2024-05-01', 'description': 'x'}
+    assert client.post('/add_transaction', data=form).status_code == 302
+    assert client.get('/api/transactions').get_json()['transactions'] == []
+
+    response = client.post('/api/transactions/batch', json={'operations': [dict(form, op='create')]})
+    assert response.status_code == 200
+    assert response.get_json()['results'][0]['status'] == 'error'
+
+    response = client.post('/budgets', data={'category': 'Food', 'amount': HUGE})
+    assert response.status_code == 302
+    assert client.get('/api/budgets').get_json()['budgets'] == []
+
+
+@pytest.mark.parametrize('minor, currency, formatted', [
+    (1250, 'USD', '$12.50'),
+    (-1250, 'USD', '-$12.50'),
+    (1500, 'JPY', '¥1500'),
+    (12500, 'KWD', '12.500 KWD'),
+])
+def test_format(minor, currency, formatted):
+    assert Money(minor, currency).format() == formatted
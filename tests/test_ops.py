@@ -0,0 +1,20 @@
+import pytest
+
+
+@pytest.mark.parametrize('path', ['/ops/cache', '/ops/categories'])
+def test_ops_endpoints_require_the_token(make_app, path):
+    client = make_app(OPS_ENDPOINTS_ENABLED=True, INSTRUMENTATION_METRICS_TOKEN='s3cret').test_client()
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get(path, headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert isinstance(response.get_json(), dict)
+
+
+@pytest.mark.parametrize('config', [
+    {'OPS_ENDPOINTS_ENABLED': False, 'INSTRUMENTATION_METRICS_TOKEN': 's3cret'},
+    {'OPS_ENDPOINTS_ENABLED': True, 'INSTRUMENTATION_METRICS_TOKEN': None},
+])
+def test_ops_endpoints_are_hidden_unless_enabled_with_a_token(make_app, config):
+    client = make_app(**config).test_client()
+    assert client.get('/ops/cache', headers={'Authorization': 'Bearer s3cret'}).status_code == 404
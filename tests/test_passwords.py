@@ -0,0 +1,31 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from conftest import create_user, log_in
+import statements
+from passwords import password_hasher
+
+
+@pytest.mark.parametrize('method, stored_with, needs_rehash', [
+    ('scrypt', 'scrypt', False),
+    ('scrypt', 'scrypt:32768:8:1', False),
+    ('scrypt:32768:8:1', 'scrypt', False),
+    ('scrypt:16384:8:1', 'scrypt', True),
+    ('scrypt', 'pbkdf2', True),
+    ('pbkdf2', 'pbkdf2:sha256', False),
+])
+def test_needs_rehash_compares_the_resolved_method(make_app, method, stored_with, needs_rehash):
+    make_app(PASSWORD_HASH_METHOD=method)
+    stored = generate_password_hash('secret', stored_with)
+    assert password_hasher.verify_password(stored, 'secret') == (True, needs_rehash)
+    assert password_hasher.verify_password(stored, 'wrong') == (False, False)
+
+
+def test_login_keeps_a_current_hash(make_app):
+    app = make_app(PASSWORD_HASH_METHOD='scrypt')
+    create_user(app)
+    with app.app_context():
+        before = statements.USER_LOGIN(email='ann@example.com')['password']
+    log_in(app)
+    with app.app_context():
+        assert statements.USER_LOGIN(email='ann@example.com')['password'] == before
@@ -0,0 +1,49 @@
+from datetime import date
+
+import pytest
+
+from conftest import sqlite_only
+import search
+
+pytestmark = sqlite_only
+
+
+@pytest.fixture
+def transactions(client):
+    for description in ('pay_day bonus', "O'Brien's café (lunch)", 'Weekly groceries'):
+        response = client.post('/add_transaction', data={
+            'type': 'expense',
+            'category': 'Food',
+            'amount': '12.50',
+            'date': date(2024, 5, 1).isoformat(),
+            'description': description,
+        })
+        assert response.status_code == 302
+
+
+def found(client, query):
+    response = client.get('/api/transactions/search', query_string={'q': query})
+    assert response.status_code == 200, response.get_json()
+    return [row['description'] for row in response.get_json()['transactions']]
+
+
+@pytest.mark.parametrize('query', ['pay_day', 'PAY_DAY', 'pay-day', 'pay day', '"pay_day"'])
+def test_search_splits_words_like_the_index(client, transactions, query):
+    assert found(client, query) == ['pay_day bonus']
+
+
+@pytest.mark.parametrize('query', ["o'brien", "O'Brien's café", 'cafe (lunch)', 'brien*', '"brien"'])
+def test_search_ignores_punctuation(client, transactions, query):
+    assert found(client, query) == ["O'Brien's café (lunch)"]
+
+
+@pytest.mark.parametrize('query', ['', '___', "'-*()"])
+def test_search_without_words_is_rejected(client, transactions, query):
+    response = client.get('/api/transactions/search', query_string={'q': query})
+    assert response.status_code == 400
+
+
+def test_unanswerable_match_is_rejected(client, transactions, monkeypatch):
+    monkeypatch.setattr(search, 'match_expression', lambda user_id, query: '"pay day"')
+    response = client.get('/api/transactions/search', query_string={'q': 'pay'})
+    assert response.status_code == 400
@@ -0,0 +1,22 @@
+import pytest
+
+from extensions import db
+import statements
+
+
+def test_prepare_checks_every_statement_against_the_database(app):
+    with app.app_context():
+        assert statements.prepare(db.engine) == len(statements.REGISTRY)
+
+
+@pytest.mark.parametrize('sql', [
+    'SELEC nonsense FRM nowhere',
+    'SELECT id FROM nowhere WHERE id = :id',
+    'SELECT missing_column FROM "user" WHERE id = :user_id',
+    'UPDATE "user" SET missing_column = :value WHERE id = :user_id',
+])
+def test_prepare_rejects_a_broken_statement(app, monkeypatch, sql):
+    monkeypatch.setitem(statements.REGISTRY, 'broken', statements.Statement('broken', sql, statements.execute))
+    with app.app_context():
+        with pytest.raises(ValueError, match="'broken'"):
+            statements.prepare(db.engine)
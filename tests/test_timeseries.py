@@ -0,0 +1,61 @@
+import pytest
+
+from conftest import create_user, log_in
+from timeseries import MAX_SERIES_DAYS, shift_day
+
+
+def add(client, day, amount='10.00', type='expense'):
+    response = client.post('/add_transaction', data={
+        'type': type, 'category': 'Food', 'amount': amount, 'date': day, 'description': 'x',
+    })
+    assert response.status_code == 302
+
+
+def timeseries(client, **args):
+    return client.get('/api/analytics/timeseries', query_string=args)
+
+
+def test_shift_day_clamps_to_representable_dates():
+    assert shift_day('0001-01-05', -89) == '0001-01-01'
+    assert shift_day('9999-12-30', 5) == '9999-12-31'
+    assert shift_day('2024-03-01', -1) == '2024-02-29'
+
+
+def test_early_years_are_zero_padded(client):
+    add(client, '0001-01-03')
+    response = timeseries(client, date_from='0001-01-01', date_to='0001-01-05', windows='7,90')
+    assert response.status_code == 200
+    series = response.get_json()
+    assert series['date'] == ['0001-01-01', '0001-01-02', '0001-01-03', '0001-01-04', '0001-01-05']
+    assert series['expense'] == [0, 0, 10.0, 0, 0]
+    assert series['windows'][1]['sum'][-1] == 10.0
+
+    response = client.get('/api/transactions', query_string={'date_from': '0001-01-01'})
+    assert response.status_code == 200
+    assert [row['date'] for row in response.get_json()['transactions']] == ['0001-01-03']
+
+
+def test_explicit_range_longer_than_the_limit_is_rejected(client):
+    assert timeseries(client, date_from='0001-01-01', date_to='9999-12-31').status_code == 400
+    last = shift_day('2020-01-01', MAX_SERIES_DAYS - 1)
+    assert len(timeseries(client, date_from='2020-01-01', date_to=last).get_json()['date']) == MAX_SERIES_DAYS
+
+
+@pytest.mark.parametrize('backend', ['sql', 'pandas'])
+def test_open_ended_series_are_cut_to_the_limit(make_app, backend):
+    app = make_app(ANALYTICS_BACKEND=backend)
+    create_user(app)
+    client = log_in(app)
+    add(client, '1900-01-01')
+    add(client, '2024-05-01')
+
+    series = timeseries(client).get_json()
+    assert len(series['date']) == MAX_SERIES_DAYS
+    assert series['date'][-1] == '2024-05-01'
+    series = timeseries(client, date_from='1900-01-01').get_json()
+    assert len(series['date']) == MAX_SERIES_DAYS
+    assert series['date'][0] == '1900-01-01'
+
+    charts = client.get('/api/analytics/charts', query_string={'names': 'time_series'}).get_json()
+    assert len(charts['time_series']['date']) == MAX_SERIES_DAYS
+    assert charts['time_series']['date'][-1] == '2024-05-01'
@@ -0,0 +1,148 @@
+"""Dense daily series and calendar rolling windows.
+
+Days without transactions are filled with zeros so every series has exactly
+one point per calendar day, and rolling windows cover the last N calendar
+days rather than the last N transactions. Window sums come from a prefix-sum
+array, so any number of windows costs O(days) each with no re-summing.
+A series covers at most ``MAX_SERIES_DAYS`` days.
+"""
+from datetime import date, timedelta
+from itertools import accumulate
+
+from sqlalchemy import text
+
+from extensions import db
+from money import minor_per_major
+from transaction_query import FilterError
+
+MAX_WINDOW_DAYS = 3660
+MAX_SERIES_DAYS = 3660
+
+
+def day_count(first_day, last_day):
+    """Number of days from ``first_day`` to ``last_day`` inclusive."""
+    return (date.fromisoformat(last_day) - date.fromisoformat(first_day)).days + 1
+
+
+def day_range(first_day, last_day):
+    """Return every ISO day from ``first_day`` to ``last_day`` inclusive."""
+    start = date.fromisoformat(first_day)
+    count = day_count(first_day, last_day)
+    return [(start + timedelta(days=offset)).isoformat() for offset in range(max(count, 0))]
+
+
+def shift_day(day, days):
+    """Return the ISO day ``days`` after ``day``, clamped to the representable dates."""
+    value = date.fromisoformat(day)
+    try:
+        return (value + timedelta(days=days)).isoformat()
+    except OverflowError:
+        return (date.min if days < 0 else date.max).isoformat()
+
+
+def densify(days, values_by_day, fill=0):
+    """Look up each day in ``values_by_day``, using ``fill`` for missing days."""
+    return [values_by_day.get(day, fill) for day in days]
+
+
+def rolling_sums(values, window):
+    """Trailing ``window``-day sums; early days sum what is available."""
+    prefix = [0, *accumulate(values)]
+    return [prefix[i + 1] - prefix[max(0, i + 1 - window)] for i in range(len(values))]
+
+
+def rolling_windows(values, windows, unit=1):
+    """Return ``[{'window', 'sum', 'avg'}]`` for each calendar window length.
+
+    ``avg`` is the mean per calendar day, counting days without
+    transactions as zero. ``values`` in minor units are summed exactly and
+    divided by ``unit`` only in the output.
+    """
+    series = []
+    for window in windows:
+        sums = rolling_sums(values, window)
+        series.append({
+            'window': window,
+            'sum': [total / unit for total in sums],
+            'avg': [total / (unit * window) for total in sums],
+        })
+    return series
+
+
+def parse_windows(value, default):
+    """Parse a comma-separated list of positive window lengths."""
+    if not value:
+        return list(default)
+    try:
+        windows = [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise FilterError('windows must be a comma-separated list of day counts.')
+    if not windows or any(window < 1 or window > MAX_WINDOW_DAYS for window in windows):
+        raise FilterError(f'windows must be between 1 and {MAX_WINDOW_DAYS} days.')
+    return windows
+
+
+def build_timeseries(user_id, windows, start=None, end=None):
+    """Dense daily income/expense series with rolling expense windows.
+
+    Reads ``daily_rollup``; amounts are returned in major units. ``start``/``end`` default to the first and last
+    day with data; windows near ``start`` still count the days before it. A
+    series without one of the bounds is cut to its ``MAX_SERIES_DAYS`` days
+    nearest the given bound, or the latest ones; a ``start`` to ``end``
+    range longer than that raises ``FilterError``.
+    """
+    if start and end and day_count(start, end) > MAX_SERIES_DAYS:
+        raise FilterError(f'date_from to date_to must span at most {MAX_SERIES_DAYS} days.')
+
+    params = {'user_id': user_id}
+    where = ''
+    lead_in = max(windows) - 1
+    if start:
+        # Read enough history before ``start`` to fill the longest window
+        params['from_day'] = shift_day(start, -lead_in)
+        where += ' AND day >= :from_day'
+    if end:
+        params['end'] = end
+        where += ' AND day <= :end'
+
+    rows = db.session.execute(
+        text(f'''
+            SELECT day,
+                   CAST(SUM(CASE WHEN type = 'income' THEN total_minor ELSE 0 END) AS BIGINT) AS income,
+                   CAST(SUM(CASE WHEN type = 'expense' THEN total_minor ELSE 0 END) AS BIGINT) AS expense
+            FROM daily_rollup
+            WHERE user_id = :user_id{where}
+            GROUP BY day
+            ORDER BY day
+        '''),
+        params
+    ).fetchall()
+
+    first_day = start or (rows[0][0] if rows else None)
+    last_day = end or (rows[-1][0] if rows else None)
+    if first_day is None or last_day is None or first_day > last_day:
+        return {'date': [], 'income': [], 'expense': [], 'windows': []}
+
+    read_from = params.get('from_day', first_day)
+    if day_count(first_day, last_day) > MAX_SERIES_DAYS:
+        if start:
+            last_day = shift_day(first_day, MAX_SERIES_DAYS - 1)
+        else:
+            first_day = shift_day(last_day, 1 - MAX_SERIES_DAYS)
+            read_from = shift_day(first_day, -lead_in)
+    days = day_range(read_from, last_day)
+    income = densify(days, {row[0]: row[1] for row in rows})
+    expense = densify(days, {row[0]: row[2] for row in rows})
+    unit = minor_per_major()
+
+    # Drop the lead-in days that were only read to fill the windows
+    offset = len(days) - day_count(first_day, last_day)
+    return {
+        'date': days[offset:],
+        'income': [total / unit for total in income[offset:]],
+        'expense': [total / unit for total in expense[offset:]],
+        'windows': [
+            {'window': series['window'], 'sum': series['sum'][offset:], 'avg': series['avg'][offset:]}
+            for series in rolling_windows(expense, windows, unit)
+        ],
+    }
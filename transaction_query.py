@@ -0,0 +1,167 @@
+"""Filtered, keyset-paginated access to a user's transactions.
+
+Pages are ordered newest first on ``(date, id)``. Instead of an OFFSET, the
+client passes back an opaque cursor naming the last row it saw, so every page
+is a bounded index range scan no matter how deep into the history it is.
+"""
+import base64
+from datetime import datetime
+from functools import lru_cache
+
+from flask import current_app
+from sqlalchemy import text
+
+from extensions import db
+from money import Money
+from records import TRANSACTION_COLUMN_TYPES, TRANSACTION_COLUMNS, TRANSACTION_TABLES, transaction_records
+
+TRANSACTION_TYPES = ('income', 'expense')
+
+
+class FilterError(ValueError):
+    """Raised when a filter or cursor value cannot be parsed."""
+
+
+def _parse_day(value, name):
+    try:
+        # strftime('%Y') does not zero-pad years before 1000
+        return datetime.strptime(value, '%Y-%m-%d').date().isoformat()
+    except ValueError:
+        raise FilterError(f'{name} must be a date in YYYY-MM-DD format.')
+
+
+def _parse_amount(value, name):
+    try:
+        return Money.parse(value)
+    except ValueError:
+        raise FilterError(f'{name} must be an amount such as 12.50.')
+
+
+def parse_filters(args):
+    """Build a filter dict from request args, dropping empty values."""
+    filters = {}
+
+    txn_type = args.get('type')
+    if txn_type:
+        if txn_type not in TRANSACTION_TYPES:
+            raise FilterError('type must be "income" or "expense".')
+        filters['type'] = txn_type
+
+    if args.get('category'):
+        filters['category'] = args['category']
+
+    for name in ('date_from', 'date_to'):
+        if args.get(name):
+            filters[name] = _parse_day(args[name], name)
+
+    for name in ('min_amount', 'max_amount'):
+        if args.get(name):
+            filters[name] = _parse_amount(args[name], name)
+
+    if args.get('q'):
+        filters['q'] = args['q'].strip()
+
+    return filters
+
+
+def filter_clause(filters):
+    """Translate a filter dict into extra ``AND ...`` SQL and its parameters.
+
+    The SQL reads ``"transaction"`` as ``t``, and the category filter needs
+    ``:user_id`` bound by the caller.
+    """
+    clauses = []
+    params = {}
+
+    if 'type' in filters:
+        clauses.append('t.type = :type')
+        params['type'] = filters['type']
+    if 'category' in filters:
+        clauses.append('t.category_id = (SELECT id FROM category WHERE user_id = :user_id AND name = :category)')
+        params['category'] = filters['category']
+    if 'date_from' in filters:
+        clauses.append('t.date >= :date_from')
+        params['date_from'] = filters['date_from']
+    if 'date_to' in filters:
+        clauses.append('t.date <= :date_to')
+        params['date_to'] = filters['date_to']
+    if 'min_amount' in filters:
+        clauses.append('t.amount_minor >= :min_amount')
+        params['min_amount'] = filters['min_amount'].minor
+    if 'max_amount' in filters:
+        clauses.append('t.amount_minor <= :max_amount')
+        params['max_amount'] = filters['max_amount'].minor
+    if filters.get('q'):
+        escaped = filters['q'].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        # lower() on both sides: SQLite's LIKE ignores ASCII case, PostgreSQL's does not
+        clauses.append("lower(t.description) LIKE lower(:q) ESCAPE '\\'")
+        params['q'] = f'%{escaped}%'
+
+    return ''.join(f' AND {clause}' for clause in clauses), params
+
+
+def encode_cursor(txn_date, txn_id):
+    return base64.urlsafe_b64encode(f'{txn_date}|{txn_id}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        txn_date, txn_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return _parse_day(txn_date, 'cursor'), int(txn_id)
+    except (ValueError, UnicodeDecodeError):
+        raise FilterError('cursor is invalid.')
+
+
+def page_size(value=None):
+    """Clamp a requested page size to ``TRANSACTIONS_API_MAX_LIMIT``."""
+    default = current_app.config['TRANSACTIONS_PER_PAGE']
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise FilterError('limit must be an integer.')
+    return max(1, min(limit, current_app.config['TRANSACTIONS_API_MAX_LIMIT']))
+
+
+@lru_cache(maxsize=256)
+def _page_statement(where):
+    # ``where`` is assembled from a fixed set of clauses with bind parameters,
+    # so there are only a few hundred distinct shapes; build each one once.
+    return text(f'''
+        SELECT {TRANSACTION_COLUMNS}
+        FROM {TRANSACTION_TABLES}
+        WHERE t.user_id = :user_id{where}
+        ORDER BY t.date DESC, t.id DESC
+        LIMIT :limit
+    ''').columns(**TRANSACTION_COLUMN_TYPES)
+
+
+def page_query(user_id, filters, cursor, limit):
+    """Return the ``(statement, params)`` that fetches a page of ``limit`` rows and one more."""
+    where, params = filter_clause(filters)
+    params['user_id'] = user_id
+    params['limit'] = limit + 1
+
+    if cursor:
+        params['cursor_date'], params['cursor_id'] = decode_cursor(cursor)
+        where += ' AND (t.date, t.id) < (:cursor_date, :cursor_id)'
+    return _page_statement(where), params
+
+
+def fetch_page(user_id, filters, cursor=None, limit=None):
+    """Return ``(records, next_cursor)`` for one page of the user's transactions.
+
+    Rows are ``records.TransactionRecord`` objects with decoded dates.
+
+    ``next_cursor`` is ``None`` on the last page.
+    """
+    limit = limit or page_size()
+    statement, params = page_query(user_id, filters, cursor, limit)
+    rows = transaction_records(db.session.execute(statement, params))
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].date.isoformat(), rows[-1].id)
+    return rows, next_cursor
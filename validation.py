@@ -0,0 +1,63 @@
+"""Validation rules shared by every path that writes transactions."""
+from datetime import datetime
+from functools import lru_cache
+
+from money import DEFAULT_CURRENCY, Money
+from transaction_query import TRANSACTION_TYPES
+
+
+# Transactions without a category are filed under this one
+DEFAULT_CATEGORY = 'Uncategorized'
+
+# Longest category name (the category.name column)
+MAX_CATEGORY_LENGTH = 50
+
+
+class ValidationError(ValueError):
+    """Raised when a transaction field fails validation."""
+
+
+# Bulk imports repeat the same few hundred dates; strptime dominates otherwise
+@lru_cache(maxsize=4096)
+def _parse_date(date_str, date_format):
+    # strftime('%Y') does not zero-pad years before 1000
+    return datetime.strptime(date_str, date_format).date().isoformat()
+
+
+def clean_transaction(type, category, amount, date_str, description, date_format='%Y-%m-%d',
+                      currency=DEFAULT_CURRENCY):
+    """Validate raw transaction fields and return them normalized.
+
+    Applies the same rules as the add/edit forms: a known type, a category
+    name of at most ``MAX_CATEGORY_LENGTH`` characters (``DEFAULT_CATEGORY``
+    when blank), an amount greater than zero with no more decimals than the
+    currency has (stored as ``amount_minor``, an integer of minor units) and
+    a parseable date, stored as ``'YYYY-MM-DD'``.
+    """
+    if type not in TRANSACTION_TYPES:
+        raise ValidationError('Type must be income or expense.')
+
+    category = (category or '').strip() or DEFAULT_CATEGORY
+    if len(category) > MAX_CATEGORY_LENGTH:
+        raise ValidationError(f'Category must be at most {MAX_CATEGORY_LENGTH} characters.')
+
+    try:
+        amount = Money.parse(amount, currency)
+    except ValueError as e:
+        raise ValidationError(str(e))
+    if not amount.minor > 0:
+        raise ValidationError('Amount must be greater than 0.')
+
+    try:
+        txn_date = _parse_date((date_str or '').strip(), date_format)
+    except ValueError:
+        raise ValidationError('Date is invalid.')
+
+    return {
+        'type': type,
+        'category': category,
+        'amount_minor': amount.minor,
+        'currency': amount.currency,
+        'date': txn_date,
+        'description': description,
+    }